@@ -0,0 +1,437 @@
+# Lockstep batch simulator for bot-only mini-games (requires numpy).
+#
+# Plays the same game as main.simulate_real_mini_game -- random starting
+# resources, Spring and Summer influence + building, one winter battle -- but
+# for thousands of games at once. Every player's resources, building mask and
+# advisor claims live in numpy arrays, and each step of a season is applied to
+# all games with vectorized operations. The rules are compiled from the same
+# board.json, player_building_sheet.json and bad_guy_cards.json data.
+#
+# The bots choose exactly like the scalar bots (uniformly among the legal
+# options), so the two paths should agree statistically:
+#
+#   python batch_sim.py --games 200000 --compare 5000
+
+import argparse
+import itertools
+import os
+import time
+
+import numpy as np
+
+import main
+
+RESOURCES = ["wood", "stone", "gold", "armies", "vp", "plus2"]
+RES = {r: i for i, r in enumerate(RESOURCES)}
+GOODS = slice(0, 3)  # wood, stone, gold
+NUM_DICE = 3
+ADVISOR_BITS = max(main.influencers) + 1  # advisor value v is bit v
+
+TRADE_DELTAS = np.array([[-1, 1, 1], [1, -1, 1], [1, 1, -1]])
+
+
+def resource_vector(gains):
+    vec = np.zeros(len(RESOURCES), dtype=np.int64)
+    for res, amt in gains:
+        vec[RES[res]] += amt
+    return vec
+
+
+# --- Compiled rules ---------------------------------------------------------
+
+
+def build_dice_arrays(num_dice):
+    # Same content as main.dice_outcomes, indexed by the unsorted roll code
+    # sum((die - 1) * 6**k) so a batch of rolls never needs sorting
+    codes = 6**num_dice
+    reach_bits = np.zeros((codes, 1 << num_dice), dtype=np.int64)
+    reach_masks = np.zeros((codes, 1 << num_dice, ADVISOR_BITS),
+                           dtype=np.int64)
+    for code, dice in enumerate(
+            itertools.product(range(1, 7), repeat=num_dice)):
+        by_used_mask = main.dice_outcomes[tuple(sorted(dice))]
+        for used_mask, options in enumerate(by_used_mask):
+            for val, mask in options.items():
+                reach_bits[code, used_mask] |= 1 << val
+                reach_masks[code, used_mask, val] = mask
+    return reach_bits, reach_masks
+
+
+def compile_actions(actions):
+    # Advisor actions as a list of ops understood by apply_ops
+    ops = []
+    for action in actions:
+        typ = action["type"]
+        res = action.get("resource")
+        if typ == "gain":
+            ops.append(("delta", resource_vector([(res, action["amount"])])))
+        elif typ == "lose":
+            ops.append(("lose", RES[res], action["amount"]))
+        elif typ == "choose":
+            if res == "any":
+                ops.append(("any", action["amount"]))
+            elif all(isinstance(r, list) for r in res):
+                ops.append(("pick",
+                            np.array([
+                                resource_vector([(r, 1) for r in combo])
+                                for combo in res
+                            ])))
+            else:
+                ops.append(("pick",
+                            np.array([
+                                resource_vector([(r, action["amount"])])
+                                for r in res
+                            ])))
+        elif typ == "trade":
+            ops.append(("trade", ))
+    return ops
+
+
+def compile_enemy_effects(effects, lose):
+    # Parsed enemy card rewards/losses (see ruleset.parse_enemy_card) as ops
+    ops = []
+    for resource, amount in effects:
+        if resource == "building":
+            continue  # Losing buildings isn't implemented in either engine
+        elif resource == "any":
+            ops.append(("lose_random", amount) if lose else ("any", amount))
+        elif lose:
+            ops.append(("lose", RES[resource], amount))
+        else:
+            ops.append(("delta", resource_vector([(resource, amount)])))
+    return ops
+
+
+class BatchRules:
+    # Everything the batch engine needs from the three JSON files, as arrays
+
+    def __init__(self, winter_level=1):
+        self.reach_bits, self.reach_masks = build_dice_arrays(NUM_DICE)
+        self.dice_weights = 6**np.arange(NUM_DICE - 1, -1, -1)
+
+        self.advisor_ops = {
+            val: compile_actions(char.get("actions", []))
+            for val, char in main.influencers.items()
+        }
+
+        buildings = main.all_buildings
+        n = len(buildings)
+        self.bit_index = np.array([
+            main.building_bits[b["level"]].bit_length() - 1 for b in buildings
+        ])
+        self.bit_values = np.array(
+            [main.building_bits[b["level"]] for b in buildings],
+            dtype=np.int64)
+        self.prev_bits = np.array([rule[2] for rule in main.building_rules],
+                                  dtype=np.int64)
+        self.needs_rows12 = np.array(
+            [rule[3] in [3, 4] for rule in main.building_rules])
+        self.row1 = main.row_masks[1]
+        self.row2 = main.row_masks[2]
+        self.costs = np.array([[b["cost"]["wood"], b["cost"]["stone"],
+                                b["cost"]["gold"]] for b in buildings])
+
+        self.build_gain = np.zeros((n, len(RESOURCES)), dtype=np.int64)
+        self.build_any = np.zeros(n, dtype=np.int64)
+        self.vp_per_win = np.zeros(n, dtype=np.int64)
+        self.season_gain = {}  # season -> (n x resources, n)
+        self.tie_mask = 0
+        self.crane_mask = 0
+        for j, b in enumerate(buildings):
+            summary = main.summarize_building_effects([b["level"]])
+            if summary["tie_breaker"]:
+                self.tie_mask |= int(self.bit_values[j])
+            if {3, 4} & summary["unlocked_rows"]:
+                self.crane_mask |= int(self.bit_values[j])
+            self.vp_per_win[j] = summary["vp_per_win"]
+            for season, bonuses in summary["season_bonuses"].items():
+                gain, any_count = self.season_gain.setdefault(
+                    season, (np.zeros((n, len(RESOURCES)), dtype=np.int64),
+                             np.zeros(n, dtype=np.int64)))
+                for res, amt in bonuses:
+                    if res == "any":
+                        any_count[j] += amt
+                    else:
+                        gain[j, RES[res]] += amt
+            for effect in b.get("effects", []):
+                if effect["type"] != "gain":
+                    continue
+                res = effect["resource"]
+                if res == "any":
+                    self.build_any[j] += effect["amount"]
+                elif not res.endswith("defense"):
+                    self.build_gain[j, RES[res]] += effect["amount"]
+
+        self.cards = main.enemy_decks[winter_level]
+        self.strength = np.array([e["strength"] for e in self.cards])
+        # Building defense that counts against each card
+        self.card_defense = np.zeros((len(self.cards), n), dtype=np.int64)
+        for j, b in enumerate(buildings):
+            summary = main.summarize_building_effects([b["level"]])
+            for c, enemy in enumerate(self.cards):
+                self.card_defense[c, j] = summary["defense"] + sum(
+                    summary["enemy_defense"].get(kind, 0)
+                    for kind in enemy["defense_kinds"])
+        self.reward_ops = [
+            compile_enemy_effects(e["rewards"], lose=False) for e in self.cards
+        ]
+        self.loss_ops = [
+            compile_enemy_effects(e["losses"], lose=True) for e in self.cards
+        ]
+
+
+# --- Vectorized steps -------------------------------------------------------
+
+
+def pick_random_set(rng, allowed):
+    # Uniform choice of a True column per row of a boolean matrix
+    return (rng.random(allowed.shape) * allowed).argmax(axis=1)
+
+
+def add_random_goods(rng, res, rows, p, counts):
+    # counts[k] uniformly random wood/stone/gold for each game rows[k]
+    for k in range(int(counts.max(initial=0))):
+        take = rows[counts > k]
+        res[take, p, rng.integers(0, 3, size=take.size)] += 1
+
+
+def lose_random_goods(rng, res, rows, p, amount):
+    # Mirrors the pool draw in main.apply_loss_penalty: each loss picks a
+    # resource in proportion to the starting count among those still > 0
+    start = res[rows, p, GOODS].copy()
+    for _ in range(amount):
+        goods = res[rows, p, GOODS]
+        weights = start * (goods > 0)
+        total = weights.sum(axis=1)
+        live = total > 0
+        if not live.any():
+            break
+        u = rng.random(rows.size) * total
+        chosen = (u[:, None] < weights.cumsum(axis=1)).argmax(axis=1)
+        res[rows[live], p, chosen[live]] -= 1
+
+
+def apply_ops(rng, res, rows, p, ops):
+    for op in ops:
+        kind = op[0]
+        if kind == "delta":
+            res[rows, p] += op[1]
+        elif kind == "lose":
+            res[rows, p, op[1]] = np.maximum(0, res[rows, p, op[1]] - op[2])
+        elif kind == "pick":
+            options = op[1]
+            res[rows, p] += options[rng.integers(0, len(options), rows.size)]
+        elif kind == "any":
+            add_random_goods(rng, res, rows, p,
+                             np.full(rows.size, op[1], dtype=np.int64))
+        elif kind == "trade":
+            has = res[rows, p, GOODS] >= 1
+            can = has.any(axis=1)
+            give = pick_random_set(rng, has)
+            res[rows[can], p, GOODS] += TRADE_DELTAS[give[can]]
+        elif kind == "lose_random":
+            lose_random_goods(rng, res, rows, p, op[1])
+
+
+def built_matrix(rules, built):
+    return (built[:, None] >> rules.bit_index[None, :]) & 1
+
+
+def apply_season_bonus(rng, rules, res, built, p, season):
+    if season.lower() not in rules.season_gain:
+        return
+    gain, any_count = rules.season_gain[season.lower()]
+    have = built_matrix(rules, built[:, p])
+    res[:, p] += have @ gain
+    counts = have @ any_count
+    add_random_goods(rng, res, np.arange(res.shape[0]), p, counts)
+
+
+def influence_phase(rng, rules, res, claims, p):
+    num_games = res.shape[0]
+    dice = rng.integers(1, 7, size=(num_games, NUM_DICE))
+    code = (dice - 1) @ rules.dice_weights
+    used = np.zeros(num_games, dtype=np.int64)
+    full = (1 << NUM_DICE) - 1
+
+    # Advisors claimed by the other players are off limits this turn
+    others = np.zeros(num_games, dtype=np.int64)
+    for q in range(claims.shape[1]):
+        if q != p:
+            others |= claims[:, q]
+
+    active = np.ones(num_games, dtype=bool)
+    for _ in range(NUM_DICE):
+        avail = rules.reach_bits[code, used] & ~others
+        active &= avail != 0
+        rows = np.nonzero(active)[0]
+        if rows.size == 0:
+            break
+        allowed = (avail[rows, None] >> np.arange(ADVISOR_BITS)) & 1
+        choice = pick_random_set(rng, allowed)
+        for val, ops in rules.advisor_ops.items():
+            picked = rows[choice == val]
+            if picked.size:
+                apply_ops(rng, res, picked, p, ops)
+        used[rows] |= rules.reach_masks[code[rows], used[rows], choice]
+        claims[rows, p] |= np.left_shift(1, choice)
+        active &= used != full
+
+
+def build_phase(rng, rules, res, built, p):
+    b = built[:, p]
+    have = built_matrix(rules, b)
+    prev_ok = (rules.prev_bits[None, :] == 0) | (
+        (b[:, None] & rules.prev_bits[None, :]) != 0)
+    rows_open = ((b & rules.crane_mask) != 0) | (((b & rules.row1) != 0) &
+                                                 ((b & rules.row2) != 0))
+    row_ok = ~rules.needs_rows12[None, :] | rows_open[:, None]
+    afford = (res[:, p, None, GOODS] >= rules.costs[None, :, :]).all(axis=2)
+    buildable = (have == 0) & prev_ok & row_ok & afford
+
+    rows = np.nonzero(buildable.any(axis=1))[0]
+    j = pick_random_set(rng, buildable[rows])
+    res[rows, p, GOODS] -= rules.costs[j]
+    built[rows, p] |= rules.bit_values[j]
+    res[rows, p] += rules.build_gain[j]
+    add_random_goods(rng, res, rows, p, rules.build_any[j])
+
+
+def winter_phase(rng, rules, res, built, p, combat_win, enemy):
+    num_games = res.shape[0]
+    card = rng.integers(0, len(rules.cards), size=num_games)
+    king_die = rng.integers(1, 7, size=num_games)
+    have = built_matrix(rules, built[:, p])
+    power = res[:, p, RES["armies"]] + king_die + (
+        have * rules.card_defense[card]).sum(axis=1)
+    strength = rules.strength[card]
+    tie = (built[:, p] & rules.tie_mask) != 0
+    win = (power > strength) | ((power == strength) & tie)
+
+    for c in range(len(rules.cards)):
+        won = np.nonzero(win & (card == c))[0]
+        apply_ops(rng, res, won, p, rules.reward_ops[c])
+        lost = np.nonzero(~win & (card == c))[0]
+        apply_ops(rng, res, lost, p, rules.loss_ops[c])
+    res[:, p, RES["vp"]] += np.where(win, have @ rules.vp_per_win, 0)
+    combat_win[:, p] = win
+    enemy[:, p] = card
+
+
+def simulate_batch(num_games,
+                   num_players=2,
+                   seed=0,
+                   seasons=("Spring", "Summer"),
+                   rules=None):
+    # Returns {field: array of shape (num_games, num_players)}
+    rules = rules or BatchRules()
+    rng = np.random.default_rng(seed)
+    shape = (num_games, num_players)
+
+    res = np.zeros(shape + (len(RESOURCES), ), dtype=np.int64)
+    res[:, :, GOODS] = rng.integers(1, 6, size=shape + (3, ))
+    res[:, :, RES["vp"]] = rng.integers(0, 3, size=shape)
+    res[:, :, RES["plus2"]] = rng.integers(0, 2, size=shape)
+    res[:, :, RES["armies"]] = rng.integers(0, 4, size=shape)
+    built = np.zeros(shape, dtype=np.int64)
+
+    for season in seasons:
+        claims = np.zeros(shape, dtype=np.int64)
+        for p in range(num_players):
+            apply_season_bonus(rng, rules, res, built, p, season)
+            influence_phase(rng, rules, res, claims, p)
+        for p in range(num_players):
+            build_phase(rng, rules, res, built, p)
+
+    combat_win = np.zeros(shape, dtype=bool)
+    enemy = np.zeros(shape, dtype=np.int64)
+    for p in range(num_players):
+        winter_phase(rng, rules, res, built, p, combat_win, enemy)
+
+    results = {r: res[:, :, i] for i, r in enumerate(RESOURCES)}
+    results["built"] = built
+    results["buildings"] = built_matrix(rules, built.ravel()).sum(
+        axis=1).reshape(shape)
+    results["combat_win"] = combat_win
+    results["enemy"] = enemy
+    return results
+
+
+# --- Agreement with the scalar engine ---------------------------------------
+
+COMPARED = ["wood", "stone", "gold", "armies", "vp", "buildings", "combat_win"]
+
+
+def simulate_scalar(num_games, num_players=2, seed=0):
+    # Same shape of results from main.simulate_real_mini_game
+    from renderers import NullRenderer
+    import stress
+
+    previous = main.set_renderer(NullRenderer())
+    templates = [{"name": f"Bot {i+1}", "type": "bot"}
+                 for i in range(num_players)]
+    players = stress.make_players(templates)
+    results = {key: np.zeros((num_games, num_players)) for key in COMPARED}
+    try:
+        with open(os.devnull, "w") as log_file:
+            for g in range(num_games):
+                final = stress.play_game(players, seed, g + 1,
+                                         log_file)["players"]
+                for p, state in enumerate(final):
+                    for key in COMPARED[:5]:
+                        results[key][g, p] = state[key]
+                    results["buildings"][g, p] = len(state["buildings"])
+                    results["combat_win"][g, p] = (
+                        state["combat_log"][-1]["result"] == "win")
+    finally:
+        main.set_renderer(previous)
+    return results
+
+
+def compare_with_scalar(batch_games=100000,
+                        scalar_games=5000,
+                        num_players=2,
+                        seed=0,
+                        z_limit=4.0):
+    # Two-sample z-score of every compared per-player mean
+    batch = simulate_batch(batch_games, num_players, seed)
+    scalar = simulate_scalar(scalar_games, num_players, seed)
+    report = {}
+    for key in COMPARED:
+        for p in range(num_players):
+            a = batch[key][:, p].astype(float)
+            b = scalar[key][:, p]
+            se = np.sqrt(a.var() / a.size + b.var() / b.size)
+            z = 0.0 if se == 0 else (a.mean() - b.mean()) / se
+            report[f"{key}[{p}]"] = (a.mean(), b.mean(), z)
+    agree = all(abs(z) <= z_limit for _, _, z in report.values())
+    return agree, report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batch Kingsburg simulator")
+    parser.add_argument("--games", type=int, default=100000)
+    parser.add_argument("--players", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--compare",
+                        type=int,
+                        default=0,
+                        help="also play this many scalar games and compare")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = simulate_batch(args.games, args.players, args.seed)
+    elapsed = time.perf_counter() - start
+    print(f"🧪 {args.games} batch games in {elapsed:.2f}s "
+          f"({args.games / elapsed:,.0f} games/s)")
+    for key in COMPARED:
+        print(f"  {key}: {results[key].mean(axis=0).round(3).tolist()}")
+
+    if args.compare:
+        agree, report = compare_with_scalar(args.games, args.compare,
+                                            args.players, args.seed)
+        for name, (batch_mean, scalar_mean, z) in report.items():
+            print(f"  {name}: batch {batch_mean:.3f} scalar {scalar_mean:.3f}"
+                  f" (z={z:+.2f})")
+        print("✅ Batch and scalar engines agree." if agree else
+              "❌ Batch and scalar engines disagree!")
@@ -0,0 +1,306 @@
+# Benchmarks for the engine hot paths, at fixed seeds.
+#
+# Each benchmark reports operations per second (best of several repeats).
+# Results are written as JSON, and compared with bench_baseline.json: a
+# benchmark fails when it runs more than KINGSBURG_BENCH_TOLERANCE (default
+# 0.3, i.e. 30%) slower than its baseline.
+#
+#   python bench_kingsburg.py                     # run, compare, write results
+#   python bench_kingsburg.py --update-baseline   # accept current numbers
+#
+# test_kingsburg.py runs the same benchmarks under pytest, with
+# KINGSBURG_BENCH=1 (plain pytest skips them).
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+import main
+from influence_solver import Solver
+from renderers import NullRenderer
+from rng_streams import GameStreams
+from season_odds import SeasonOdds, start_state
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(HERE, "bench_baseline.json")
+RESULTS_PATH = os.environ.get("KINGSBURG_BENCH_OUTPUT",
+                              os.path.join(HERE, "bench_results.json"))
+TOLERANCE = float(os.environ.get("KINGSBURG_BENCH_TOLERANCE", "0.3"))
+REPEATS = 5
+
+
+def make_bot(name="Bot 1"):
+    return main.PlayerState(name=name, type="bot")
+
+
+def random_player(rng):
+    # A bot with random resources and a legal random set of buildings
+    p = make_bot()
+    p.wood, p.stone, p.gold = (rng.randint(0, 8) for _ in range(3))
+    p.armies = rng.randint(0, 5)
+    for b, bit, prev_bit, row in main.building_rules:
+        if (not prev_bit or p.built & prev_bit) and rng.random() < 0.4:
+            p.add_building(b["level"])
+    return p
+
+
+def bench_simulate_game():
+    players = [make_bot("Bot 1"), make_bot("Bot 2")]
+    games = 200
+
+    def run():
+        for seed in range(games):
+            main.simulate_real_mini_game(players, main.all_buildings,
+                                         main.influencers, None, seed=seed)
+
+    return run, games
+
+
+def bench_simulate_game_streams():
+    # The same games, rolled from per-purpose streams (see rng_streams.py)
+    players = [make_bot("Bot 1"), make_bot("Bot 2")]
+    game = main.GameSession(rng=GameStreams())
+    games = 200
+
+    def run():
+        for seed in range(games):
+            main.simulate_real_mini_game(players, main.all_buildings,
+                                         main.influencers, None, seed=seed,
+                                         game=game)
+
+    return run, games
+
+
+def bench_dice_lookup():
+    rng = random.Random(1)
+    queries = []
+    for _ in range(10000):
+        num_dice = rng.choice([3, 4])
+        dice = tuple(sorted(rng.randint(1, 6) for _ in range(num_dice)))
+        queries.append((dice, rng.randrange(1 << num_dice)))
+
+    def run():
+        for dice_key, used_mask in queries:
+            main.get_reachable_advisors(dice_key, used_mask)
+
+    return run, len(queries)
+
+
+def bench_influencer_selection():
+    rng = random.Random(2)
+    rolls = [tuple(sorted(rng.randint(1, 6) for _ in range(3)))
+             for _ in range(2000)]
+    player = make_bot()
+    game = main.default_game
+
+    def run():
+        random.seed(2)
+        game.current_player = player
+        for dice_key in rolls:
+            game.influencer_owners = {}
+            used_mask = 0
+            while used_mask != 7:
+                used_mask = main.choose_influencer(game, dice_key,
+                                                   used_mask)
+                if used_mask is None:
+                    break
+
+    return run, len(rolls)
+
+
+def bench_influence_plan():
+    # Planned turns with a fresh solver: the first of each state is searched,
+    # the rest come from its memo
+    rng = random.Random(4)
+    advisors = list(main.influencers)
+    turns = []
+    for _ in range(2000):
+        num_dice = rng.choice([3, 4])
+        dice_key = tuple(sorted(rng.randint(1, 6) for _ in range(num_dice)))
+        blocked = sum(1 << val for val in rng.sample(advisors, 2))
+        turns.append((dice_key, blocked, rng.randint(0, 2)))
+
+    def run():
+        solver = Solver()
+        for dice_key, blocked, tokens in turns:
+            solver.solve(dice_key, 0, blocked, tokens)
+
+    return run, len(turns)
+
+
+def bench_season_odds():
+    # Exact Spring outcome distributions of the random bot, from scratch
+    rng = random.Random(5)
+    states = [
+        start_state(*(rng.randint(0, 5) for _ in range(4)))
+        for _ in range(20)
+    ]
+
+    def run():
+        odds = SeasonOdds()
+        for state in states:
+            odds.season(state, "Spring")
+
+    return run, len(states)
+
+
+def bench_buildable_set():
+    rng = random.Random(3)
+    states = [random_player(rng) for _ in range(2000)]
+    game = main.default_game
+
+    def run():
+        for p in states:
+            game.current_player = p
+            main.get_buildable(game)
+
+    return run, len(states)
+
+
+def bench_handle_winter():
+    rng = random.Random(4)
+    states = [random_player(rng) for _ in range(500)]
+    fields = ("wood", "stone", "gold", "armies", "vp")
+    starts = [tuple(getattr(p, f) for f in fields) for p in states]
+    rounds = 2000
+    game = main.default_game
+
+    def run():
+        random.seed(4)
+        for i in range(rounds):
+            p = states[i % len(states)]
+            for field, value in zip(fields, starts[i % len(states)]):
+                setattr(p, field, value)
+            p.combat_log = []
+            game.current_player = p
+            main.handle_winter(game, i % 5 + 1)
+
+    return run, rounds
+
+
+def bench_snapshot_restore():
+    rng = random.Random(5)
+    game = main.GameSession([random_player(rng), random_player(rng)])
+    for p in game.players:
+        p.combat_log = [{"round": 1, "enemy": "Goblins", "result": "win"}]
+    game.current_player = game.players[0]
+    game.influencer_owners = {5: "Bot 1", 12: "Bot 1"}
+    branches = 10000
+
+    def run():
+        start = game.snapshot()
+        for i in range(branches):
+            p = game.players[i & 1]
+            p.gold += 1
+            p.combat_log.append(None)
+            game.influencer_owners[i % 18 + 1] = p.name
+            game.restore(start)
+
+    return run, branches
+
+
+BENCHMARKS = {
+    "simulate_game": bench_simulate_game,
+    "simulate_game_streams": bench_simulate_game_streams,
+    "dice_lookup": bench_dice_lookup,
+    "influencer_selection": bench_influencer_selection,
+    "influence_plan": bench_influence_plan,
+    "season_odds": bench_season_odds,
+    "buildable_set": bench_buildable_set,
+    "handle_winter": bench_handle_winter,
+    "snapshot_restore": bench_snapshot_restore,
+}
+
+
+def run_benchmark(name, repeats=REPEATS):
+    previous = main.set_renderer(NullRenderer())
+    try:
+        run, ops = BENCHMARKS[name]()
+        best = float("inf")
+        for _ in range(repeats):
+            start = time.perf_counter()
+            run()
+            best = min(best, time.perf_counter() - start)
+    finally:
+        main.set_renderer(previous)
+    return {"ops": ops, "seconds": best, "ops_per_sec": ops / best}
+
+
+def load_baseline(path=BASELINE_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)["ops_per_sec"]
+
+
+def check_regression(name, result, baseline=None, tolerance=TOLERANCE):
+    # None if fine, else a message saying how much slower it got
+    baseline = load_baseline() if baseline is None else baseline
+    expected = baseline.get(name)
+    if expected is None:
+        return None
+    if result["ops_per_sec"] < expected * (1 - tolerance):
+        return (f"{name} regressed: {result['ops_per_sec']:,.0f} ops/s vs "
+                f"baseline {expected:,.0f} ops/s "
+                f"({result['ops_per_sec'] / expected - 1:+.0%}, "
+                f"tolerance -{tolerance:.0%})")
+    return None
+
+
+def write_results(results, path=RESULTS_PATH):
+    with open(path, "w") as f:
+        json.dump(
+            {
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "benchmarks": results,
+            },
+            f,
+            indent=2)
+
+
+def write_baseline(results, path=BASELINE_PATH):
+    with open(path, "w") as f:
+        json.dump(
+            {
+                "ops_per_sec": {
+                    name: round(result["ops_per_sec"], 1)
+                    for name, result in results.items()
+                }
+            },
+            f,
+            indent=2)
+        f.write("\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Kingsburg benchmarks")
+    parser.add_argument("names", nargs="*", default=list(BENCHMARKS))
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    baseline = load_baseline()
+    results = {}
+    failures = []
+    for name in args.names:
+        results[name] = run_benchmark(name)
+        print(f"  {name}: {results[name]['ops_per_sec']:,.0f} ops/s")
+        problem = check_regression(name, results[name], baseline)
+        if problem:
+            failures.append(problem)
+    write_results(results)
+    print(f"📄 Results saved to {RESULTS_PATH}")
+
+    if args.update_baseline:
+        write_baseline({**{n: {"ops_per_sec": v} for n, v in baseline.items()},
+                        **results})
+        print(f"📌 Baseline updated: {BASELINE_PATH}")
+    elif failures:
+        for problem in failures:
+            print(f"❌ {problem}")
+        sys.exit(1)
@@ -0,0 +1,335 @@
+# Streaming statistics over many games, in constant memory.
+#
+# GameStats is updated as each game ends and never keeps a game around:
+# means and variances are running (Welford's method), distributions are
+# histograms of small integers, so percentiles are exact. Two GameStats merge
+# into the stats of both sets of games (Chan et al.'s pairwise update for the
+# running moments), so parallel workers each keep their own and the results
+# are merged at the end, whatever the number of games.
+#
+# StatsRenderer feeds a GameStats from the engine's events, passing them on
+# to another renderer:
+#
+#   python stress.py --games 100000000 --stats stats.json
+#
+# What's collected, per player and game unless noted:
+#   vp              final VP: running moments and histogram
+#   win             1 for the top VP, split between tied players
+#   buildings       for each building built: VP and win rate
+#   advisors        for each advisor claimed at least once: VP and win rate
+#   combat          for each enemy level, per battle: win rate
+#   bonus_die       VP and win rate with and without a 4th die in some season
+#   kings_envoy     VP and win rate with and without the King's Envoy
+#   curves          goods (wood + stone + gold) and VP at the start of every
+#                   season and at the end: histograms with percentiles
+
+import json
+import math
+from collections import Counter
+
+PERCENTILES = (10, 25, 50, 75, 90)
+
+
+class RunningStats:
+    # Count, mean, variance, min and max of a stream of numbers
+
+    __slots__ = ("count", "mean", "m2", "min", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0  # sum of squared differences from the mean
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, x):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        if x < self.min:
+            self.min = x
+        if x > self.max:
+            self.max = x
+
+    def merge(self, other):
+        if not other.count:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def variance(self):
+        # Sample variance
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "stdev": math.sqrt(self.variance),
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+            "m2": self.m2,
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        stats = cls()
+        if d["count"]:
+            stats.count, stats.mean, stats.m2 = d["count"], d["mean"], d["m2"]
+            stats.min, stats.max = d["min"], d["max"]
+        return stats
+
+
+class Histogram:
+    # Counts of integer values
+
+    def __init__(self):
+        self.counts = Counter()
+
+    def add(self, x):
+        self.counts[x] += 1
+
+    def merge(self, other):
+        self.counts.update(other.counts)
+
+    def percentile(self, q):
+        # Smallest value with at least q% of the values at or below it
+        total = sum(self.counts.values())
+        if not total:
+            return None
+        rank = max(1, math.ceil(total * q / 100))
+        seen = 0
+        for value in sorted(self.counts):
+            seen += self.counts[value]
+            if seen >= rank:
+                return value
+
+    def to_dict(self):
+        return {
+            "counts": {str(v): self.counts[v] for v in sorted(self.counts)},
+            "percentiles": {
+                f"p{q}": self.percentile(q) for q in PERCENTILES
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        hist = cls()
+        hist.counts.update({int(v): n for v, n in d["counts"].items()})
+        return hist
+
+
+class Outcome:
+    # VP and win rate of the player-games in some group
+
+    __slots__ = ("vp", "win")
+
+    def __init__(self):
+        self.vp = RunningStats()
+        self.win = RunningStats()
+
+    def add(self, vp, win):
+        self.vp.add(vp)
+        self.win.add(win)
+
+    def merge(self, other):
+        self.vp.merge(other.vp)
+        self.win.merge(other.win)
+
+    def to_dict(self):
+        return {"vp": self.vp.to_dict(), "win": self.win.to_dict()}
+
+    @classmethod
+    def from_dict(cls, d):
+        outcome = cls()
+        outcome.vp = RunningStats.from_dict(d["vp"])
+        outcome.win = RunningStats.from_dict(d["win"])
+        return outcome
+
+
+def merge_into(mine, theirs, new):
+    # Merges a dict of mergeable stats into another, adding missing keys
+    for key, stats in theirs.items():
+        mine.setdefault(key, new()).merge(stats)
+
+
+class GameStats:
+
+    def __init__(self):
+        self.games = 0
+        self.vp = RunningStats()
+        self.vp_histogram = Histogram()
+        self.win = RunningStats()
+        self.buildings = {}  # level -> Outcome
+        self.advisors = {}  # advisor value -> Outcome
+        self.combat = {}  # enemy level -> RunningStats of wins
+        self.bonus_die = {True: Outcome(), False: Outcome()}
+        self.kings_envoy = {True: Outcome(), False: Outcome()}
+        self.curves = {}  # (checkpoint, "goods" or "vp") -> Histogram
+
+    def add_game(self, players, claimed, bonus_die, envoy):
+        # players' final state; claimed: name -> advisor values claimed;
+        # bonus_die, envoy: names of the players who had them
+        self.games += 1
+        top = max(p.vp for p in players)
+        winners = sum(1 for p in players if p.vp == top)
+        for p in players:
+            win = 1 / winners if p.vp == top else 0.0
+            self.vp.add(p.vp)
+            self.vp_histogram.add(p.vp)
+            self.win.add(win)
+            for level in p.buildings:
+                self.buildings.setdefault(level, Outcome()).add(p.vp, win)
+            for value in claimed.get(p.name, ()):
+                self.advisors.setdefault(value, Outcome()).add(p.vp, win)
+            self.bonus_die[p.name in bonus_die].add(p.vp, win)
+            self.kings_envoy[p.name in envoy].add(p.vp, win)
+
+    def add_battle(self, level, won):
+        self.combat.setdefault(level, RunningStats()).add(1 if won else 0)
+
+    def add_checkpoint(self, checkpoint, players):
+        for p in players:
+            self.curves.setdefault((checkpoint, "goods"), Histogram()).add(
+                p.wood + p.stone + p.gold)
+            self.curves.setdefault((checkpoint, "vp"), Histogram()).add(p.vp)
+
+    def merge(self, other):
+        self.games += other.games
+        self.vp.merge(other.vp)
+        self.vp_histogram.merge(other.vp_histogram)
+        self.win.merge(other.win)
+        merge_into(self.buildings, other.buildings, Outcome)
+        merge_into(self.advisors, other.advisors, Outcome)
+        merge_into(self.combat, other.combat, RunningStats)
+        merge_into(self.bonus_die, other.bonus_die, Outcome)
+        merge_into(self.kings_envoy, other.kings_envoy, Outcome)
+        merge_into(self.curves, other.curves, Histogram)
+
+    def to_dict(self):
+        # JSON-ready; from_dict(to_dict()) gives back mergeable stats
+        return {
+            "games": self.games,
+            "vp": self.vp.to_dict(),
+            "vp_histogram": self.vp_histogram.to_dict(),
+            "win": self.win.to_dict(),
+            "buildings": {
+                level: self.buildings[level].to_dict()
+                for level in sorted(self.buildings)
+            },
+            "advisors": {
+                str(value): self.advisors[value].to_dict()
+                for value in sorted(self.advisors)
+            },
+            "combat": {
+                str(level): self.combat[level].to_dict()
+                for level in sorted(self.combat)
+            },
+            "bonus_die": {
+                "with": self.bonus_die[True].to_dict(),
+                "without": self.bonus_die[False].to_dict(),
+            },
+            "kings_envoy": {
+                "with": self.kings_envoy[True].to_dict(),
+                "without": self.kings_envoy[False].to_dict(),
+            },
+            "curves": {
+                f"{checkpoint}/{measure}": hist.to_dict()
+                for (checkpoint, measure), hist in self.curves.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        stats = cls()
+        stats.games = d["games"]
+        stats.vp = RunningStats.from_dict(d["vp"])
+        stats.vp_histogram = Histogram.from_dict(d["vp_histogram"])
+        stats.win = RunningStats.from_dict(d["win"])
+        stats.buildings = {
+            level: Outcome.from_dict(o) for level, o in d["buildings"].items()
+        }
+        stats.advisors = {
+            int(value): Outcome.from_dict(o)
+            for value, o in d["advisors"].items()
+        }
+        stats.combat = {
+            int(level): RunningStats.from_dict(s)
+            for level, s in d["combat"].items()
+        }
+        for key, flag in (("with", True), ("without", False)):
+            stats.bonus_die[flag] = Outcome.from_dict(d["bonus_die"][key])
+            stats.kings_envoy[flag] = Outcome.from_dict(
+                d["kings_envoy"][key])
+        for name, hist in d["curves"].items():
+            checkpoint, measure = name.rsplit("/", 1)
+            stats.curves[checkpoint, measure] = Histogram.from_dict(hist)
+        return stats
+
+    def dump(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        return path
+
+
+class StatsRenderer:
+    # Updates a GameStats from the engine's events and passes every event on
+    # to the inner renderer (questions too)
+
+    def __init__(self, stats, inner):
+        self.stats = stats
+        self.inner = inner
+        self.ask = inner.ask
+        self.players = None
+        self.new_game([])
+
+    def new_game(self, players):
+        self.players = players
+        self.claimed = {}  # name -> set of advisor values
+        self.bonus_die = set()
+        self.envoy = set()
+        self.round = 1
+
+    def emit(self, kind, **fields):
+        handler = getattr(self, "on_" + kind, None)
+        if handler is not None:
+            handler(**fields)
+        self.inner.emit(kind, **fields)
+
+    def on_game_start(self, players, **fields):
+        self.new_game(players)
+
+    def on_season_start(self, season, **fields):
+        self.stats.add_checkpoint(f"round {self.round} {season}",
+                                  self.players)
+
+    def on_winter_start(self):
+        self.round += 1
+
+    def on_rolled(self, player, dice):
+        if len(dice) > 3:
+            self.bonus_die.add(player.name)
+
+    def on_influencer_chosen(self, player, value, **fields):
+        self.claimed.setdefault(player.name, set()).add(value)
+
+    def on_kings_envoy(self, player):
+        self.envoy.add(player.name)
+
+    def on_combat_won(self, player, enemy):
+        self.stats.add_battle(enemy["level"], True)
+
+    def on_combat_lost(self, player, enemy):
+        self.stats.add_battle(enemy["level"], False)
+
+    def on_game_end(self, players):
+        self.stats.add_checkpoint("end", players)
+        self.stats.add_game(players, self.claimed, self.bonus_die,
+                            self.envoy)
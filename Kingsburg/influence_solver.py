@@ -0,0 +1,200 @@
+# Best way to spend a turn's dice on advisors.
+#
+# The random bot (main.choose_influencer) claims one advisor at a time. The
+# solver instead tries every way to split the dice among several advisors:
+# every sequence of claims, each taking the dice the rules take for its sum
+# (main.get_reachable_advisors), with or without a +2 token, until the dice
+# run out or stopping is worth more. It returns the plan worth the most under
+# a value function, which is pluggable: any advisor value -> worth callable,
+# plus what a spent +2 token costs.
+#
+# Advisors claimed by other players are blocked unless the player has the
+# King's Envoy. Two building effects are modelled that main.py does not play
+# yet, so plans for the engine leave them at 0 (as SolverBot does), and they
+# are there to value the buildings:
+#   influence_bonus   pips the player may add to claims' dice sums this season
+#   extra_advisor     advisors claimed by others the player may still claim
+#
+# Plans are memoized per solver by (sorted dice, used dice, blocked advisors
+# the dice could reach, tokens, pips, passes). There are only a few thousand
+# such states in practice, so after a few games nearly every turn is a hit.
+#
+#   python influence_solver.py --games 500   # solver bot vs. random bot
+
+import argparse
+
+import main
+from search_bot import (GOODS, RESOURCES, advisor_actions, apply_effects,
+                        play_match, player_resources)
+
+# VP a resource is worth, as SearchBot weighs them by default
+WEIGHTS = {
+    "wood": 0.4,
+    "stone": 0.4,
+    "gold": 0.4,
+    "armies": 0.1,
+    "vp": 1.0,
+    "plus2": 0.6
+}
+
+# Resources assumed when valuing an advisor away from any game: enough of
+# everything that losing or trading a good is always possible
+NOMINAL = tuple(10 for _ in RESOURCES)
+
+max_advisor = max(main.influencers)
+
+
+def outcome_worth(start, res, weights):
+    return sum(weights[r] * (after - before)
+               for r, before, after in zip(RESOURCES, start, res))
+
+
+def best_outcome(res, val, weights=WEIGHTS):
+    # (worth, answers) of the best way to resolve advisor val's actions
+    return max((outcome_worth(res, new, weights), answers)
+               for new, answers in apply_effects(res, advisor_actions[val]))
+
+
+def advisor_worth(weights=WEIGHTS):
+    # The default value function: what each advisor's best outcome is worth
+    worth = {
+        val: best_outcome(NOMINAL, val, weights)[0]
+        for val in main.influencers
+    }
+    return worth.__getitem__
+
+
+def blocked_advisors(game, p):
+    # Bitmask of advisor values p can't claim this season
+    if p.kings_envoy:
+        return 0
+    mask = 0
+    for val, owner in game.influencer_owners.items():
+        if owner != p.name:
+            mask |= 1 << val
+    return mask
+
+
+class Solver:
+
+    def __init__(self, value=None, token_cost=WEIGHTS["plus2"]):
+        self.value = value or advisor_worth()
+        self.token_cost = token_cost
+        self.plans = {}  # state key -> (worth, plan)
+        self.within_reach = {}  # (dice key, pips) -> bitmask of advisors
+        self.hits = 0
+        self.misses = 0
+
+    def solve(self, dice_key, used_mask=0, blocked=0, tokens=0, pips=0,
+              passes=0):
+        # (worth, plan) for the rest of a turn. A plan is a tuple of claims
+        # (advisor, dice sum, dice mask, token used, pips added) in the order
+        # they're made; () means claim nothing. blocked is a bitmask of
+        # advisor values.
+        dice_left = len(dice_key) - bin(used_mask).count("1")
+        key = (dice_key, used_mask, blocked & self.reach(dice_key, pips),
+               min(tokens, dice_left), pips, min(passes, dice_left))
+        found = self.plans.get(key)
+        if found is not None:
+            self.hits += 1
+            return found
+        self.misses += 1
+        found = self.search(*key)
+        self.plans[key] = found
+        return found
+
+    def reach(self, dice_key, pips):
+        # Advisors some claim with these dice could be, so the blocked mask
+        # can ignore the rest
+        mask = self.within_reach.get((dice_key, pips))
+        if mask is None:
+            mask = 0
+            for base in range(1, sum(dice_key) + 1):
+                for val in range(base, min(base + 2 + pips, max_advisor) + 1):
+                    mask |= 1 << val
+            self.within_reach[dice_key, pips] = mask
+        return mask
+
+    def search(self, dice_key, used_mask, blocked, tokens, pips, passes):
+        best = (0.0, ())
+        reachable = main.get_reachable_advisors(dice_key, used_mask)
+        for base, dice in reachable.items():
+            for token in (0, 1) if tokens else (0, ):
+                for added in range(pips + 1):
+                    val = base + 2 * token + added
+                    if val not in main.influencers:
+                        continue
+                    is_blocked = blocked >> val & 1
+                    if is_blocked and not passes:
+                        continue
+                    worth, plan = self.solve(dice_key, used_mask | dice,
+                                             blocked, tokens - token,
+                                             pips - added,
+                                             passes - is_blocked)
+                    worth += self.value(val) - token * self.token_cost
+                    if worth > best[0]:
+                        best = (worth, ((val, base, dice, token, added), ) +
+                                plan)
+        return best
+
+
+class SolverBot:
+    # Bot policy: plans each turn's claims with a Solver, builds and answers
+    # like the random bot (so a match measures the influence phase alone),
+    # except that advisors' choices are answered for the most worth
+
+    def __init__(self, solver=None, weights=WEIGHTS):
+        self.solver = solver or Solver()
+        self.weights = weights
+        self.answers = []
+
+    def __getstate__(self):
+        # The memo is rebuilt in whichever process the policy ends up in
+        state = dict(self.__dict__)
+        state["solver"] = Solver(self.solver.value, self.solver.token_cost)
+        return state
+
+    def choose_advisor(self, game, p, dice_key, used_mask,
+                       available_options):
+        _, plan = self.solver.solve(dice_key, used_mask,
+                                    blocked_advisors(game, p), p.plus2)
+        if not plan:
+            return "0"
+        val, base, _, token, _ = plan[0]
+        self.answers = list(
+            best_outcome(player_resources(p), val, self.weights)[1])
+        return f"{base}+2" if token else str(base)
+
+    def choose_building(self, game, p, buildable):
+        return game.rng.choice(buildable)
+
+    def choose_resource(self, p):
+        if self.answers and isinstance(self.answers[0], str):
+            return self.answers.pop(0)
+        self.answers = []
+        return min(GOODS, key=lambda r: getattr(p, r))
+
+    def choose_number(self, p, count):
+        if self.answers and isinstance(self.answers[0], int):
+            number = self.answers.pop(0)
+            if number <= count:
+                return number
+        self.answers = []
+        return 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Influence solver bot vs. random bot")
+    parser.add_argument("--games", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    bot = SolverBot()
+    baseline = play_match(args.games, [None, None], args.seed)
+    solved = play_match(args.games, [bot, None], args.seed)
+    solver = bot.solver
+    print(f"Random vs random: {baseline[0]:.2f} VP vs {baseline[1]:.2f} VP")
+    print(f"Solver vs random: {solved[0]:.2f} VP vs {solved[1]:.2f} VP")
+    print(f"{len(solver.plans)} plans memoized, "
+          f"{solver.hits / max(1, solver.hits + solver.misses):.0%} memo hits")
@@ -1,50 +1,270 @@
 import random
-import itertools
-import json
+from functools import partial
 
-# Load influencers and enemies
-with open("board.json", "r") as f:
-    board = json.load(f)
-    influencers = {char["value"]: char for char in board["characters"]}
+from profiling import Profiler, enabled_by_env
+from renderers import ConsoleRenderer, NullRenderer
+from rng_streams import SharedStream
+from ruleset import get_ruleset
 
-with open("player_building_sheet.json", "r") as f:
-    all_buildings = json.load(f)["buildings"]
+# Load influencers and buildings (see ruleset.py; cached after the first run)
+rules = get_ruleset()
+board = rules["board"]
+influencers = rules["influencers"]
+all_buildings = rules["all_buildings"]
 
-def get_new_player_state():
-    return {
-        "wood": 3, "stone": 3, "gold": 3, "armies": 0, "vp": 0, "plus2": 0,
-        "buildings": [], "combat_log": [], "bonus_die": False, "kings_envoy": False,
-        "type": "human", "name": "Player"
-    }
+# Sorted dice -> [used dice mask -> {reachable advisor value: dice mask}]
+dice_outcomes = rules["dice_outcomes"]
 
-players = [
-]  # Each entry will be a dict with type ("human" or "bot") and their own player stats
 
-# Load all enemies once at start
-with open("bad_guy_cards.json", "r") as f:
-    all_enemies = json.load(f)
+def get_reachable_advisors(dice_key, used_mask):
+    return dice_outcomes[dice_key][used_mask]
 
 
-# Emojis for resources
-resource_emojis = {"wood": "🟫", "stone": "🔘", "gold": "🟡"}
+buildings_by_level = {b["level"]: b for b in all_buildings}
 
 
-def show_resources(p):
-    print(f"\n{p['name']}'s current resources:")
-    for key in ["wood", "stone", "gold", "armies", "vp", "plus2"]:
-        label = "+2 Tokens" if key == "plus2" else key.capitalize()
-        emoji = resource_emojis.get(key, "")
-        print(f"  {label}: {p[key]} {emoji}")
-    print()
+def new_effect_summary():
+    # What a player's buildings add up to, kept current by add_building_effects
+    # so the combat/season/build rules never rescan all_buildings
+    return {
+        "tie_breaker": False,
+        "unlocked_rows": set(),
+        "vp_per_win": 0,
+        "defense": 0,  # against every enemy
+        "enemy_defense": {},  # e.g. {"demon": 1} against matching enemies
+        "season_bonuses": {},  # season (lowercase) -> [(resource, amount)]
+        "influence_bonus": 0,
+        "extra_advisors": 0,
+    }
 
 
-def roll_dice(for_player):
-    num_dice = 3 + (1 if for_player.get("bonus_die", False) else 0)
-    return [random.randint(1, 6) for _ in range(num_dice)]
+def add_building_effects(summary, building):
+    for effect in building.get("effects", []):
+        typ = effect["type"]
+        if typ == "gain":
+            res = effect["resource"]
+            if res == "defense":
+                summary["defense"] += effect["amount"]
+            elif res.endswith("_defense"):
+                enemy = res[:-len("_defense")]
+                summary["enemy_defense"][enemy] = summary["enemy_defense"].get(
+                    enemy, 0) + effect["amount"]
+        elif typ == "tie_breaker":
+            summary["tie_breaker"] = True
+        elif typ == "unlock_rows":
+            summary["unlocked_rows"].update(effect.get("rows", []))
+        elif typ == "bonus_vp_per_win":
+            summary["vp_per_win"] += effect["amount"]
+        elif typ == "season_bonus":
+            summary["season_bonuses"].setdefault(
+                effect["season"].lower(), []).append(
+                    (effect["resource"], effect["amount"]))
+        elif typ == "influence_bonus":
+            summary["influence_bonus"] += effect["amount"]
+        elif typ == "extra_advisor":
+            summary["extra_advisors"] += effect["amount"]
+
+
+def summarize_building_effects(levels):
+    summary = new_effect_summary()
+    for level in levels:
+        add_building_effects(summary, buildings_by_level[level])
+    return summary
+
+
+# Each building is one bit, row by row: level "r.c" -> bit (r-1)*row_width + c-1
+row_width = max(int(b["level"].split(".")[1]) for b in all_buildings)
+
+
+def get_building_bit(level):
+    row, col = map(int, level.split("."))
+    return 1 << ((row - 1) * row_width + col - 1)
+
+
+building_bits = {b["level"]: get_building_bit(b["level"]) for b in all_buildings}
+row_masks = {}  # row -> bits of every building in that row
+for level, bit in building_bits.items():
+    row = int(level.split(".")[0])
+    row_masks[row] = row_masks.get(row, 0) | bit
+
+# Effect summaries depend only on which buildings are built, so players with
+# the same buildings share one summary. Treat them as read-only.
+effect_summaries = {}
+
+
+def get_effect_summary(built):
+    summary = effect_summaries.get(built)
+    if summary is None:
+        summary = summarize_building_effects(
+            level for level, bit in building_bits.items() if built & bit)
+        effect_summaries[built] = summary
+    return summary
+
+
+class PlayerState:
+    # Compact player state: int resource fields and the buildings as a bitmask
+    # (see building_bits). Resource names picked at runtime can still be used
+    # as p[resource]. A bot with a policy (see search_bot.py) asks it for its
+    # decisions; without one it picks at random.
+    __slots__ = ("name", "type", "wood", "stone", "gold", "armies", "vp",
+                 "plus2", "built", "effect_summary", "combat_log",
+                 "bonus_die", "kings_envoy", "policy")
+
+    def __init__(self, name="Player", type="human"):
+        self.name = name
+        self.type = type
+        self.wood = 3
+        self.stone = 3
+        self.gold = 3
+        self.armies = 0
+        self.vp = 0
+        self.plus2 = 0
+        self.built = 0
+        self.effect_summary = get_effect_summary(0)
+        self.combat_log = []
+        self.bonus_die = False
+        self.kings_envoy = False
+        self.policy = None
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        setattr(self, key, value)
+
+    @property
+    def buildings(self):
+        # Built levels in sheet order, e.g. ["1.1", "2.1"]
+        return [level for level, bit in building_bits.items() if self.built & bit]
+
+    def has_building(self, level):
+        return bool(self.built & building_bits[level])
+
+    def add_building(self, level):
+        self.built |= building_bits[level]
+        self.effect_summary = get_effect_summary(self.built)
+
+    def reset_buildings(self):
+        self.built = 0
+        self.effect_summary = get_effect_summary(0)
+
+    def snapshot(self):
+        # Everything that changes during a game, as an immutable tuple; the
+        # combat log's entries are shared, not copied
+        return (self.wood, self.stone, self.gold, self.armies, self.vp,
+                self.plus2, self.built, self.bonus_die, self.kings_envoy,
+                tuple(self.combat_log))
+
+    def restore(self, snapshot):
+        (self.wood, self.stone, self.gold, self.armies, self.vp, self.plus2,
+         self.built, self.bonus_die, self.kings_envoy, combat_log) = snapshot
+        self.effect_summary = get_effect_summary(self.built)
+        self.combat_log[:] = combat_log
 
 
-def setup_players():
-    global players, auto_play
+def get_new_player_state():
+    return PlayerState()
+
+
+class GameSession:
+    # One game in progress: the players, whose turn it is, who has claimed
+    # which advisor this season, and where the game is (the round, i.e. the
+    # level of its winter enemy, and how many seasons are left before that
+    # winter), plus the renderer it talks to and the random stream it rolls
+    # with (see rng_streams.py). Every rule function below takes the session it plays, so
+    # any number of games can be in progress in one process.
+    #
+    # snapshot() is a cheap immutable tuple and restore() puts the game back
+    # in place, so search and what-if rollouts can branch off a position
+    # without deep copies. The players themselves must stay the same objects.
+    __slots__ = ("players", "current_player", "influencer_owners",
+                 "current_round", "seasons_left", "auto_play", "renderer",
+                 "rng")
+
+    def __init__(self, players=None, renderer=None, rng=None):
+        self.players = players if players is not None else []
+        self.current_player = None
+        self.influencer_owners = {}  # advisor value -> player name
+        self.current_round = 1
+        self.seasons_left = 0
+        self.auto_play = False
+        # Defaults: the module's renderer (see set_renderer), a fresh stream
+        self.renderer = renderer if renderer is not None else globals()[
+            "renderer"]
+        self.rng = rng if rng is not None else SharedStream()
+
+    def snapshot(self):
+        return (tuple(p.snapshot() for p in self.players),
+                self.current_player, tuple(self.influencer_owners.items()),
+                self.current_round, self.seasons_left)
+
+    def restore(self, snapshot):
+        (player_snapshots, self.current_player, owners, self.current_round,
+         self.seasons_left) = snapshot
+        for p, player_snapshot in zip(self.players, player_snapshots):
+            p.restore(player_snapshot)
+        self.influencer_owners.clear()
+        self.influencer_owners.update(owners)
+
+
+# Enemy kinds that some building defends against, e.g. "demon"
+enemy_defense_kinds = rules["enemy_defense_kinds"]
+
+# All enemies, their reward/loss text already parsed
+all_enemies = rules["all_enemies"]
+
+# Level -> that level's deck of enemy cards
+enemy_decks = {}
+for enemy in all_enemies:
+    enemy_decks.setdefault(enemy["level"], []).append(enemy)
+
+
+# All game output goes through a renderer (see renderers.py): the session's,
+# which defaults to this one
+renderer = ConsoleRenderer()
+
+# The console game's session. It rolls with the random module itself, so
+# random.seed() seeds it.
+default_game = GameSession(rng=SharedStream(random))
+
+
+def set_renderer(new_renderer):
+    # Sets the renderer of the default game and of sessions created after
+    global renderer
+    previous = renderer
+    renderer = new_renderer
+    default_game.renderer = new_renderer
+    return previous
+
+
+def ask_resource(game, p, prompt):
+    # Bots pick a resource at random; humans are asked through the renderer
+    if p.type == "bot":
+        if p.policy is not None:
+            return p.policy.choose_resource(p)
+        return game.rng.choice(["wood", "stone", "gold"])
+    return game.renderer.ask(prompt).lower()
+
+
+def ask_number(game, p, prompt, count):
+    # Bots pick a random menu entry; humans type one (may raise ValueError)
+    if p.type == "bot":
+        if p.policy is not None:
+            return p.policy.choose_number(p, count)
+        return game.rng.randint(1, count)
+    return int(game.renderer.ask(prompt))
+
+
+def show_resources(game, p):
+    game.renderer.emit("resources", player=p)
+
+
+def roll_dice(game, for_player):
+    num_dice = 3 + (1 if for_player.bonus_die else 0)
+    return game.rng.roll(num_dice)
+
+
+def setup_players(game):
     print("\n🎲 Welcome to Kingsburg Console Edition!")
     print("\nSelect a game mode:")
     print("1. Computer vs Computer")
@@ -57,144 +277,173 @@ def setup_players():
         if user_input == "1":
             # Computer vs Computer
             print("Starting a Computer vs Computer game.")
-            auto_play = True
+            game.auto_play = True
             for i in range(2):
                 p = get_new_player_state()
-                p["type"] = "bot"
-                p["name"] = f"Bot {i+1}"
-                players.append(p)
+                p.type = "bot"
+                p.name = f"Bot {i+1}"
+                game.players.append(p)
             return
         
         elif user_input == "2":
             # Human vs Computer
             print("Starting a Human vs Computer game.")
-            auto_play = False
+            game.auto_play = False
             # Add human player
             p = get_new_player_state()
-            p["type"] = "human"
-            p["name"] = "Player 1"
-            players.append(p)
+            p.type = "human"
+            p.name = "Player 1"
+            game.players.append(p)
             # Add bot player
             p = get_new_player_state()
-            p["type"] = "bot"
-            p["name"] = "Bot 1"
-            players.append(p)
+            p.type = "bot"
+            p.name = "Bot 1"
+            game.players.append(p)
             return
         
         elif user_input == "3":
             # Human vs Human
             print("Starting a Human vs Human game.")
-            auto_play = False
+            game.auto_play = False
             for i in range(2):
                 p = get_new_player_state()
-                p["type"] = "human"
-                p["name"] = f"Player {i+1}"
-                players.append(p)
+                p.type = "human"
+                p.name = f"Player {i+1}"
+                game.players.append(p)
             return
         
         else:
             print("❌ Invalid choice. Please enter 1, 2, or 3.")
 
 
-def get_possible_sums(dice):
-    sums = {}
-    for i in range(1, len(dice) + 1):
-        for combo in itertools.combinations(range(len(dice)), i):
-            dice_vals = tuple(dice[i] for i in combo)
-            dice_sum = sum(dice_vals)
-            if dice_sum not in sums:
-                sums[dice_sum] = []
-            sums[dice_sum].append(combo)
-    return sums
-
-
-def display_influencer_options(possible_sums, used_indices):
-    print("\nAvailable influencer options:")
-    shown = set()
-    for val, combos in possible_sums.items():
-        if val in influencers:
-            for combo in combos:
-                if all(i not in used_indices for i in combo):
-                    if val not in shown:
-                        print(
-                            f"{val}: {influencers[val]['name']} - {influencers[val]['benefit']}"
-                        )
-                        shown.add(val)
-                        print()
-    if not shown:
-        print("No valid influencer options left.")
-        print()
-
-
-def apply_actions(p, actions):
-    for action in actions:
-        typ = action["type"]
-        resource = action.get("resource")
+def display_influencer_options(game, dice_key, used_mask):
+    # The table itself, not get_reachable_advisors: choose_influencer makes
+    # the same lookup next, and profiling counts each decision once
+    shown = list(dice_outcomes[dice_key][used_mask])
+    game.renderer.emit("influencer_options",
+                       options=shown,
+                       influencers=influencers)
 
-        if typ == "gain":
-            p[resource] += action["amount"]
-            print(f"Gained {action['amount']} {resource}.")
-        elif typ == "lose":
-            p[resource] = max(0, p[resource] - action["amount"])
-            print(f"Lost {action['amount']} {resource}.")
-        elif typ == "choose":
-            handle_choose_action(p, {**action, "resource": resource})
-        elif typ == "trade":
-            handle_trade_action(p, action)
-        elif typ == "peek":
-            print("You peeked at the top enemy card! (feature coming soon)")
+
+# Each board.json action type compiles once, at load, into a closure that
+# takes the game and the player. New advisors are a data change; a new action
+# type needs one compiler here.
+def compile_gain(action):
+    resource, amount = action["resource"], action["amount"]
+
+    def gain(game, p):
+        setattr(p, resource, getattr(p, resource) + amount)
+        game.renderer.emit("gain", player=p, resource=resource, amount=amount)
+
+    return gain
+
+
+def compile_lose(action):
+    resource, amount = action["resource"], action["amount"]
+
+    def lose(game, p):
+        setattr(p, resource, max(0, getattr(p, resource) - amount))
+        game.renderer.emit("lose", player=p, resource=resource, amount=amount)
+
+    return lose
+
+
+def compile_choose(action):
+    return lambda game, p: handle_choose_action(game, p, action)
+
+
+def compile_trade(action):
+    return lambda game, p: handle_trade_action(game, p, action)
+
+
+def compile_peek(action):
+    return lambda game, p: game.renderer.emit("peek", player=p)
+
+
+action_compilers = {
+    "gain": compile_gain,
+    "lose": compile_lose,
+    "choose": compile_choose,
+    "trade": compile_trade,
+    "peek": compile_peek,
+}
+
+
+def compile_actions(actions):
+    compiled = []
+    for action in actions:
+        compiler = action_compilers.get(action["type"])
+        if compiler is None:
+            typ = action["type"]
+            compiled.append(lambda game, p, typ=typ: game.renderer.emit(
+                "unknown_action", type=typ))
         else:
-            print(f"Unknown action type: {typ}")
+            compiled.append(compiler(action))
+    return tuple(compiled)
 
 
-def choose_influencer(possible_sums, dice, used_indices):
-    global current_player
+# Influencer value -> compiled actions
+compiled_actions = {
+    val: compile_actions(char.get("actions", []))
+    for val, char in influencers.items()
+}
+
+
+def apply_actions(game, p, compiled):
+    for run in compiled:
+        run(game, p)
 
-    all_combos = {}  # Map from influencer value → dice combo
-    for val, combos in possible_sums.items():
-        if val in influencers:
-            for combo in combos:
-                if all(i not in used_indices for i in combo):
-                    all_combos[val] = combo
-                    break
+
+def choose_influencer(game, dice_key, used_mask):
+    # Returns the updated used-dice mask, or None if the player is done
+
+    # Map from influencer value → dice mask
+    all_combos = get_reachable_advisors(dice_key, used_mask)
 
     if not all_combos:
-        print("No valid influencer options remaining.\n")
-        return False
+        game.renderer.emit("no_influencer_options", player=game.current_player)
+        return None
 
     while True:
         try:
-            print("\nAvailable influencer options:")
             available_options = []
             for val in sorted(all_combos):
-                already_claimed = influencer_owners.get(val)
-                if already_claimed and already_claimed != current_player[
-                        "name"] and not current_player.get(
-                            "kings_envoy", False):
+                already_claimed = game.influencer_owners.get(val)
+                if already_claimed and already_claimed != game.current_player.name and not game.current_player.kings_envoy:
                     continue  # Skip showing blocked advisors
                 available_options.append(val)
-                print(
-                    f"  {val}: {influencers[val]['name']} - {influencers[val]['benefit']}"
-                )
-            print()
-
-            if current_player["type"] == "bot":
-                choice = random.choice(available_options)
-                print(
-                    f"🤖 {current_player['name']} chooses influencer {choice}")
-                raw = str(choice)
+            game.renderer.emit("influencer_menu",
+                               options=available_options,
+                               influencers=influencers)
+
+            if game.current_player.type == "bot":
+                if game.current_player.policy is not None:
+                    # e.g. "10", "8+2", or "0" to stop
+                    raw = game.current_player.policy.choose_advisor(
+                        game, game.current_player, dice_key, used_mask,
+                        available_options)
+                    if raw == "0":
+                        return None
+                else:
+                    if not available_options:
+                        return None  # Every reachable advisor is taken
+                    raw = str(game.rng.choice(available_options))
+                game.renderer.emit("bot_influencer_choice",
+                                   player=game.current_player,
+                                   value=raw)
             else:
-                raw = input(
+                raw = game.renderer.ask(
                     "\nType the number of the influencer you want to use (e.g., '10+2', or '0' to skip): "
                 ).strip().lower()
 
             if raw == "0":
-                return False
+                return None
 
             used_plus_two = False
             if "+2" in raw:
-                if current_player.get("plus2", 0) <= 0:
-                    print("❌ You don't have any +2 tokens.")
+                if game.current_player.plus2 <= 0:
+                    game.renderer.emit("invalid_input",
+                                       message="You don't have any +2 tokens.")
                     continue
                 base = raw.replace("+2", "").strip()
                 choice = int(base)
@@ -205,168 +454,317 @@ def choose_influencer(possible_sums, dice, used_indices):
                 actual_value = choice
 
             if actual_value not in influencers:
-                print("❌ Invalid choice. No such influencer.")
+                game.renderer.emit(
+                    "invalid_input",
+                    message="Invalid choice. No such influencer.")
                 continue
 
-            if influencer_owners.get(actual_value) and influencer_owners[
-                    actual_value] != current_player["name"]:
-                if not current_player.get("kings_envoy", False):
-                    print(
-                        f"❌ {actual_value} is already claimed by {influencer_owners[actual_value]}. You can't influence it."
+            if game.influencer_owners.get(actual_value) and game.influencer_owners[
+                    actual_value] != game.current_player.name:
+                if not game.current_player.kings_envoy:
+                    game.renderer.emit(
+                        "invalid_input",
+                        message=
+                        f"{actual_value} is already claimed by {game.influencer_owners[actual_value]}. You can't influence it."
                     )
                     continue
                 else:
-                    print(
-                        f"👑 Using King's Envoy to influence an occupied advisor!"
-                    )
-
-            if not used_plus_two and actual_value not in all_combos:
-                print(
-                    "❌ You can't reach that influencer with your remaining dice."
+                    game.renderer.emit("kings_envoy_used",
+                                       player=game.current_player)
+
+            # A +2 token adds to the dice: they still have to make the rest
+            if choice not in all_combos:
+                game.renderer.emit(
+                    "invalid_input",
+                    message=
+                    "You can't reach that influencer with your remaining dice."
                 )
                 continue
 
             influencer = influencers[actual_value]
-            print(f"\nYou chose {influencer['name']} ({actual_value})!")
-            print(f"Benefit: {influencer['benefit']}\n")
+            game.renderer.emit("influencer_chosen",
+                               player=game.current_player,
+                               value=actual_value,
+                               influencer=influencer,
+                               plus2=used_plus_two)
 
             if used_plus_two:
-                current_player["plus2"] -= 1
-                print("Used one +2 token.\n")
+                game.current_player.plus2 -= 1
+                game.renderer.emit("plus2_used", player=game.current_player)
 
-            apply_actions(current_player, influencer.get("actions", []))
+            apply_actions(game, game.current_player,
+                          compiled_actions[actual_value])
 
-            if not used_plus_two:
-                used_indices.update(all_combos[actual_value])
+            used_mask |= all_combos[choice]
 
-            influencer_owners[actual_value] = current_player["name"]
+            game.influencer_owners[actual_value] = game.current_player.name
 
-            return True
+            return used_mask
 
         except ValueError:
-            print(
-                "❌ Invalid input. Please enter a number like '10' or '12+2'.")
+            game.renderer.emit(
+                "invalid_input",
+                message="Invalid input. Please enter a number like '10' or '12+2'."
+            )
 
 
-def play_season(season_name):
-    print(f"\n=== {season_name.upper()} ===")
-    global influencer_owners
-    influencer_owners = {}
-    global current_player
-    current_player = players[0]  # Set player manually for now
+def play_season(game, season_name):
+    game.renderer.emit("season_start",
+                       season=season_name,
+                       season_upper=season_name.upper())
+    game.influencer_owners = {}
+    game.current_player = game.players[0]  # Set player manually for now
 
     if season_name != "Winter":
-        apply_seasonal_bonuses(season_name)
+        game.seasons_left = 2 - ["Spring", "Summer", "Fall"].index(season_name)
+        apply_seasonal_bonuses(game, season_name)
         if season_name in ["Spring", "Summer", "Fall"]:
-            award_kings_envoy()
-        show_resources()
-        if not auto_play:
-            input("Press Enter to roll your dice: ")
-        current_player = players[0]  # or whichever player should go first
-        dice = roll_dice(current_player)
-        used_indices = set()
-        print(f"\nYou rolled: {dice}")
-
-        possible_sums = get_possible_sums(dice)
-
-        while len(used_indices) < 3:
-            display_influencer_options(possible_sums, used_indices)
-            if not choose_influencer(possible_sums, dice, used_indices):
+            award_kings_envoy(game)
+        show_resources(game, game.current_player)
+        if not game.auto_play:
+            game.renderer.ask("Press Enter to roll your dice: ")
+        game.current_player = game.players[0]  # or whichever player should go first
+        dice = roll_dice(game, game.current_player)
+        game.renderer.emit("rolled", player=game.current_player, dice=dice)
+
+        dice_key = tuple(sorted(dice))
+        used_mask = 0
+        while used_mask != (1 << len(dice)) - 1:
+            display_influencer_options(game, dice_key, used_mask)
+            used_mask = choose_influencer(game, dice_key, used_mask)
+            if used_mask is None:
                 break
 
         # 💥 Add this line here
-        build_phase()
+        build_phase(game)
 
     else:
-        print("\n--- Winter Combat ---")
+        game.renderer.emit("winter_start")
         return True  # trigger winter handling
 
 
-def assign_bonus_dice():
-    if len(players) <= 1:
+def assign_bonus_dice(game):
+    if len(game.players) <= 1:
         return  # No bonus needed for solo play
 
-    min_vp = min(player["vp"] for player in players)
+    min_vp = min(player.vp for player in game.players)
 
-    for player in players:
-        if player["vp"] == min_vp:
-            player["bonus_die"] = True
-            print(f"🎲 {player['name']} will get a bonus die next year!")
+    for player in game.players:
+        if player.vp == min_vp:
+            player.bonus_die = True
+            game.renderer.emit("bonus_die", player=player)
         else:
-            player["bonus_die"] = False
+            player.bonus_die = False
+
+
+def play_full_game(game, rounds=5):
+    # A full game in which every player plays every season (play_season only
+    # plays the first player). Used by the game server (see server.py).
+    for step in full_game_steps(game, rounds):
+        step()
+
+
+def full_game_steps(game, rounds=5):
+    # The full game as steps, in order: each a function of no arguments that
+    # plays one player's turn, build or battle, or what comes between them,
+    # and starts from nothing but the session's state. play_full_game runs
+    # them straight through; the game server plays a step again from its
+    # start after it stopped to wait for a human's answer (see server.py).
+    yield partial(announce, game, "game_start", seed=None,
+                  players=game.players)
+    for round_num in range(1, rounds + 1):
+        for season in ["Spring", "Summer", "Fall"]:
+            yield partial(start_season, game, round_num, season)
+            for p in game.players:
+                yield partial(play_turn, game, p, season)
+            for p in game.players:
+                yield partial(play_build, game, p)
+
+        yield partial(announce, game, "winter_start")
+        for p in game.players:
+            yield partial(play_battle, game, p, round_num)
+        yield partial(assign_bonus_dice, game)
+    yield partial(announce, game, "game_end", players=game.players)
+
+
+def announce(game, kind, **fields):
+    game.renderer.emit(kind, **fields)
+
+
+def start_season(game, round_num, season):
+    game.current_round = round_num
+    game.seasons_left = 2 - ["Spring", "Summer", "Fall"].index(season)
+    game.renderer.emit("season_start",
+                       season=season,
+                       season_upper=season.upper())
+    game.influencer_owners = {}
+    award_kings_envoy(game)
+
+
+def play_turn(game, p, season):
+    game.current_player = p
+    apply_seasonal_bonuses(game, season)
+    show_resources(game, p)
+    dice = roll_dice(game, p)
+    game.renderer.emit("rolled", player=p, dice=dice)
+
+    dice_key = tuple(sorted(dice))
+    used_mask = 0
+    while used_mask != (1 << len(dice)) - 1:
+        display_influencer_options(game, dice_key, used_mask)
+        used_mask = choose_influencer(game, dice_key, used_mask)
+        if used_mask is None:
+            break
+
+
+def play_build(game, p):
+    game.current_player = p
+    build_phase(game)
+
+
+def play_battle(game, p, round_num):
+    game.current_player = p
+    handle_winter(game, round_num)
+
+
+def simulate_real_mini_game(players, all_buildings, influencers, log_file,
+                            seed=None, game=None):
+    # Plays a whole game in the given session (default: the console game's)
+    turns = play_mini_game(game or default_game, players, log_file, seed)
+    while True:
+        try:
+            next(turns)
+        except StopIteration as done:
+            return done.value
+
 
+def play_mini_game(game, players, log_file, seed=None):
+    # The mini-game one step at a time: yields after every player's turn,
+    # build and battle, and returns the final state. Stepping several of
+    # these in turn interleaves their games (see play_interleaved).
+    game.players = players
 
-def simulate_real_mini_game(players, all_buildings, influencers, log_file):
-    global current_player, influencer_owners
+    # The text log is optional; structured logs are built from the events
+    # this function emits (see sim_log.py)
+    write_log = log_file.write if log_file is not None else lambda text: None
+
+    # A seeded game can be replayed on its own (see stress.py)
+    if seed is not None:
+        game.rng.seed(seed)
+        write_log(f"GAME SEED {seed}\n")
 
     # Setup players cleanly
     for p in players:
-        p["wood"] = random.randint(1, 5)
-        p["stone"] = random.randint(1, 5)
-        p["gold"] = random.randint(1, 5)
-        p["vp"] = random.randint(0, 2)
-        p["plus2"] = random.randint(0, 1)
-        p["armies"] = random.randint(0, 3)
-        p["buildings"] = []
-        p["kings_envoy"] = False
-        p["combat_log"] = []
-        log_file.write(
-            f"NEW GAME for {p['name']} -- {p['wood']}W/{p['stone']}S/{p['gold']}G, {p['vp']} VP, {p['armies']} armies.\n"
+        p.wood = game.rng.randint(1, 5)
+        p.stone = game.rng.randint(1, 5)
+        p.gold = game.rng.randint(1, 5)
+        p.vp = game.rng.randint(0, 2)
+        p.plus2 = game.rng.randint(0, 1)
+        p.armies = game.rng.randint(0, 3)
+        p.reset_buildings()
+        p.kings_envoy = False
+        p.combat_log = []
+        write_log(
+            f"NEW GAME for {p.name} -- {p.wood}W/{p.stone}S/{p.gold}G, {p.vp} VP, {p.armies} armies.\n"
         )
+    game.renderer.emit("game_start", seed=seed, players=players)
+    game.current_round = 1
 
     # Play 2 seasons: Spring, Summer
     for season in ["Spring", "Summer"]:
-        log_file.write(f"\n== {season.upper()} ==\n")
-        influencer_owners = {}
-
-        for current_player in players:
+        game.seasons_left = 1 if season == "Spring" else 0
+        write_log(f"\n== {season.upper()} ==\n")
+        game.renderer.emit("season_start",
+                           season=season,
+                           season_upper=season.upper())
+        game.influencer_owners = {}
+
+        for p in players:
+            game.current_player = p
             # Seasonal bonuses
-            apply_seasonal_bonuses(season)
+            apply_seasonal_bonuses(game, season)
 
             # Roll dice
-            dice = roll_dice(current_player)
-            log_file.write(f"{current_player['name']} rolled {dice}\n")
+            dice = roll_dice(game, game.current_player)
+            write_log(f"{game.current_player.name} rolled {dice}\n")
+            game.renderer.emit("rolled", player=game.current_player, dice=dice)
             # Take snapshot BEFORE influencing
-            before_wood = current_player["wood"]
-            before_stone = current_player["stone"]
-            before_gold = current_player["gold"]
-            before_vp = current_player["vp"]
-
-            used_indices = set()
+            before_wood = game.current_player.wood
+            before_stone = game.current_player.stone
+            before_gold = game.current_player.gold
+            before_vp = game.current_player.vp
 
-            possible_sums = get_possible_sums(dice)
+            dice_key = tuple(sorted(dice))
+            used_mask = 0
 
             # Influencer picks until dice exhausted
-            while len(used_indices) < len(dice):
-                display_influencer_options(possible_sums, used_indices)
-                success = choose_influencer(possible_sums, dice, used_indices)
-                if not success:
+            while used_mask != (1 << len(dice)) - 1:
+                display_influencer_options(game, dice_key, used_mask)
+                used_mask = choose_influencer(game, dice_key, used_mask)
+                if used_mask is None:
                     break
+            yield
 
         # Building phase after all players' dice done
-        for current_player in players:
-            build_phase()
+        for p in players:
+            game.current_player = p
+            build_phase(game)
+            yield
 
     # Handle Winter Combat
-    log_file.write("\n== WINTER ==\n")
-    for current_player in players:
-        handle_winter(1)  # We'll just pass dummy round 1 for now
+    write_log("\n== WINTER ==\n")
+    for p in players:
+        game.current_player = p
+        handle_winter(game, 1)  # We'll just pass dummy round 1 for now
+        yield
 
-    log_file.write("\nFinal State:\n")
+    write_log("\nFinal State:\n")
     for p in players:
-        log_file.write(
-            f"{p['name']}: {p['wood']}W/{p['stone']}S/{p['gold']}G, {p['vp']} VP, Buildings: {p.get('buildings',[])}\n"
+        write_log(
+            f"{p.name}: {p.wood}W/{p.stone}S/{p.gold}G, {p.vp} VP, Buildings: {p.buildings}\n"
         )
-    log_file.write("\n" + "=" * 40 + "\n\n")
+    write_log("\n" + "=" * 40 + "\n\n")
+    game.renderer.emit("game_end", players=players)
+
+    return [{
+        "name": p.name,
+        "wood": p.wood,
+        "stone": p.stone,
+        "gold": p.gold,
+        "armies": p.armies,
+        "vp": p.vp,
+        "buildings": p.buildings,
+        "combat_log": list(p.combat_log),
+    } for p in players]
+
+
+def play_interleaved(games):
+    # games: [(session, players, log_file, seed)], each session with its own
+    # players. Steps every game in turn until all are over; returns their
+    # final states in the same order. Each session rolls with its own
+    # generator, so a seeded game plays the same as it would alone.
+    running = {i: play_mini_game(*game) for i, game in enumerate(games)}
+    results = [None] * len(games)
+    while running:
+        for i, turns in list(running.items()):
+            try:
+                next(turns)
+            except StopIteration as done:
+                results[i] = done.value
+                del running[i]
+    return results
 
 
-def run_random_stress_test(players, all_buildings, influencers):
+def run_random_stress_test(players, all_buildings, influencers,
+                           headless=True):
     if len(players) == 2:
         print("\n⏩ Skipping stress test (two-player game detected).")
         return
 
     print("\n🧪 Running REAL Kingsburg mini-game stress test (100 games)...")
     log_path = "stress_test_log.txt"
+    # The simulated games talk to a null renderer unless asked otherwise
+    previous = set_renderer(NullRenderer()) if headless else renderer
     with open(log_path, "w") as log_file:
         try:
             for i in range(1, 101):
@@ -379,127 +777,153 @@ def run_random_stress_test(players, all_buildings, influencers):
                 f"\n❌ Error during simulation at game {i}: {e}\n")
             print(f"❌ Error during simulation at game {i}: {e}")
             return
+        finally:
+            set_renderer(previous)
 
     print(
         f"\n✅ REAL Kingsburg stress test completed successfully!\n📄 Log saved to {log_path}\n"
     )
+    dump_profile()
 
 
 def main():
-    setup_players()
-    run_random_stress_test(players, all_buildings, influencers)
+    game = default_game
+    setup_players(game)
+    run_random_stress_test(game.players, all_buildings, influencers)
     for round_num in range(1, 6):
+        game.current_round = round_num
         print(f"\n======= ROUND {round_num} =======")
         for season in ["Spring", "Summer", "Fall", "Winter"]:
-            is_winter = play_season(season)
+            is_winter = play_season(game, season)
             if is_winter:
-                handle_winter(round_num)
-                assign_bonus_dice()
-
-
-auto_play = False
-
-
-def has_crane():
-    for b in all_buildings:
-        if b["level"] in current_player["buildings"]:
-            for effect in b.get("effects", []):
-                if effect["type"] == "unlock_rows" and "rows" in effect:
-                    if 3 in effect["rows"] or 4 in effect["rows"]:
-                        return True
-    return False
-
-
-def apply_enemy_reward(p, reward_str):
-    if "gold" in reward_str:
-        amount = int(reward_str.split("+")[1].split()[0])
-        p["gold"] += amount
-        print(f"Gained {amount} gold.")
-    elif "victory point" in reward_str:
-        amount = int(reward_str.split("+")[1].split()[0])
-        p["vp"] += amount
-        print(f"Gained {amount} victory point(s).")
-    elif "resource of your choice" in reward_str:
-        amount = int(reward_str.split("+")[1].split()[0])
-        for _ in range(amount):
-            choice = input(
-                "Choose a resource to gain (wood/stone/gold): ").lower()
-            if choice in p:
-                p[choice] += 1
-                print(f"Gained 1 {choice}.")
-    elif "resources of your choice" in reward_str:
-        amount = int(reward_str.split("+")[1].split()[0])
-        for _ in range(amount):
-            choice = input(
-                "Choose a resource to gain (wood/stone/gold): ").lower()
-            if choice in p:
-                p[choice] += 1
-                print(f"Gained 1 {choice}.")
-    elif "defense" in reward_str:
-        amount = int(reward_str.split("+")[1].split()[0])
-        p["armies"] += amount
-        print(f"Gained {amount} defense (armies).")
-    print()
-
-
-def build_phase():
-    print("\n🏗 BUILDING PHASE")
-    print("Your current buildings:", ", ".join(player["buildings"]) or "None")
-    print()
-
-    if current_player["type"] == "bot":
-        if affordable:
-            building = random.choice(affordable)
-            for res, amt in building["cost"].items():
-                current_player[res] -= amt
-            current_player["buildings"].append(building["level"])
-            print(f"🤖 {current_player['name']} built {building['name']} ({building['level']})!\n")
-            apply_building_effects(building.get("effects", []))
+                handle_winter(game, round_num)
+                assign_bonus_dice(game)
+    dump_profile()
+
+
+
+def has_crane(game):
+    rows = game.current_player.effect_summary["unlocked_rows"]
+    return 3 in rows or 4 in rows
+
+
+def apply_enemy_reward(game, p, rewards):
+    for resource, amount in rewards:
+        if resource == "any":
+            for _ in range(amount):
+                choice = ask_resource(
+                    game, p, "Choose a resource to gain (wood/stone/gold): ")
+                if choice in ["wood", "stone", "gold"]:
+                    p[choice] += 1
+                    game.renderer.emit("gain",
+                                       player=p,
+                                       resource=choice,
+                                       amount=1)
+        elif resource != "building":
+            p[resource] += amount
+            game.renderer.emit("enemy_reward",
+                               player=p,
+                               resource=resource,
+                               amount=amount)
+    game.renderer.emit("section_end")
+
+
+# The building sheet as a prerequisite DAG: (building, its bit, bit of the
+# building before it in its row or 0, row). Rows 3 and 4 also need a building
+# in rows 1 and 2, unless the player has unlocked them (the Crane).
+building_rules = [(b, building_bits[b["level"]],
+                   building_bits[b["level"]] >> 1
+                   if b["level"].split(".")[1] != "1" else 0,
+                   int(b["level"].split(".")[0])) for b in all_buildings]
+
+# What can be built depends only on the buildings built and on resources up to
+# the most any building costs, so buildable sets are indexed by exactly that:
+# after the first time, "what can I build now" is one dict lookup. There are
+# few building sets in practice, and at most 6*4*5 resource cases for each.
+# Like effect summaries, the sets are shared; treat them as read-only.
+cost_caps = tuple(
+    max(b["cost"][res] for b in all_buildings)
+    for res in ("wood", "stone", "gold"))
+unlocked_sets = {}  # built -> (building, wood, stone, gold cost) not yet built
+buildable_sets = {}  # (built, capped wood, stone, gold) -> buildable tuple
+
+
+def get_unlocked(built):
+    # Buildings whose prerequisites are met, in sheet order
+    unlocked = unlocked_sets.get(built)
+    if unlocked is None:
+        rows = get_effect_summary(built)["unlocked_rows"]
+        gate_open = (3 in rows or 4 in rows
+                     or (built & row_masks[1] and built & row_masks[2]))
+        unlocked = tuple(
+            (b, b["cost"]["wood"], b["cost"]["stone"], b["cost"]["gold"])
+            for b, bit, prev_bit, row in building_rules
+            if not built & bit and (not prev_bit or built & prev_bit) and (
+                row not in (3, 4) or gate_open))
+        unlocked_sets[built] = unlocked
+    return unlocked
+
+
+def find_buildable(built, wood, stone, gold):
+    max_wood, max_stone, max_gold = cost_caps
+    key = (built, wood if wood < max_wood else max_wood,
+           stone if stone < max_stone else max_stone,
+           gold if gold < max_gold else max_gold)
+    buildable = buildable_sets.get(key)
+    if buildable is None:
+        buildable = tuple(
+            b for b, wood_cost, stone_cost, gold_cost in get_unlocked(built)
+            if wood >= wood_cost and stone >= stone_cost and gold >= gold_cost)
+        buildable_sets[key] = buildable
+    return buildable
+
+
+def get_buildable(game):
+    p = game.current_player
+    return find_buildable(p.built, p.wood, p.stone, p.gold)
+
+
+def construct_building(game, b):
+    cost = b["cost"]
+    game.current_player.wood -= cost["wood"]
+    game.current_player.stone -= cost["stone"]
+    game.current_player.gold -= cost["gold"]
+    game.current_player.add_building(b["level"])
+
+
+def build_phase(game):
+    game.renderer.emit("build_phase_start", player=game.current_player)
+
+    buildable = get_buildable(game)
+
+    if game.current_player.type == "bot":
+        # Bot finishes building phase immediately
+        if not buildable:
+            game.renderer.emit("bot_cannot_build", player=game.current_player)
+            return
+        if game.current_player.policy is not None:
+            building = game.current_player.policy.choose_building(
+                game, game.current_player, buildable)
         else:
-            print(f"🤖 {current_player['name']} cannot afford any building.\n")
-        return  # Bot finishes building phase immediately
-
-
-    # Filter valid buildings
-    buildable = []
-    for b in all_buildings:
-        level = b["level"]
-        row, col = map(int, level.split("."))
-
-        # Skip if already built
-        if level in player["buildings"]:
-            continue
-
-        # Must have the previous building in the row (unless it's the first one)
-        if col > 1 and f"{row}.{col-1}" not in player["buildings"]:
-            continue
-
-        # For rows 3 and 4: require row 1 and 2 unless you have Crane
-        if row in [3, 4] and not has_crane():
-            if not any(b.startswith("1.")
-                       for b in player["buildings"]) or not any(
-                           b.startswith("2.") for b in player["buildings"]):
-                continue
-
-        # Check if affordable
-        cost = b["cost"]
-        if (player["wood"] >= cost["wood"] and player["stone"] >= cost["stone"]
-                and player["gold"] >= cost["gold"]):
-            buildable.append(b)
+            building = game.rng.choice(buildable)
+        if building is None:
+            game.renderer.emit("bot_skipped_build", player=game.current_player)
+            return
+        construct_building(game, building)
+        game.renderer.emit("bot_built",
+                           player=game.current_player,
+                           building=building)
+        apply_building_effects(game, building.get("effects", []))
+        return
 
     if not buildable:
-        print("You can't build anything this season.")
+        game.renderer.emit("cannot_build", player=game.current_player)
         return
 
-    print("\nYou can build:")
-    for i, b in enumerate(buildable, 1):
-        c = b["cost"]
-        print(
-            f"{i}: {b['name']} ({b['level']}) - Cost: {c['wood']}W/{c['stone']}S/{c['gold']}G - {b['benefit']}"
-        )
+    game.renderer.emit("build_menu", buildable=buildable)
 
     try:
-        choice = input(
+        choice = game.renderer.ask(
             "Type the number of the building you want to construct (or press Enter to skip): "
         ).strip()
         if not choice:
@@ -507,199 +931,139 @@ def build_phase():
         index = int(choice) - 1
         if 0 <= index < len(buildable):
             b = buildable[index]
-            level = b["level"]
-            cost = b["cost"]
-            player["wood"] -= cost["wood"]
-            player["stone"] -= cost["stone"]
-            player["gold"] -= cost["gold"]
-            player["buildings"].append(level)
-            print(f"✅ You built the {b['name']}! ({level})")
-            print(f"🏆 Benefit: {b['benefit']}")
-            apply_building_effects(b.get("effects", []))
+            construct_building(game, b)
+            game.renderer.emit("built", player=game.current_player, building=b)
+            apply_building_effects(game, b.get("effects", []))
+            game.renderer.emit("section_end")
         else:
-            print("Invalid choice.")
-        print()
+            game.renderer.emit("invalid_choice")
+            game.renderer.emit("section_end")
     except ValueError:
-        print("Invalid input.")
+        game.renderer.emit("invalid_input", message="Invalid input.")
 
 
-def get_building_defense_bonus(enemy_name):
-    total = 0
-    enemy_name = enemy_name.lower()
+def get_building_defense_bonus(game, enemy):
+    summary = game.current_player.effect_summary
+    total = summary["defense"]
 
-    for b in all_buildings:
-        if b["level"] in player["buildings"]:
-            for effect in b.get("effects", []):
-                if effect["type"] != "gain":
-                    continue
-
-                res = effect["resource"]
-                amt = effect["amount"]
-
-                if res == "defense":
-                    total += amt
-                elif res == "demon_defense" and "demon" in enemy_name:
-                    total += amt
-                elif res == "zombie_defense" and "zombie" in enemy_name:
-                    total += amt
-                elif res == "goblin_defense" and "goblin" in enemy_name:
-                    total += amt
+    for kind in enemy["defense_kinds"]:
+        total += summary["enemy_defense"].get(kind, 0)
 
     return total
 
 
-def apply_building_effects(effects):
+def apply_building_effects(game, effects):
     for effect in effects:
-        typ = effect["type"]
-
-        if typ == "gain":
+        if effect["type"] == "gain":
             res = effect["resource"]
             amt = effect["amount"]
             if res == "any":
                 for i in range(amt):
-                    choice = input(
+                    choice = ask_resource(
+                        game, game.current_player,
                         f"Choose a resource to gain ({i+1} of {amt}): wood/stone/gold: "
-                    ).lower()
+                    )
                     if choice in ["wood", "stone", "gold"]:
-                        current_player[choice] += 1
-                        print(f"Gained 1 {choice}.")
-            else:
-                player[res] = player.get(res, 0) + amt
-                print(f"Gained {amt} {res}.")
-
-        elif typ == "season_bonus":
-            print(
-                f"(Note: +{effect['amount']} {effect['resource']} bonus in {effect['season']})"
-            )
-
-        elif typ == "influence_bonus":
-            print(f"(Note: +{effect['amount']} influence per season)")
-
-        elif typ == "tie_breaker":
-            print("You now win ties in combat.")
-
-        elif typ == "extra_advisor":
-            print(f"You may influence {effect['amount']} extra advisor(s).")
-
-        elif typ == "bonus_vp_per_win":
-            print(f"(Note: +{effect['amount']} VP per combat win)")
-
-        elif typ == "unlock_rows":
-            print(f"(Unlocked building rows: {effect['rows']})")
-
-        else:
-            print(f"⚠️ Unknown effect type: {typ}")
-
-        print()  # Add line break for readability
-
-
-def apply_loss_penalty(p, loss_str):
-    print("\n🩸 Applying penalty...")
-
-    tokens = [t.strip().lower() for t in loss_str.replace(',', '').split()]
-    i = 0
-
-    while i < len(tokens):
-        if tokens[i].startswith('-'):
-            try:
-                amount = int(tokens[i][1:])
-            except ValueError:
-                print(f"⚠️ Couldn't parse number from: {tokens[i]}")
-                i += 1
-                continue
-
-            if i + 1 >= len(tokens):
-                break
-
-            kind = tokens[i + 1]
-
-            if kind in [
-                    "vp", "victory", "victorypoint", "victorypoints", "point",
-                    "points"
-            ]:
-                p["vp"] = max(0, p["vp"] - amount)
-                print(f"❌ Lost {amount} VP.")
-            elif kind == "resource" or kind == "resources":
-                # Deduct any resources randomly
-                pool = []
-                for r in ["wood", "stone", "gold"]:
-                    pool += [r] * p[r]
-                if not pool:
-                    print("No resources to lose.")
-                else:
-                    for _ in range(amount):
-                        if not pool:
-                            break
-                        chosen = random.choice(pool)
-                        p[chosen] -= 1
-                        pool = [
-                            r for r in pool if r != chosen or p[r] > 0
-                        ]
-                        print(f"❌ Lost 1 {chosen}.")
-            elif kind in ["wood", "stone", "gold"]:
-                p[kind] = max(0, p[kind] - amount)
-                print(f"❌ Lost {amount} {kind}.")
-            elif kind == "building":
-                print("❌ Lost 1 building. (Feature not implemented yet.)")
+                        game.current_player[choice] += 1
+                        game.renderer.emit("gain",
+                                           player=game.current_player,
+                                           resource=choice,
+                                           amount=1)
+            elif not res.endswith("defense"):
+                # Defense bonuses live in the effect summary, not on the player
+                game.current_player[res] += amt
+
+        # Other effect types are passive; the renderer just describes them
+        game.renderer.emit("building_effect",
+                           player=game.current_player,
+                           effect=effect)
+
+
+def apply_loss_penalty(game, p, losses):
+    game.renderer.emit("penalty_start", player=p)
+
+    for resource, amount in losses:
+        if resource == "any":
+            # Deduct any resources randomly
+            pool = []
+            for r in ["wood", "stone", "gold"]:
+                pool += [r] * p[r]
+            if not pool:
+                game.renderer.emit("no_resources_to_lose", player=p)
             else:
-                print(f"⚠️ Unknown penalty type: {kind}")
-
-            i += 2
+                for _ in range(amount):
+                    if not pool:
+                        break
+                    chosen = game.rng.choice(pool)
+                    p[chosen] -= 1
+                    pool = [r for r in pool if r != chosen or p[r] > 0]
+                    game.renderer.emit("penalty",
+                                       player=p,
+                                       resource=chosen,
+                                       amount=1)
+        elif resource == "building":
+            game.renderer.emit("building_lost", player=p)
         else:
-            i += 1
+            p[resource] = max(0, p[resource] - amount)
+            game.renderer.emit("penalty", player=p, resource=resource,
+                               amount=amount)
 
 
-def handle_choose_action(p, action):
+def handle_choose_action(game, p, action):
     res = action["resource"]
     amount = action["amount"]
 
     if isinstance(res, list) and all(isinstance(r, list) for r in res):
         # This is a list of resource combinations to choose from
-        print("\nChoose one of the following resource combinations:")
-        for i, combo in enumerate(res, 1):
-            print(f"{i}: " + " + ".join(combo))
+        game.renderer.emit("combo_menu", combos=res)
         while True:
             try:
-                choice = int(input("Your choice: "))
+                choice = ask_number(game, p, "Your choice: ", len(res))
                 if 1 <= choice <= len(res):
                     for r in res[choice - 1]:
                         p[r] += 1
-                        print(f"Gained 1 {r}.")
+                        game.renderer.emit("gain",
+                                           player=p,
+                                           resource=r,
+                                           amount=1)
                     break
                 else:
-                    print("Invalid choice.")
+                    game.renderer.emit("invalid_choice")
             except ValueError:
-                print("Please enter a number.")
+                game.renderer.emit("number_required")
     elif res == "any":
         for i in range(amount):
-            choice = input(
+            choice = ask_resource(
+                game, p,
                 f"Choose a resource to gain ({i+1} of {amount}): wood/stone/gold: "
-            ).lower()
+            )
             if choice in ["wood", "stone", "gold"]:
                 p[choice] += 1
-                print(f"Gained 1 {choice}.")
+                game.renderer.emit("gain", player=p, resource=choice,
+                                   amount=1)
             else:
-                print("Invalid resource.")
+                game.renderer.emit("invalid_resource")
     elif isinstance(res, list):
-        print("Choose one of the following options:")
-        for i, option in enumerate(res, 1):
-            print(f"{i}: {option}")
+        game.renderer.emit("option_menu", options=res)
         while True:
             try:
-                choice = int(input("Your choice: "))
+                choice = ask_number(game, p, "Your choice: ", len(res))
                 if 1 <= choice <= len(res):
                     selected = res[choice - 1]
                     p[selected] += amount
-                    print(f"Gained {amount} {selected}.")
+                    game.renderer.emit("gain",
+                                       player=p,
+                                       resource=selected,
+                                       amount=amount)
                     break
                 else:
-                    print("Invalid choice.")
+                    game.renderer.emit("invalid_choice")
             except ValueError:
-                print("Please enter a number.")
+                game.renderer.emit("number_required")
 
 
-def handle_trade_action(p, action):
-    print("\n--- Trade Action ---")
+def handle_trade_action(game, p, action):
+    game.renderer.emit("trade_start", player=p)
     resources = ["wood", "stone", "gold"]
     choices = []
 
@@ -710,194 +1074,209 @@ def handle_trade_action(p, action):
             choices.append((give, get))
 
     if not choices:
-        print("You don't have any resources to trade.")
+        game.renderer.emit("no_trade", player=p)
         return
 
-    for i, (give, get) in enumerate(choices, 1):
-        print(f"{i}: Give 1 {give} → Gain 1 {get[0]} and 1 {get[1]}")
+    game.renderer.emit("trade_menu", choices=choices)
 
     while True:
         try:
-            choice = int(input("Choose your trade option: "))
+            choice = ask_number(game, p, "Choose your trade option: ",
+                                len(choices))
             if 1 <= choice <= len(choices):
                 give, get = choices[choice - 1]
                 p[give] -= 1
                 p[get[0]] += 1
                 p[get[1]] += 1
-                print(f"Gave 1 {give}, gained 1 {get[0]} and 1 {get[1]}.")
+                game.renderer.emit("traded", player=p, give=give, get=get)
                 break
             else:
-                print("Invalid choice.")
+                game.renderer.emit("invalid_choice")
         except ValueError:
-            print("Please enter a number.")
+            game.renderer.emit("number_required")
 
 
-def get_random_enemy_for_level(level):
-    options = [e for e in all_enemies if e["level"] == level]
-    return random.choice(options) if options else None
+def get_random_enemy_for_level(game, level):
+    deck = enemy_decks.get(level)
+    return game.rng.draw_enemy(deck) if deck else None
 
 
-def handle_winter(round_number):
+def handle_winter(game, round_number):
     level = round_number  # level matches the round
-    enemy = get_random_enemy_for_level(level)
+    enemy = get_random_enemy_for_level(game, level)
 
     if not enemy:
-        print("No enemy found for this round.")
+        game.renderer.emit("no_enemy", round=round_number)
         return
 
-    print(f"\n⚔️  Enemy: {enemy['name']}")
-    print(f"   Strength: {enemy['strength']}")
-    print(f"   Reward if you win: {enemy['reward']}")
-    print(f"   Penalty if you lose: {enemy['loss']}")
+    game.renderer.emit("enemy", enemy=enemy)
 
     # Roll the King's die
-    king_die = random.randint(1, 6)
-    building_defense = get_building_defense_bonus(enemy["name"])
-    total_power = player["armies"] + king_die + building_defense
+    king_die = game.rng.king_die()
+    building_defense = get_building_defense_bonus(game, enemy)
+    total_power = game.current_player.armies + king_die + building_defense
 
-    print(f"\n🛡️  Your Armies: {player['armies']}")
-    print(f"👑 King's Die: {king_die}")
-    print(f"🏰 Building Defense Bonus: {building_defense}")
-    print(f"⚔️  Total Power: {total_power}")
+    game.renderer.emit("combat",
+                       player=game.current_player,
+                       king_die=king_die,
+                       building_defense=building_defense,
+                       total_power=total_power)
 
     enemy_strength = enemy["strength"]
-    tie_breaker = has_tie_breaker()
+    tie_breaker = has_tie_breaker(game)
     if tie_breaker:
-        print("🏰 You have a tie-breaker building!")
+        game.renderer.emit("tie_breaker", player=game.current_player)
 
     if total_power > enemy_strength or (total_power == enemy_strength
                                         and tie_breaker):
 
-        print("✅ You defeated the enemy!")
-        apply_enemy_reward(enemy["reward"])
-        bonus_vp = get_bonus_vp_per_win()
+        game.renderer.emit("combat_won",
+                           player=game.current_player,
+                           enemy=enemy)
+        apply_enemy_reward(game, game.current_player, enemy["rewards"])
+        bonus_vp = get_bonus_vp_per_win(game)
         if bonus_vp > 0:
-            player["vp"] += bonus_vp
-            print(f"🏆 Bonus: Gained {bonus_vp} VP from your buildings!")
-            print()
-        player["combat_log"].append({
+            game.current_player.vp += bonus_vp
+            game.renderer.emit("bonus_vp",
+                               player=game.current_player,
+                               amount=bonus_vp)
+        game.current_player.combat_log.append({
             "round": round_number,
             "enemy": enemy["name"],
             "result": "win"
         })
     else:
-        print("❌ You lost the battle!")
-        player["combat_log"].append({
+        game.renderer.emit("combat_lost",
+                           player=game.current_player,
+                           enemy=enemy)
+        game.current_player.combat_log.append({
             "round": round_number,
             "enemy": enemy["name"],
             "result": "loss"
         })
-        apply_loss_penalty(enemy["loss"])
+        apply_loss_penalty(game, game.current_player, enemy["losses"])
 
     if (round_number == 5):
-        show_final_summary()
+        show_final_summary(game)
 
 
-def show_final_summary():
-    print("\n🎉 GAME OVER — Final Summary 🎉")
-    print("-" * 40)
+def show_final_summary(game):
+    building_names = {
+        level: b["name"]
+        for level, b in buildings_by_level.items()
+    }
+    game.renderer.emit("final_summary",
+                       player=game.current_player,
+                       building_names=building_names)
+
+
+def apply_seasonal_bonuses(game, season_name):
+    game.renderer.emit("seasonal_check",
+                       player=game.current_player,
+                       season=season_name)
+    bonuses = game.current_player.effect_summary["season_bonuses"].get(
+        season_name.lower(), [])
+
+    for res, amt in bonuses:
+        if res == "any":
+            for i in range(amt):
+                choice = ask_resource(
+                    game, game.current_player,
+                    f"Choose a resource to gain ({i+1} of {amt}): wood/stone/gold: "
+                )
+                if choice in ["wood", "stone", "gold"]:
+                    game.current_player[choice] += 1
+                    game.renderer.emit("gain",
+                                       player=game.current_player,
+                                       resource=choice,
+                                       amount=1)
+            game.renderer.emit("section_end")
+        else:
+            game.current_player[res] += amt
+            game.renderer.emit("seasonal_gain",
+                               player=game.current_player,
+                               resource=res,
+                               amount=amt)
 
-    print(f"\n🏆 Total Victory Points: {player['vp']}")
-    print(
-        f"🎯 Resources Left: Wood: {player['wood']}, Stone: {player['stone']}, Gold: {player['gold']}"
-    )
-    print(f"🎲 +2 Tokens Left: {player['plus2']}")
-    print()
-
-    print("🏰 Buildings Constructed:")
-    if player["buildings"]:
-        for b in player["buildings"]:
-            name = next(build["name"] for build in all_buildings
-                        if build["level"] == b)
-            print(f"  - {b}: {name}")
-    else:
-        print("  None")
+    if not bonuses:
+        game.renderer.emit("no_seasonal_bonus", player=game.current_player)
 
-    print()
 
-    print("⚔️  Combat Log:")
-    if player.get("combat_log"):
-        for entry in player["combat_log"]:
-            result = "✅ WIN" if entry["result"] == "win" else "❌ LOSS"
-            print(f"  Round {entry['round']}: {entry['enemy']} - {result}")
-    else:
-        print("  No combat recorded.")
-
-    print("\nThanks for playing Kingsburg Console Edition!")
-    print("-" * 40)
-    print()
-
-
-def apply_seasonal_bonuses(season_name):
-    print(f"\n🌞 Checking seasonal bonuses for {season_name}...")
-    triggered = False
-
-    for b in all_buildings:
-        if b["level"] in player["buildings"]:
-            for effect in b.get("effects", []):
-                if effect["type"] == "season_bonus" and effect["season"].lower(
-                ) == season_name.lower():
-                    amt = effect["amount"]
-                    res = effect["resource"]
-
-                    if res == "any":
-                        for i in range(amt):
-                            choice = input(
-                                f"Choose a resource to gain ({i+1} of {amt}): wood/stone/gold: "
-                            ).lower()
-                            if choice in ["wood", "stone", "gold"]:
-                                player[choice] += 1
-                                print(f"Gained 1 {choice}.")
-                    else:
-                        player[res] += amt
-                        print(f"Gained {amt} {res} from seasonal bonus.")
-
-                    triggered = True
-                    print()
-
-    if not triggered:
-        print("No seasonal bonuses this round.\n")
-
-
-def has_tie_breaker():
-    for b in all_buildings:
-        if b["level"] in player["buildings"]:
-            for effect in b.get("effects", []):
-                if effect["type"] == "tie_breaker":
-                    return True
-    return False
-
-
-def get_bonus_vp_per_win():
-    total = 0
-    for b in all_buildings:
-        if b["level"] in player["buildings"]:
-            for effect in b.get("effects", []):
-                if effect["type"] == "bonus_vp_per_win":
-                    total += effect["amount"]
-    return total
+def has_tie_breaker(game):
+    return game.current_player.effect_summary["tie_breaker"]
+
+
+def get_bonus_vp_per_win(game):
+    return game.current_player.effect_summary["vp_per_win"]
 
 
-def award_kings_envoy():
-    if len(players) <= 1:
+def award_kings_envoy(game):
+    if len(game.players) <= 1:
         return  # No envoy needed for solo
 
-    fewest_buildings = min(len(p.get("buildings", [])) for p in players)
+    fewest_buildings = min(p.built.bit_count() for p in game.players)
 
-    tied = [
-        p for p in players if len(p.get("buildings", [])) == fewest_buildings
-    ]
+    tied = [p for p in game.players if p.built.bit_count() == fewest_buildings]
 
     if len(tied) == 1:
         winner = tied[0]
     else:
         # Tiebreaker: fewest goods
         winner = min(tied,
-                     key=lambda p: p.get("wood", 0) + p.get("stone", 0) + p.
-                     get("gold", 0))
-
-    for p in players:
-        p["kings_envoy"] = False
-
-    winner["kings_envoy"] = True
-    print(f"👑 {winner['name']} has been awarded the King's Envoy!\n")
+                     key=lambda p: p.wood + p.stone + p.gold)
+
+    for p in game.players:
+        p.kings_envoy = False
+
+    winner.kings_envoy = True
+    game.renderer.emit("kings_envoy", player=winner)
+
+
+# Phases timed while profiling is on, and the lookups whose result sizes are
+# the branching factor (see profiling.py)
+profiled_phases = {
+    "apply_seasonal_bonuses": "seasonal_bonuses",
+    "award_kings_envoy": "kings_envoy",
+    "roll_dice": "dice_roll",
+    "choose_influencer": "influence",
+    "build_phase": "build_phase",
+    "handle_winter": "winter",
+    "assign_bonus_dice": "bonus_die",
+}
+profiled_branching = {
+    "get_reachable_advisors": "reachable_advisors",
+    "get_buildable": "buildable_buildings",
+}
+profiler = None
+unprofiled = {}  # name -> original function while profiling is on
+
+
+def set_profiling(enabled):
+    # Swaps the phase functions for timed wrappers (or back) and returns the
+    # profiler that is, or was, collecting the stats
+    global profiler
+    if enabled and profiler is None:
+        profiler = Profiler()
+        for name, phase in profiled_phases.items():
+            unprofiled[name] = globals()[name]
+            globals()[name] = profiler.timed(phase, unprofiled[name])
+        for name, histogram in profiled_branching.items():
+            unprofiled[name] = globals()[name]
+            globals()[name] = profiler.branching(histogram, unprofiled[name])
+        return profiler
+    if not enabled and profiler is not None:
+        globals().update(unprofiled)
+        unprofiled.clear()
+        stopped, profiler = profiler, None
+        return stopped
+    return profiler
+
+
+def dump_profile():
+    if profiler is not None:
+        path = profiler.dump()
+        print(f"⏱️ Profile saved to {path}")
+
+
+if enabled_by_env():
+    set_profiling(True)
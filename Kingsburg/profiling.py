@@ -0,0 +1,113 @@
+# Per-phase profiling for the game engine.
+#
+# A Profiler counts calls and total time per phase, and keeps histograms of
+# the branching factor (how many advisors were reachable, how many buildings
+# were buildable). main.set_profiling(True) swaps the engine's phase
+# functions for timed wrappers, and set_profiling(False) puts the originals
+# back, so a game run without profiling pays nothing for it.
+#
+#   KINGSBURG_PROFILE=1 python stress.py --games 10000
+#
+# turns it on from the environment; the stats are written as JSON to
+# KINGSBURG_PROFILE_OUTPUT (default profile_stats.json).
+
+import os
+import time
+from collections import Counter
+
+ENV_VAR = "KINGSBURG_PROFILE"
+OUTPUT_ENV_VAR = "KINGSBURG_PROFILE_OUTPUT"
+DEFAULT_OUTPUT = "profile_stats.json"
+
+
+def enabled_by_env():
+    return os.environ.get(ENV_VAR, "").lower() not in ("", "0", "false",
+                                                       "no", "off")
+
+
+def output_path():
+    return os.environ.get(OUTPUT_ENV_VAR, DEFAULT_OUTPUT)
+
+
+class Profiler:
+
+    def __init__(self):
+        self.calls = Counter()
+        self.nanoseconds = Counter()
+        self.histograms = {}
+
+    def timed(self, phase, func):
+        calls = self.calls
+        nanoseconds = self.nanoseconds
+        clock = time.perf_counter_ns
+
+        def wrapper(*args, **kwargs):
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                nanoseconds[phase] += clock() - start
+                calls[phase] += 1
+
+        wrapper.__wrapped__ = func
+        return wrapper
+
+    def branching(self, name, func):
+        # Records len() of whatever func returns
+        histogram = self.histograms.setdefault(name, Counter())
+
+        def wrapper(*args, **kwargs):
+            result = func(*args, **kwargs)
+            histogram[len(result)] += 1
+            return result
+
+        wrapper.__wrapped__ = func
+        return wrapper
+
+    def merge(self, stats):
+        # Adds the counts of another profiler's to_dict() output
+        for phase, entry in stats["phases"].items():
+            self.calls[phase] += entry["calls"]
+            self.nanoseconds[phase] += round(entry["total_seconds"] * 1e9)
+        for name, histogram in stats["branching"].items():
+            counts = self.histograms.setdefault(name, Counter())
+            for size, count in histogram["counts"].items():
+                counts[int(size)] += count
+
+    def reset(self):
+        self.calls.clear()
+        self.nanoseconds.clear()
+        for histogram in self.histograms.values():
+            histogram.clear()
+
+    def to_dict(self):
+        phases = {}
+        for phase in sorted(self.calls, key=self.nanoseconds.get,
+                            reverse=True):
+            calls = self.calls[phase]
+            seconds = self.nanoseconds[phase] / 1e9
+            phases[phase] = {
+                "calls": calls,
+                "total_seconds": seconds,
+                "mean_microseconds": seconds / calls * 1e6,
+            }
+        branching = {}
+        for name, histogram in self.histograms.items():
+            total = sum(histogram.values())
+            branching[name] = {
+                "counts": {
+                    str(size): histogram[size] for size in sorted(histogram)
+                },
+                "mean": sum(size * count
+                            for size, count in histogram.items()) / total
+                if total else None,
+            }
+        return {"phases": phases, "branching": branching}
+
+    def dump(self, path=None):
+        import json  # only when dumping; keeps it off the engine's startup
+
+        path = path or output_path()
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        return path
@@ -0,0 +1,601 @@
+# Compact binary game recordings, and replay from them.
+#
+# A recording holds what a game's random stream handed out (its seed, every
+# die, the King's dice, enemy draws and random bot picks) and every decision a
+# policy bot or a human made, in the order the rules asked for them. Each
+# event is two bytes, an opcode and a small value, so a mini-game takes a few
+# hundred bytes:
+#
+#   GAME mode   PLAYER kind <len> <name>   SEED <len> <bytes>
+#   DIE face    KING face   ENEMY index    CHOICE index    INT value-low
+#   ADVISOR value (+0x80 with a +2 token, 0 to stop)    BUILD row*16+col
+#   RESOURCE index    NUMBER n    ANSWER <len> <UTF-8 text>
+#   TAKEOVER player (a bot took over a human's seat after that answer)
+#
+# A value of 255 or more is written as 255 and four more bytes. The file is
+# the magic, the games back to back, and an index of where each game starts,
+# so a Recording can memory-map a file of millions of games and go straight
+# to any one. A file whose writer never closed it (a crashed server) has no
+# index and is scanned instead.
+#
+# Replay runs the rules again with a ReplayStream as the game's rng and
+# ReplayPolicy/ReplayRenderer standing in for the bots and humans, so no
+# random numbers are drawn and no bot thinks: the recorded values come back
+# in order. With changed rule data (say, a building's VP) a replay re-scores
+# the recorded games; if the changes make the rules ask for something the
+# game didn't record, the replay stops with a ReplayError saying where.
+#
+#   python stress.py --games 100000 --record games.kbr
+#   python recording.py games.kbr --show 17           # the game's events
+#   python recording.py games.kbr --replay 17         # watch it again
+#   python recording.py games.kbr --check stress_test_results.jsonl
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+
+import main
+from renderers import ConsoleRenderer, NullRenderer
+
+MAGIC = b"KBREC1\n\0"
+INDEX_MAGIC = b"KBRINDEX"
+TRAILER = struct.Struct("<QQ8s")  # game count, index offset, INDEX_MAGIC
+OFFSET = struct.Struct("<Q")
+
+(GAME, PLAYER, SEED, DIE, KING, ENEMY, CHOICE, INT, ADVISOR, BUILD, RESOURCE,
+ NUMBER, ANSWER, TAKEOVER) = range(1, 15)
+OP_NAMES = {
+    GAME: "GAME",
+    PLAYER: "PLAYER",
+    SEED: "SEED",
+    DIE: "DIE",
+    KING: "KING",
+    ENEMY: "ENEMY",
+    CHOICE: "CHOICE",
+    INT: "INT",
+    ADVISOR: "ADVISOR",
+    BUILD: "BUILD",
+    RESOURCE: "RESOURCE",
+    NUMBER: "NUMBER",
+    ANSWER: "ANSWER",
+    TAKEOVER: "TAKEOVER",
+}
+# Ops whose value byte is followed by bytes of their own
+TEXT_OPS = (PLAYER, SEED, ANSWER)
+WIDE = 255
+
+MODES = {"mini": 0, "full": 1}
+RANDOM_BOT, POLICY_BOT, HUMAN = range(3)
+RESOURCES = ["wood", "stone", "gold"]
+
+
+class ReplayError(Exception):
+    pass
+
+
+def building_code(building):
+    row, col = building["level"].split(".")
+    return int(row) * 16 + int(col)
+
+
+class Events:
+    # One game's recording, as it's played. While a bot's policy decides,
+    # nothing is recorded but its decision: replay doesn't run the policy, so
+    # whatever it draws from the game's rng isn't drawn again.
+
+    def __init__(self):
+        self.data = bytearray()
+        self.deciding = 0
+
+    def put(self, op, value):
+        if self.deciding:
+            return
+        if value < WIDE:
+            self.data += bytes((op, value))
+        else:
+            self.data += bytes((op, WIDE)) + value.to_bytes(4, "big")
+
+    def put_text(self, op, value, raw):
+        if not self.deciding:
+            self.data += bytes((op, value)) + raw
+
+    def put_seed(self, seed):
+        raw = seed.to_bytes((seed.bit_length() + 8) // 8, "big", signed=True)
+        self.put_text(SEED, len(raw), raw)
+
+    def put_answer(self, text):
+        raw = text.encode()[:255]
+        self.put_text(ANSWER, len(raw), raw)
+
+
+class RecordingStream:
+    # Wraps a game's rng (see rng_streams.py) and records what it hands out
+
+    def __init__(self, inner, events):
+        self.inner = inner
+        self.events = events
+
+    def seed(self, seed):
+        self.events.put_seed(seed)
+        self.inner.seed(seed)
+
+    def roll(self, count):
+        dice = self.inner.roll(count)
+        for die in dice:
+            self.events.put(DIE, die)
+        return dice
+
+    def king_die(self):
+        die = self.inner.king_die()
+        self.events.put(KING, die)
+        return die
+
+    def draw_enemy(self, deck):
+        enemy = self.inner.draw_enemy(deck)
+        self.events.put(ENEMY, deck.index(enemy))
+        return enemy
+
+    def choice(self, seq):
+        # Equal items are interchangeable, so the first one's index will do
+        item = self.inner.choice(seq)
+        self.events.put(CHOICE, seq.index(item))
+        return item
+
+    def randint(self, a, b):
+        value = self.inner.randint(a, b)
+        self.events.put(INT, value - a)
+        return value
+
+
+class RecordingPolicy:
+    # Wraps a bot's policy (see search_bot.py) and records its decisions
+
+    def __init__(self, inner, events):
+        self.inner = inner
+        self.events = events
+
+    def decide(self, method, *args):
+        self.events.deciding += 1
+        try:
+            return method(*args)
+        finally:
+            self.events.deciding -= 1
+
+    def choose_advisor(self, game, p, dice_key, used_mask, available_options):
+        raw = self.decide(self.inner.choose_advisor, game, p, dice_key,
+                          used_mask, available_options)
+        base = raw.replace("+2", "")
+        self.events.put(ADVISOR, int(base) | (0x80 if base != raw else 0))
+        return raw
+
+    def choose_building(self, game, p, buildable):
+        building = self.decide(self.inner.choose_building, game, p, buildable)
+        self.events.put(BUILD,
+                        building_code(building) if building is not None else 0)
+        return building
+
+    def choose_resource(self, p):
+        resource = self.decide(self.inner.choose_resource, p)
+        self.events.put(RESOURCE, RESOURCES.index(resource))
+        return resource
+
+    def choose_number(self, p, count):
+        number = self.decide(self.inner.choose_number, p, count)
+        self.events.put(NUMBER, number)
+        return number
+
+
+class RecordingRenderer:
+    # Passes events on; records the answers humans give, and a human who
+    # turned into a bot while being asked (see server.py)
+
+    def __init__(self, inner, events, game):
+        self.inner = inner
+        self.events = events
+        self.game = game
+        self.emit = inner.emit
+
+    def ask(self, prompt):
+        answer = self.inner.ask(prompt)
+        self.events.put_answer(answer)
+        p = self.game.current_player
+        if p.type == "bot":
+            self.events.put(TAKEOVER, self.game.players.index(p))
+        return answer
+
+
+class GameRecorder:
+    # Records the games played in a session: begin() before the game starts,
+    # end() once it's over. Between the two the session's rng, renderer and
+    # bot policies are wrapped; end() puts the originals back.
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.events = None
+        self.saved = None
+
+    def begin(self, game, players, mode="mini"):
+        events = self.events = Events()
+        events.put(GAME, MODES[mode])
+        for p in players:
+            if p.type != "bot":
+                kind = HUMAN
+            else:
+                kind = RANDOM_BOT if p.policy is None else POLICY_BOT
+            name = p.name.encode()[:255]
+            events.put_text(PLAYER, kind, bytes((len(name), )) + name)
+        self.saved = (game.rng, game.renderer,
+                      [(p, p.policy) for p in players])
+        game.rng = RecordingStream(game.rng, events)
+        game.renderer = RecordingRenderer(game.renderer, events, game)
+        for p in players:
+            if p.policy is not None:
+                p.policy = RecordingPolicy(p.policy, events)
+
+    def end(self, game):
+        game.rng, game.renderer, policies = self.saved
+        for p, policy in policies:
+            p.policy = policy
+        self.writer.add(self.events.data)
+        self.events = self.saved = None
+
+
+class RecordingWriter:
+
+    def __init__(self, path, buffer_size=1 << 20):
+        self.path = path
+        self.buffer_size = buffer_size
+        self.file = open(path, "wb")
+        self.file.write(MAGIC)
+        self.offset = len(MAGIC)  # where the next game starts
+        self.offsets = []
+        self.buffer = bytearray()
+
+    def add(self, game_data):
+        self.offsets.append(self.offset)
+        self.offset += len(game_data)
+        self.buffer += game_data
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        self.file.write(self.buffer)
+        self.buffer.clear()
+        self.file.flush()
+
+    def close(self):
+        self.flush()
+        index = b"".join(OFFSET.pack(offset) for offset in self.offsets)
+        self.file.write(index)
+        self.file.write(
+            TRAILER.pack(len(self.offsets), self.offset, INDEX_MAGIC))
+        self.file.close()
+
+
+def merge_recordings(paths, path):
+    # Concatenates recordings in order (e.g. the shards of a stress run)
+    writer = RecordingWriter(path)
+    for part in paths:
+        with Recording(part) as recording:
+            for i in range(len(recording)):
+                writer.add(recording.game_data(i))
+    writer.close()
+
+
+def skip_event(data, pos):
+    # Position of the event after the one at pos
+    op, value = data[pos], data[pos + 1]
+    if op == PLAYER:
+        return pos + 3 + data[pos + 2]
+    if op in TEXT_OPS:
+        return pos + 2 + value
+    return pos + (6 if value == WIDE else 2)
+
+
+class Recording:
+    # A recording file, memory-mapped: recording[i] is game i's bytes
+
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        self.data = mmap.mmap(self.file.fileno(), 0,
+                              access=mmap.ACCESS_READ) if size else b""
+        if self.data[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a Kingsburg recording")
+        self.body_end = size
+        self.index = None
+        if size >= len(MAGIC) + TRAILER.size:
+            count, index_offset, magic = TRAILER.unpack_from(
+                self.data, size - TRAILER.size)
+            if (magic == INDEX_MAGIC and index_offset + count * OFFSET.size
+                    + TRAILER.size == size):
+                self.count = count
+                self.index = index_offset
+                self.body_end = index_offset
+        if self.index is None:
+            self.offsets = self.scan()
+            self.count = len(self.offsets)
+
+    def scan(self):
+        # No index: find the games by walking the events
+        offsets = []
+        data, pos, end = self.data, len(MAGIC), self.body_end
+        while pos < end:
+            if data[pos] == GAME:
+                offsets.append(pos)
+            try:
+                pos = skip_event(data, pos)
+            except IndexError:
+                pos = end + 1
+        if pos > end and offsets:
+            # Cut off mid-event: drop the unfinished game
+            self.body_end = offsets.pop()
+        return offsets
+
+    def offset(self, i):
+        if self.index is None:
+            return self.offsets[i]
+        return OFFSET.unpack_from(self.data, self.index + i * OFFSET.size)[0]
+
+    def game_data(self, i):
+        if not 0 <= i < self.count:
+            raise IndexError(f"no game {i} in a recording of {self.count}")
+        end = self.offset(i + 1) if i + 1 < self.count else self.body_end
+        return self.data[self.offset(i):end]
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        return self.game_data(i)
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_events(game_data):
+    # (op name, value) for every event of one game; text comes back decoded
+    data, pos = game_data, 0
+    while pos < len(data):
+        op, value = data[pos], data[pos + 1]
+        end = skip_event(data, pos)
+        if op == PLAYER:
+            value = (value, bytes(data[pos + 3:end]).decode())
+        elif op == SEED:
+            value = int.from_bytes(data[pos + 2:end], "big", signed=True)
+        elif op == ANSWER:
+            value = bytes(data[pos + 2:end]).decode(errors="replace")
+        elif value == WIDE:
+            value = int.from_bytes(data[pos + 2:end], "big")
+        yield OP_NAMES.get(op, op), value
+        pos = end
+
+
+class ReplayCursor:
+    # Hands out one game's recorded events in order, checking each is what
+    # the rules are asking for
+
+    def __init__(self, game_data):
+        self.data = game_data
+        self.pos = 0
+        self.event = 0
+
+    def peek(self):
+        return self.data[self.pos] if self.pos < len(self.data) else None
+
+    def expect(self, op):
+        data, pos = self.data, self.pos
+        if pos >= len(data):
+            raise ReplayError(f"the recording ended at event {self.event}, "
+                              f"but the game wants {OP_NAMES[op]}")
+        if data[pos] != op:
+            raise ReplayError(
+                f"event {self.event} is "
+                f"{OP_NAMES.get(data[pos], data[pos])}, but the game wants "
+                f"{OP_NAMES[op]}")
+        self.event += 1
+        return pos
+
+    def next(self, op):
+        pos = self.expect(op)
+        value = self.data[pos + 1]
+        if value == WIDE:
+            value = int.from_bytes(self.data[pos + 2:pos + 6], "big")
+            self.pos = pos + 6
+        else:
+            self.pos = pos + 2
+        return value
+
+    def next_text(self, op):
+        pos = self.expect(op)
+        self.pos = skip_event(self.data, pos)
+        if op == PLAYER:
+            return self.data[pos + 1], bytes(self.data[pos + 3:self.pos])
+        return bytes(self.data[pos + 2:self.pos])
+
+    def pick(self, op, seq):
+        i = self.next(op)
+        if i >= len(seq):
+            raise ReplayError(f"event {self.event - 1} picks item {i}, but "
+                              f"the game offers {len(seq)}")
+        return seq[i]
+
+    def header(self):
+        mode = self.next(GAME)
+        players = []
+        while self.peek() == PLAYER:
+            kind, name = self.next_text(PLAYER)
+            players.append((kind, name.decode()))
+        return mode, players
+
+    def peek_seed(self):
+        # The seed, if that's the next event, without taking it
+        if self.peek() != SEED:
+            return None
+        end = skip_event(self.data, self.pos)
+        return int.from_bytes(self.data[self.pos + 2:end], "big", signed=True)
+
+    def finish(self):
+        if self.pos < len(self.data):
+            raise ReplayError(f"the game ended at event {self.event}, but "
+                              "the recording goes on")
+
+
+class ReplayStream:
+    # A game's rng that replays a recording
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def seed(self, seed):
+        self.cursor.next_text(SEED)
+
+    def roll(self, count):
+        return [self.cursor.next(DIE) for _ in range(count)]
+
+    def king_die(self):
+        return self.cursor.next(KING)
+
+    def draw_enemy(self, deck):
+        return self.cursor.pick(ENEMY, deck)
+
+    def choice(self, seq):
+        return self.cursor.pick(CHOICE, seq)
+
+    def randint(self, a, b):
+        return a + self.cursor.next(INT)
+
+
+class ReplayPolicy:
+    # A policy bot's recorded decisions
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def choose_advisor(self, game, p, dice_key, used_mask, available_options):
+        value = self.cursor.next(ADVISOR)
+        if not value:
+            return "0"
+        return f"{value & 0x7f}+2" if value & 0x80 else str(value)
+
+    def choose_building(self, game, p, buildable):
+        code = self.cursor.next(BUILD)
+        if not code:
+            return None
+        for building in buildable:
+            if building_code(building) == code:
+                return building
+        raise ReplayError(f"building {code >> 4}.{code & 15} was recorded "
+                          "but can't be built now")
+
+    def choose_resource(self, p):
+        return RESOURCES[self.cursor.next(RESOURCE)]
+
+    def choose_number(self, p, count):
+        return self.cursor.next(NUMBER)
+
+
+class ReplayRenderer:
+    # Passes events on; humans' recorded answers come back from ask()
+
+    def __init__(self, inner, cursor, players):
+        self.inner = inner
+        self.cursor = cursor
+        self.players = players
+        self.emit = inner.emit
+
+    def ask(self, prompt):
+        answer = self.cursor.next_text(ANSWER).decode(errors="replace")
+        if self.cursor.peek() == TAKEOVER:
+            self.players[self.cursor.next(TAKEOVER)].type = "bot"
+        return answer
+
+
+def replay_game(game_data, renderer=None):
+    # Plays a recorded game again through the rules and returns its final
+    # state (as simulate_real_mini_game does) or, for a full game, its players
+    cursor = ReplayCursor(game_data)
+    mode, seats = cursor.header()
+    players = []
+    for kind, name in seats:
+        p = main.PlayerState(name=name,
+                             type="human" if kind == HUMAN else "bot")
+        if kind == POLICY_BOT:
+            p.policy = ReplayPolicy(cursor)
+        players.append(p)
+    game = main.GameSession(players,
+                            renderer=ReplayRenderer(renderer or NullRenderer(),
+                                                    cursor, players),
+                            rng=ReplayStream(cursor))
+    if mode == MODES["full"]:
+        main.play_full_game(game)
+        result = players
+    else:
+        # The game seeds its rng with it, and the stream skips the event
+        seed = cursor.peek_seed()
+        result = main.simulate_real_mini_game(players, main.all_buildings,
+                                              main.influencers, None,
+                                              seed=seed,
+                                              game=game)
+    cursor.finish()
+    return result
+
+
+def replay_all(recording, start=0, stop=None):
+    # Yields (game number, final state) for a range of recorded games
+    stop = len(recording) if stop is None else min(stop, len(recording))
+    for i in range(start, stop):
+        yield i, replay_game(recording.game_data(i))
+
+
+def check_against_results(recording, results_path):
+    # Replays every game and compares it with a stress.py results file, in
+    # the same order; returns the game numbers that differ
+    mismatched = []
+    with open(results_path) as f:
+        for (i, final_state), line in zip(replay_all(recording), f):
+            if json.loads(line)["players"] != json.loads(
+                    json.dumps(final_state)):
+                mismatched.append(i)
+    return mismatched
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Kingsburg game recordings")
+    parser.add_argument("path")
+    parser.add_argument("--show", type=int, help="print one game's events")
+    parser.add_argument("--replay",
+                        type=int,
+                        help="replay one game with console output")
+    parser.add_argument("--check",
+                        metavar="RESULTS",
+                        help="replay every game and compare with the "
+                        "stress.py results file it was recorded with")
+    args = parser.parse_args()
+    with Recording(args.path) as recording:
+        if args.show is not None:
+            for op, value in read_events(recording.game_data(args.show)):
+                print(op, value)
+        elif args.replay is not None:
+            replay_game(recording.game_data(args.replay), ConsoleRenderer())
+        elif args.check:
+            mismatched = check_against_results(recording, args.check)
+            if mismatched:
+                print(f"❌ {len(mismatched)} game(s) replay differently, "
+                      f"first: game {mismatched[0]}")
+                sys.exit(1)
+            print(f"✅ All {len(recording)} recorded games replay the same.")
+        else:
+            print(f"📼 {len(recording)} recorded games")
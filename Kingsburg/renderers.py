@@ -0,0 +1,243 @@
+# Renderers turn the structured events emitted by the game rules into output.
+# The rules never print or read input themselves: they call
+# renderer.emit(kind, **fields) and renderer.ask(prompt), so the same engine
+# can drive the console game or run headless in simulations.
+
+# Emojis for resources
+resource_emojis = {"wood": "🟫", "stone": "🔘", "gold": "🟡"}
+
+
+class NullRenderer:
+    # Discards every event. Used for simulations where output only costs time.
+
+    def emit(self, kind, **fields):
+        pass
+
+    def ask(self, prompt):
+        raise RuntimeError(
+            f"Human input requested in headless mode: {prompt!r}")
+
+
+class RecordingRenderer(NullRenderer):
+    # Keeps every event as a (kind, fields) tuple, e.g. for logs or tests.
+
+    def __init__(self):
+        self.events = []
+
+    def emit(self, kind, **fields):
+        self.events.append((kind, fields))
+
+
+class ConsoleRenderer:
+    # Plain one-line events. Anything richer has an on_<kind> method below.
+    TEMPLATES = {
+        "gain": "Gained {amount} {resource}.",
+        "lose": "Lost {amount} {resource}.",
+        "peek": "You peeked at the top enemy card! (feature coming soon)",
+        "unknown_action": "Unknown action type: {type}",
+        "no_influencer_options": "No valid influencer options remaining.\n",
+        "bot_influencer_choice":
+        "🤖 {player.name} chooses influencer {value}",
+        "invalid_input": "❌ {message}",
+        "kings_envoy_used":
+        "👑 Using King's Envoy to influence an occupied advisor!",
+        "plus2_used": "Used one +2 token.\n",
+        "season_start": "\n=== {season_upper} ===",
+        "winter_start": "\n--- Winter Combat ---",
+        "rolled": "\nYou rolled: {dice}",
+        "bonus_die": "🎲 {player.name} will get a bonus die next year!",
+        "kings_envoy": "👑 {player.name} has been awarded the King's Envoy!\n",
+        "bot_built":
+        "🤖 {player.name} built {building[name]} ({building[level]})!\n",
+        "bot_cannot_build": "🤖 {player.name} cannot afford any building.\n",
+        "bot_skipped_build": "🤖 {player.name} saves up instead of building.\n",
+        "cannot_build": "You can't build anything this season.",
+        "invalid_choice": "Invalid choice.",
+        "invalid_resource": "Invalid resource.",
+        "number_required": "Please enter a number.",
+        "no_enemy": "No enemy found for this round.",
+        "tie_breaker": "🏰 You have a tie-breaker building!",
+        "combat_won": "✅ You defeated the enemy!",
+        "combat_lost": "❌ You lost the battle!",
+        "bonus_vp": "🏆 Bonus: Gained {amount} VP from your buildings!\n",
+        "penalty_start": "\n🩸 Applying penalty...",
+        "no_resources_to_lose": "No resources to lose.",
+        "building_lost": "❌ Lost 1 building. (Feature not implemented yet.)",
+        "seasonal_check":
+        "\n🌞 Checking seasonal bonuses for {season}...",
+        "seasonal_gain": "Gained {amount} {resource} from seasonal bonus.\n",
+        "no_seasonal_bonus": "No seasonal bonuses this round.\n",
+        "trade_start": "\n--- Trade Action ---",
+        "no_trade": "You don't have any resources to trade.",
+        "traded":
+        "Gave 1 {give}, gained 1 {get[0]} and 1 {get[1]}.",
+        "section_end": "",
+    }
+
+    def __init__(self, out=None):
+        self.out = out  # file-like object to write to; None is stdout
+
+    def print(self, *args):
+        print(*args, file=self.out)
+
+    def emit(self, kind, **fields):
+        handler = getattr(self, "on_" + kind, None)
+        if handler is not None:
+            handler(**fields)
+        else:
+            self.print(self.TEMPLATES[kind].format(**fields))
+
+    def ask(self, prompt):
+        return input(prompt)
+
+    # Simulation bookkeeping; the console game doesn't show it
+    def on_game_start(self, seed, players):
+        pass
+
+    def on_game_end(self, players):
+        pass
+
+    def on_resources(self, player):
+        self.print(f"\n{player.name}'s current resources:")
+        for key in ["wood", "stone", "gold", "armies", "vp", "plus2"]:
+            label = "+2 Tokens" if key == "plus2" else key.capitalize()
+            emoji = resource_emojis.get(key, "")
+            self.print(f"  {label}: {getattr(player, key)} {emoji}")
+        self.print()
+
+    def on_influencer_options(self, options, influencers):
+        self.print("\nAvailable influencer options:")
+        for val in options:
+            self.print(
+                f"{val}: {influencers[val]['name']} - {influencers[val]['benefit']}"
+            )
+            self.print()
+        if not options:
+            self.print("No valid influencer options left.")
+            self.print()
+
+    def on_influencer_menu(self, options, influencers):
+        self.print("\nAvailable influencer options:")
+        for val in options:
+            self.print(
+                f"  {val}: {influencers[val]['name']} - {influencers[val]['benefit']}"
+            )
+        self.print()
+
+    def on_influencer_chosen(self, player, value, influencer, plus2):
+        self.print(f"\nYou chose {influencer['name']} ({value})!")
+        self.print(f"Benefit: {influencer['benefit']}\n")
+
+    def on_combo_menu(self, combos):
+        self.print("\nChoose one of the following resource combinations:")
+        for i, combo in enumerate(combos, 1):
+            self.print(f"{i}: " + " + ".join(combo))
+
+    def on_option_menu(self, options):
+        self.print("Choose one of the following options:")
+        for i, option in enumerate(options, 1):
+            self.print(f"{i}: {option}")
+
+    def on_trade_menu(self, choices):
+        for i, (give, get) in enumerate(choices, 1):
+            self.print(f"{i}: Give 1 {give} → Gain 1 {get[0]} and 1 {get[1]}")
+
+    def on_build_phase_start(self, player):
+        self.print("\n🏗 BUILDING PHASE")
+        self.print("Your current buildings:", ", ".join(player.buildings)
+              or "None")
+        self.print()
+
+    def on_build_menu(self, buildable):
+        self.print("\nYou can build:")
+        for i, b in enumerate(buildable, 1):
+            c = b["cost"]
+            self.print(
+                f"{i}: {b['name']} ({b['level']}) - Cost: {c['wood']}W/{c['stone']}S/{c['gold']}G - {b['benefit']}"
+            )
+
+    def on_built(self, player, building):
+        self.print(f"✅ You built the {building['name']}! ({building['level']})")
+        self.print(f"🏆 Benefit: {building['benefit']}")
+
+    def on_building_effect(self, player, effect):
+        typ = effect["type"]
+        if typ == "gain":
+            if effect["resource"] != "any":
+                self.print(f"Gained {effect['amount']} {effect['resource']}.")
+        elif typ == "season_bonus":
+            self.print(
+                f"(Note: +{effect['amount']} {effect['resource']} bonus in {effect['season']})"
+            )
+        elif typ == "influence_bonus":
+            self.print(f"(Note: +{effect['amount']} influence per season)")
+        elif typ == "tie_breaker":
+            self.print("You now win ties in combat.")
+        elif typ == "extra_advisor":
+            self.print(f"You may influence {effect['amount']} extra advisor(s).")
+        elif typ == "bonus_vp_per_win":
+            self.print(f"(Note: +{effect['amount']} VP per combat win)")
+        elif typ == "unlock_rows":
+            self.print(f"(Unlocked building rows: {effect['rows']})")
+        else:
+            self.print(f"⚠️ Unknown effect type: {typ}")
+        self.print()  # Add line break for readability
+
+    def on_enemy(self, enemy):
+        self.print(f"\n⚔️  Enemy: {enemy['name']}")
+        self.print(f"   Strength: {enemy['strength']}")
+        self.print(f"   Reward if you win: {enemy['reward']}")
+        self.print(f"   Penalty if you lose: {enemy['loss']}")
+
+    def on_combat(self, player, king_die, building_defense, total_power):
+        self.print(f"\n🛡️  Your Armies: {player.armies}")
+        self.print(f"👑 King's Die: {king_die}")
+        self.print(f"🏰 Building Defense Bonus: {building_defense}")
+        self.print(f"⚔️  Total Power: {total_power}")
+
+    def on_enemy_reward(self, player, resource, amount):
+        if resource == "vp":
+            self.print(f"Gained {amount} victory point(s).")
+        elif resource == "armies":
+            self.print(f"Gained {amount} defense (armies).")
+        else:
+            self.print(f"Gained {amount} {resource}.")
+
+    def on_penalty(self, player, resource, amount):
+        if resource == "vp":
+            self.print(f"❌ Lost {amount} VP.")
+        else:
+            self.print(f"❌ Lost {amount} {resource}.")
+
+    def on_final_summary(self, player, building_names):
+        self.print("\n🎉 GAME OVER — Final Summary 🎉")
+        self.print("-" * 40)
+
+        self.print(f"\n🏆 Total Victory Points: {player.vp}")
+        self.print(
+            f"🎯 Resources Left: Wood: {player.wood}, Stone: {player.stone}, Gold: {player.gold}"
+        )
+        self.print(f"🎲 +2 Tokens Left: {player.plus2}")
+        self.print()
+
+        self.print("🏰 Buildings Constructed:")
+        if player.buildings:
+            for b in player.buildings:
+                self.print(f"  - {b}: {building_names[b]}")
+        else:
+            self.print("  None")
+
+        self.print()
+
+        self.print("⚔️  Combat Log:")
+        if player.combat_log:
+            for entry in player.combat_log:
+                result = "✅ WIN" if entry["result"] == "win" else "❌ LOSS"
+                self.print(
+                    f"  Round {entry['round']}: {entry['enemy']} - {result}")
+        else:
+            self.print("  No combat recorded.")
+
+        self.print("\nThanks for playing Kingsburg Console Edition!")
+        self.print("-" * 40)
+        self.print()
@@ -0,0 +1,496 @@
+# Columnar store of simulated games' final results, queried from disk.
+#
+# A store is a directory with one file per column, each a flat array of
+# fixed-width little-endian numbers, one per player per game, plus
+# schema.json (the columns' types and the policy names that policy ids stand
+# for). Appending a game appends one number to every column; queries map the
+# columns they need (mmap) a chunk at a time, so a query over 100M rows reads
+# only those columns and holds one chunk of each in memory.
+# The row count comes from the column sizes, so a store cut short by a crash
+# is still readable up to its last whole row.
+#
+# With numpy installed (pip install .[batch]) chunks are scanned with
+# vectorized operations; without it the same queries run in plain Python.
+#
+#   python stress.py --games 1000000 --store results.kbs
+#   python results_store.py results.kbs --where "vp>=10" --group-by policy
+#   python results_store.py results.kbs --where "built has 2.3" --stats vp
+#
+#   store = ResultsStore("results.kbs")
+#   store.query().where("place", "==", 1).group_by("policy").stats("vp")
+
+import argparse
+import itertools
+import json
+import mmap
+import operator
+import os
+import re
+import sys
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+SCHEMA_VERSION = 1
+
+# Per player and game: (name, array typecode)
+COLUMNS = (
+    ("game", "I"),  # game number
+    ("seed", "Q"),
+    ("seat", "B"),  # 0 for the first player
+    ("policy", "B"),  # index into the schema's policy names
+    ("place", "B"),  # 1 + players with more VP (1: won or tied for first)
+    ("vp", "h"),
+    ("wood", "h"),
+    ("stone", "h"),
+    ("gold", "h"),
+    ("armies", "h"),
+    ("plus2", "h"),
+    ("built", "I"),  # building bitmask (see main.building_bits)
+    ("fought", "B"),  # bit r-1: fought the round r enemy
+    ("won", "B"),  # bit r-1: beat it
+    ("bonus_die", "B"),  # seasons rolled with a 4th die
+    ("envoy", "B"),  # times awarded the King's Envoy
+)
+TYPECODES = dict(COLUMNS)
+NUMPY_TYPES = {"B": "u1", "h": "<i2", "I": "<u4", "Q": "<u8"}
+
+CHUNK_ROWS = 1 << 20
+BUFFER_ROWS = 1 << 16
+
+OPS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "has": lambda x, bits: (x & bits) == bits,  # every bit set
+    "in": lambda x, values: x in values,
+}
+NUMPY_OPS = dict(OPS, **{"in": lambda x, values: np.isin(x, list(values))})
+
+
+def policy_name(p):
+    return "random" if p.policy is None else type(p.policy).__name__
+
+
+def column_path(path, name):
+    return os.path.join(path, name + ".col")
+
+
+def read_schema(path):
+    with open(os.path.join(path, "schema.json")) as f:
+        schema = json.load(f)
+    if schema.get("version") != SCHEMA_VERSION:
+        raise ValueError(f"{path}: unsupported results store version "
+                         f"{schema.get('version')}")
+    return schema
+
+
+def write_schema(path, policies):
+    with open(os.path.join(path, "schema.json"), "w") as f:
+        json.dump({
+            "version": SCHEMA_VERSION,
+            "columns": [list(column) for column in COLUMNS],
+            "policies": policies
+        }, f, indent=2)
+
+
+class ResultsWriter:
+    # Starts a new store at path (replacing one that's there)
+
+    def __init__(self, path, buffer_rows=BUFFER_ROWS):
+        self.path = path
+        self.buffer_rows = buffer_rows
+        os.makedirs(path, exist_ok=True)
+        self.policies = []
+        self.files = {
+            name: open(column_path(path, name), "wb")
+            for name, typecode in COLUMNS
+        }
+        self.buffers = {name: array(typecode) for name, typecode in COLUMNS}
+        self.rows = 0
+        write_schema(path, self.policies)
+
+    def policy_id(self, name):
+        if name not in self.policies:
+            self.policies.append(name)
+            write_schema(self.path, self.policies)
+        return self.policies.index(name)
+
+    def add_game(self, game_number, seed, players, bonus_die=None,
+                 envoy=None):
+        # players' final state; bonus_die, envoy: name -> count
+        buffers = self.buffers
+        for seat, p in enumerate(players):
+            fought = won = 0
+            for battle in p.combat_log:
+                bit = 1 << (battle["round"] - 1)
+                fought |= bit
+                if battle["result"] == "win":
+                    won |= bit
+            row = {
+                "game": game_number,
+                "seed": seed or 0,
+                "seat": seat,
+                "policy": self.policy_id(policy_name(p)),
+                "place": 1 + sum(1 for other in players if other.vp > p.vp),
+                "vp": p.vp,
+                "wood": p.wood,
+                "stone": p.stone,
+                "gold": p.gold,
+                "armies": p.armies,
+                "plus2": p.plus2,
+                "built": p.built,
+                "fought": fought,
+                "won": won,
+                "bonus_die": (bonus_die or {}).get(p.name, 0),
+                "envoy": (envoy or {}).get(p.name, 0),
+            }
+            for name, value in row.items():
+                buffers[name].append(value)
+            self.rows += 1
+        if len(buffers["game"]) >= self.buffer_rows:
+            self.flush()
+
+    def flush(self):
+        for name, buffer in self.buffers.items():
+            if sys.byteorder != "little":
+                buffer.byteswap()
+            buffer.tofile(self.files[name])
+            del buffer[:]
+            self.files[name].flush()
+
+    def close(self):
+        if self.files:
+            self.flush()
+            for f in self.files.values():
+                f.close()
+            self.files = {}
+
+
+class StoreRenderer:
+    # Writes each game to a ResultsWriter as it ends, counting bonus dice and
+    # King's Envoys from the engine's events, and passes every event on to
+    # the inner renderer. Set .game to the game number before each game.
+
+    def __init__(self, writer, inner):
+        self.writer = writer
+        self.inner = inner
+        self.ask = inner.ask
+        self.game = 0
+        self.seed = None
+        self.bonus_die = {}
+        self.envoy = {}
+
+    def emit(self, kind, **fields):
+        if kind == "game_start":
+            self.seed = fields["seed"]
+            self.bonus_die = {}
+            self.envoy = {}
+        elif kind == "rolled" and len(fields["dice"]) > 3:
+            name = fields["player"].name
+            self.bonus_die[name] = self.bonus_die.get(name, 0) + 1
+        elif kind == "kings_envoy":
+            name = fields["player"].name
+            self.envoy[name] = self.envoy.get(name, 0) + 1
+        elif kind == "game_end":
+            self.writer.add_game(self.game, self.seed, fields["players"],
+                                 self.bonus_die, self.envoy)
+        self.inner.emit(kind, **fields)
+
+
+def merge_stores(parts, path):
+    # Concatenates stores in order into a new one, each part up to its last
+    # whole row. Policy ids are renumbered where the parts numbered their
+    # policies differently.
+    os.makedirs(path, exist_ok=True)
+    stores = [ResultsStore(part) for part in parts]
+    policies = []
+    for store in stores:
+        for name in store.policies:
+            if name not in policies:
+                policies.append(name)
+    for name, typecode in COLUMNS:
+        size = array(typecode).itemsize
+        with open(column_path(path, name), "wb") as out:
+            for store in stores:
+                table = None
+                if name == "policy" and store.policies != policies[:len(
+                        store.policies)]:
+                    table = bytes(
+                        policies.index(store.policies[i])
+                        if i < len(store.policies) else i for i in range(256))
+                left = len(store) * size
+                with open(column_path(store.path, name), "rb") as f:
+                    while left:
+                        data = f.read(min(left, CHUNK_ROWS * size))
+                        left -= len(data)
+                        out.write(data if table is None else data.translate(
+                            table))
+    write_schema(path, policies)
+    return path
+
+
+class ResultsStore:
+
+    def __init__(self, path):
+        self.path = path
+        schema = read_schema(path)
+        self.policies = schema["policies"]
+        self.columns = [name for name, _ in schema["columns"]]
+        self.rows = min(
+            os.path.getsize(column_path(path, name)) //
+            array(TYPECODES[name]).itemsize for name in self.columns)
+
+    def __len__(self):
+        return self.rows
+
+    def column(self, name, start=0, stop=None):
+        # Rows start..stop-1 of a column: a numpy array if numpy is
+        # installed, else a memoryview of ints. Only those rows are mapped,
+        # so a scan holds one chunk of the file at a time.
+        if name not in TYPECODES:
+            raise KeyError(f"no column {name!r}")
+        stop = self.rows if stop is None else min(stop, self.rows)
+        typecode = TYPECODES[name]
+        if stop <= start:
+            return (np.zeros(0, NUMPY_TYPES[typecode])
+                    if np is not None else memoryview(array(typecode)))
+        size = array(typecode).itemsize
+        begin, end = start * size, stop * size
+        offset = begin - begin % mmap.ALLOCATIONGRANULARITY
+        with open(column_path(self.path, name), "rb") as f:
+            data = mmap.mmap(f.fileno(), end - offset,
+                             access=mmap.ACCESS_READ, offset=offset)
+        if np is not None:
+            return np.frombuffer(data, NUMPY_TYPES[typecode], stop - start,
+                                 begin - offset)
+        if sys.byteorder != "little":
+            values = array(typecode, data[begin - offset:end - offset])
+            values.byteswap()
+            return memoryview(values)
+        return memoryview(data)[begin - offset:end - offset].cast(typecode)
+
+    def query(self):
+        return Query(self)
+
+
+class Query:
+    # Filters are ANDed; nothing is read until an aggregate is asked for
+
+    def __init__(self, store, filters=(), by=None):
+        self.store = store
+        self.filters = filters
+        self.by = by
+
+    def where(self, column, op, value):
+        # e.g. where("vp", ">=", 10), where("policy", "==", "SearchBot"),
+        # where("built", "has", ["2.3"]), where("seat", "in", {0, 1})
+        if op not in OPS:
+            raise ValueError(f"unknown operator {op!r}")
+        if column not in TYPECODES:
+            raise KeyError(f"no column {column!r}")
+        if column == "policy":
+            value = self.policy_ids(value)
+        elif column == "built" and not isinstance(value, int):
+            value = building_mask(value)
+        return Query(self.store, self.filters + ((column, op, value), ),
+                     self.by)
+
+    def policy_ids(self, value):
+        policies = self.store.policies
+        if isinstance(value, str):
+            # A policy the store never saw matches nothing
+            return policies.index(value) if value in policies else 255
+        if isinstance(value, (set, frozenset, list, tuple)):
+            return {self.policy_ids(v) for v in value}
+        return value
+
+    def group_by(self, column):
+        if column not in TYPECODES:
+            raise KeyError(f"no column {column!r}")
+        return Query(self.store, self.filters, column)
+
+    def count(self):
+        totals = self.aggregate(None)
+        if self.by is None:
+            return totals[None][0] if totals else 0
+        return {key: total[0] for key, total in totals.items()}
+
+    def stats(self, column):
+        # count, sum, mean, min and max of a column over the matching rows
+        totals = self.aggregate(column)
+        results = {
+            key: {
+                "count": count,
+                "sum": total,
+                "mean": total / count,
+                "min": low,
+                "max": high
+            }
+            for key, (count, total, low, high) in totals.items()
+        }
+        if self.by is None:
+            return results.get(None, {"count": 0, "sum": 0, "mean": None,
+                                      "min": None, "max": None})
+        return results
+
+    def aggregate(self, column):
+        # group key (None without group_by) -> [count, sum, min, max]
+        totals = {}
+        store = self.store
+        for start in range(0, len(store), CHUNK_ROWS):
+            stop = start + CHUNK_ROWS
+            if np is not None:
+                self.aggregate_numpy(totals, column, start, stop)
+            else:
+                self.aggregate_python(totals, column, start, stop)
+        if self.by == "policy":
+            totals = {
+                store.policies[key] if key < len(store.policies) else key:
+                total
+                for key, total in totals.items()
+            }
+        return dict(
+            sorted(totals.items(),
+                   key=lambda item: (isinstance(item[0], str), item[0])))
+
+    def aggregate_numpy(self, totals, column, start, stop):
+        store = self.store
+        mask = None
+        for name, op, value in self.filters:
+            selected = NUMPY_OPS[op](store.column(name, start, stop), value)
+            mask = selected if mask is None else mask & selected
+        values = store.column(column or "game", start, stop)
+        if mask is not None:
+            values = values[mask]
+        if not len(values):
+            return
+        if values.dtype.itemsize < 8:
+            values = values.astype(np.int64)
+            parts = ((values, 1), )
+        else:
+            # Sums of a 64-bit column (seed) would wrap: its high and low
+            # halves are summed apart and put together as Python ints
+            parts = ((values >> 32, 1 << 32), (values & 0xFFFFFFFF, 1))
+        if self.by is None:
+            merge_total(totals, None, len(values),
+                        sum(int(part.sum()) * scale for part, scale in parts),
+                        int(values.min()), int(values.max()))
+            return
+        keys = store.column(self.by, start, stop)
+        if mask is not None:
+            keys = keys[mask]
+        groups, index = np.unique(keys, return_inverse=True)
+        counts = np.bincount(index)
+        sums = []
+        for part, scale in parts:
+            part_sums = np.zeros(len(groups), part.dtype)
+            np.add.at(part_sums, index, part)
+            sums.append((part_sums, scale))
+        lows = np.full(len(groups), np.iinfo(values.dtype).max, values.dtype)
+        np.minimum.at(lows, index, values)
+        highs = np.full(len(groups), np.iinfo(values.dtype).min, values.dtype)
+        np.maximum.at(highs, index, values)
+        for i, key in enumerate(groups.tolist()):
+            merge_total(totals, key, int(counts[i]),
+                        sum(int(part_sums[i]) * scale
+                            for part_sums, scale in sums), int(lows[i]),
+                        int(highs[i]))
+
+    def aggregate_python(self, totals, column, start, stop):
+        store = self.store
+        mask = None
+        for name, op, value in self.filters:
+            test = OPS[op]
+            selected = [test(x, value) for x in store.column(name, start,
+                                                             stop)]
+            mask = selected if mask is None else list(
+                map(operator.and_, mask, selected))
+        values = store.column(column or "game", start, stop)
+        keys = (store.column(self.by, start, stop) if self.by is not None
+                else itertools.repeat(None))
+        rows = zip(keys, values)
+        if mask is not None:
+            rows = itertools.compress(rows, mask)
+        groups = {}
+        for key, value in rows:
+            total = groups.get(key)
+            if total is None:
+                groups[key] = [1, value, value, value]
+            else:
+                total[0] += 1
+                total[1] += value
+                if value < total[2]:
+                    total[2] = value
+                if value > total[3]:
+                    total[3] = value
+        for key, (count, total, low, high) in groups.items():
+            merge_total(totals, key, count, total, low, high)
+
+
+def merge_total(totals, key, count, total, low, high):
+    current = totals.get(key)
+    if current is None:
+        totals[key] = [count, total, low, high]
+    else:
+        current[0] += count
+        current[1] += total
+        current[2] = min(current[2], low)
+        current[3] = max(current[3], high)
+
+
+def building_mask(levels):
+    # "2.3" or ["1.1", "2.3"] -> their bits
+    import main
+
+    if isinstance(levels, str):
+        levels = levels.split(",")
+    mask = 0
+    for level in levels:
+        mask |= main.building_bits[level.strip()]
+    return mask
+
+
+def parse_filter(text):
+    # "vp>=10", "policy==SearchBot", "built has 1.1,2.3", "seat in 0,1"
+    match = re.fullmatch(r"\s*(\w+)\s*(==|!=|<=|>=|<|>|\bhas\b|\bin\b)\s*(.+)",
+                         text)
+    if match is None:
+        raise ValueError(f"can't parse filter {text!r}")
+    column, op, value = match.group(1), match.group(2), match.group(3).strip()
+    if column == "built":
+        return column, op, value
+    values = [int(v) if v.strip().lstrip("-").isdigit() else v.strip()
+              for v in value.split(",")]
+    return column, op, set(values) if op == "in" else values[0]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query a results store")
+    parser.add_argument("store")
+    parser.add_argument("--where",
+                        action="append",
+                        default=[],
+                        help='e.g. "vp>=10", "policy==SearchBot", '
+                        '"built has 2.3" (repeat to AND)')
+    parser.add_argument("--group-by", default=None)
+    parser.add_argument("--stats",
+                        default=None,
+                        help="column to summarize (default: just count)")
+    args = parser.parse_args()
+
+    store = ResultsStore(args.store)
+    query = store.query()
+    for text in args.where:
+        query = query.where(*parse_filter(text))
+    if args.group_by:
+        query = query.group_by(args.group_by)
+    result = query.stats(args.stats) if args.stats else query.count()
+    print(f"📊 {len(store)} rows in {args.store}")
+    print(json.dumps(result, indent=2))
@@ -0,0 +1,170 @@
+# Random number streams for games: everything a game randomizes goes through
+# its session's rng (main.GameSession), which is one of these.
+#
+# SharedStream is one generator for everything, in the order the rules ask:
+# what every game rolled with before streams, so seeded games and their
+# stored results stay the same. GameStreams gives each purpose its own
+# substream, cut from buffers of pre-generated bytes:
+#
+#   dice    the players' advisor dice
+#   king    the King's die in winter
+#   enemy   which enemy card is drawn
+#   play    everything else: starting resources, bot picks, lost goods
+#
+# so the n-th die of a seeded game is the same whatever the bots decide, and
+# two policies can be compared on the same dice. Seeding makes one
+# randbytes() call for the first block of every purpose; a purpose that runs
+# out refills from a generator seeded with (seed, purpose, block number), so
+# its values still don't depend on the other purposes. The first blocks hold
+# a two-player full game: measured over 500 seeded games of random bots, the
+# most used was 114 dice, 10 King's dice, 11 enemy draws and 147 play bytes,
+# and none of 2000 games refilled. A refill (a new generator) costs about
+# 10 us, several times what the bigger first blocks add to seeding. Buffers
+# are bytes: dice are bytes of 1-6, mapped from random bytes with
+# bytes.translate, dropping the 4 values that would bias them.
+#
+#   game = main.GameSession(players, rng=GameStreams())
+#   main.simulate_real_mini_game(players, ..., seed=7, game=game)
+
+import os
+import random
+
+# First-block sizes, in random bytes, per purpose
+BLOCK_SIZES = {"dice": 128, "king": 16, "enemy": 16, "play": 192}
+REFILL_SIZE = 256
+
+# Random byte -> die face; bytes 252-255 are dropped (252 = 6 * 42)
+DIE_FACES = bytes(b % 6 + 1 for b in range(252)) + bytes(4)
+DIE_REJECTS = bytes(range(252, 256))
+
+
+class SharedStream:
+
+    def __init__(self, rng=None):
+        # rng: a random.Random, or the random module itself
+        self.rng = rng if rng is not None else random.Random()
+
+    def seed(self, seed):
+        self.rng.seed(seed)
+
+    def roll(self, count):
+        randint = self.rng.randint
+        return [randint(1, 6) for _ in range(count)]
+
+    def king_die(self):
+        return self.rng.randint(1, 6)
+
+    def draw_enemy(self, deck):
+        return self.rng.choice(deck)
+
+    def choice(self, seq):
+        return self.rng.choice(seq)
+
+    def randint(self, a, b):
+        return self.rng.randint(a, b)
+
+
+class ByteStream:
+    # One purpose's buffer, refilled in blocks
+
+    __slots__ = ("purpose", "dice", "seed", "buf", "pos", "blocks")
+
+    def __init__(self, purpose, dice):
+        self.purpose = purpose
+        self.dice = dice  # buffer holds die faces, not raw bytes
+        self.seed = None
+        self.buf = b""
+        self.pos = 0
+        self.blocks = 0
+
+    def reset(self, seed, data):
+        self.seed = seed
+        self.buf = (data.translate(DIE_FACES, DIE_REJECTS)
+                    if self.dice else data)
+        self.pos = 0
+        self.blocks = 0
+
+    def refill(self, count):
+        # Keeps what's left, adds at least count more values
+        left = self.buf[self.pos:]
+        while len(left) < count:
+            self.blocks += 1
+            data = random.Random(
+                f"{self.seed}:{self.purpose}:{self.blocks}").randbytes(
+                    REFILL_SIZE)
+            left += data.translate(DIE_FACES,
+                                   DIE_REJECTS) if self.dice else data
+        self.buf = left
+        self.pos = 0
+
+    def take(self, count):
+        if self.pos + count > len(self.buf):
+            self.refill(count)
+        pos = self.pos
+        self.pos = pos + count
+        return self.buf[pos:pos + count]
+
+    def below(self, n):
+        # Uniform in range(n), by rejection so it isn't biased
+        if n <= 0:
+            raise ValueError("empty range")
+        if n > 256:
+            bits = n.bit_length()
+            while True:
+                value = int.from_bytes(self.take(4), "big") >> (32 - bits)
+                if value < n:
+                    return value
+        limit = 256 - 256 % n
+        while True:
+            if self.pos >= len(self.buf):
+                self.refill(1)
+            byte = self.buf[self.pos]
+            self.pos += 1
+            if byte < limit:
+                return byte % n
+
+
+class GameStreams:
+
+    def __init__(self, seed=None):
+        self.first = random.Random()
+        self.streams = {
+            purpose: ByteStream(purpose, dice=purpose in ("dice", "king"))
+            for purpose in BLOCK_SIZES
+        }
+        self.dice = self.streams["dice"]
+        self.king = self.streams["king"]
+        self.enemy = self.streams["enemy"]
+        self.play = self.streams["play"]
+        self.seed(seed)
+
+    def seed(self, seed):
+        if seed is None:
+            seed = int.from_bytes(os.urandom(8), "big")
+        self.first.seed(seed)
+        data = self.first.randbytes(sum(BLOCK_SIZES.values()))
+        start = 0
+        for purpose, size in BLOCK_SIZES.items():
+            self.streams[purpose].reset(seed, data[start:start + size])
+            start += size
+
+    def roll(self, count):
+        return list(self.dice.take(count))
+
+    def king_die(self):
+        king = self.king
+        if king.pos >= len(king.buf):
+            king.refill(1)
+        king.pos += 1
+        return king.buf[king.pos - 1]
+
+    def draw_enemy(self, deck):
+        return deck[self.enemy.below(len(deck))]
+
+    def choice(self, seq):
+        if not seq:
+            raise IndexError("Cannot choose from an empty sequence")
+        return seq[self.play.below(len(seq))]
+
+    def randint(self, a, b):
+        return a + self.play.below(b - a + 1)
@@ -0,0 +1,227 @@
+# The game's rules data: board.json, player_building_sheet.json and
+# bad_guy_cards.json, found next to this file (not in the working directory),
+# plus everything derived from them that doesn't depend on a game: the parsed
+# enemy cards and the dice outcome table.
+#
+# Nothing is read until get_ruleset() is first called, but importing main
+# calls it: the engine's tables (building bits, compiled advisor actions,
+# enemy decks) are built from the rules at import. What the cache saves is
+# the parsing. The compiled ruleset is marshalled (as .pyc files are) to
+# __pycache__/ruleset.bin, so later processes (pool workers, short CLI runs)
+# load one file instead of parsing the JSON and rebuilding the dice table.
+# The cache is used while the sources' mtimes and sizes are unchanged; if
+# they changed it is still used when the sources' contents hash the same
+# (e.g. after a fresh checkout), and otherwise it is rebuilt. Set
+# KINGSBURG_RULESET_CACHE to put it elsewhere, or to "" to not cache.
+
+import itertools
+import marshal
+import os
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+SOURCES = ("board.json", "player_building_sheet.json", "bad_guy_cards.json")
+CACHE_ENV_VAR = "KINGSBURG_RULESET_CACHE"
+
+# Bump when the compiled form changes, so old caches are rebuilt
+RULESET_VERSION = 1
+
+loaded = None  # the compiled ruleset, once get_ruleset() has run
+
+
+def cache_path():
+    path = os.environ.get(CACHE_ENV_VAR)
+    if path is None:
+        return os.path.join(PACKAGE_DIR, "__pycache__", "ruleset.bin")
+    return path or None
+
+
+def source_paths():
+    return [os.path.join(PACKAGE_DIR, name) for name in SOURCES]
+
+
+def fingerprint(paths):
+    # Cheap check: stat only
+    stats = [os.stat(path) for path in paths]
+    return tuple((s.st_mtime_ns, s.st_size) for s in stats)
+
+
+def content_hash(contents):
+    import hashlib
+
+    digest = hashlib.sha256(str(RULESET_VERSION).encode())
+    for data in contents:
+        digest.update(len(data).to_bytes(8, "big"))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+def build_dice_outcome_table(advisor_values):
+    # For every sorted roll of 3 or 4 dice (56 + 126 of them) and every set of
+    # already-used dice, map each advisor value that can still be reached to
+    # the dice that reach it. Dice sets are bitmasks over positions in the
+    # sorted roll; smaller subsets are preferred, as the old combinations
+    # scan did.
+    table = {}
+    for num_dice in (3, 4):
+        subsets = [
+            sum(1 << i for i in combo) for size in range(1, num_dice + 1)
+            for combo in itertools.combinations(range(num_dice), size)
+        ]
+        for dice in itertools.combinations_with_replacement(
+                range(1, 7), num_dice):
+            reach = {}  # advisor value -> every dice mask reaching it
+            for mask in subsets:
+                total = sum(d for i, d in enumerate(dice) if mask >> i & 1)
+                if total in advisor_values:
+                    reach.setdefault(total, []).append(mask)
+
+            by_used_mask = []
+            for used_mask in range(1 << num_dice):
+                options = {}
+                for val in sorted(reach):
+                    for mask in reach[val]:
+                        if not mask & used_mask:
+                            options[val] = mask
+                            break
+                by_used_mask.append(options)
+            table[dice] = by_used_mask
+    return table
+
+
+# Words allowed after the amount in an enemy card's reward/loss text
+enemy_effect_words = {
+    "wood": "wood",
+    "stone": "stone",
+    "gold": "gold",
+    "vp": "vp",
+    "resource": "any",  # one of wood/stone/gold
+    "resources": "any",
+    "good": "any",
+    "goods": "any",
+    "defense": "armies",
+    "building": "building",
+    "buildings": "building",
+}
+
+
+def find_enemy_defense_kinds(buildings):
+    # Enemy kinds that some building defends against, e.g. "demon"
+    return sorted({
+        effect["resource"][:-len("_defense")]
+        for b in buildings for effect in b.get("effects", [])
+        if effect.get("resource", "").endswith("_defense")
+    })
+
+
+def parse_enemy_effects(text, sign):
+    # "+1 gold, +1 VP" -> [("gold", 1), ("vp", 1)]
+    effects = []
+    for part in text.split(","):
+        words = part.strip().lower().split()
+        if (len(words) != 2 or not words[0].startswith(sign)
+                or not words[0][1:].isdigit()
+                or words[1] not in enemy_effect_words):
+            raise ValueError(f"can't parse {part.strip()!r}")
+        effects.append((enemy_effect_words[words[1]], int(words[0][1:])))
+    return effects
+
+
+def parse_enemy_card(card, defense_kinds):
+    # Parse the reward/loss text once, so a typo fails at load, not mid-game
+    try:
+        rewards = parse_enemy_effects(card["reward"], "+")
+        losses = parse_enemy_effects(card["loss"], "-")
+    except ValueError as e:
+        raise ValueError(
+            f"bad_guy_cards.json: {card['name']} (level {card['level']}): {e}"
+        ) from None
+    name = card["name"].lower()
+    return {
+        **card, "rewards": rewards,
+        "losses": losses,
+        "defense_kinds": tuple(kind for kind in defense_kinds
+                               if kind in name)
+    }
+
+
+def compile_ruleset(contents):
+    # json is only needed when the cache is cold, so it's imported here
+    import json
+
+    board, sheet, cards = (json.loads(data) for data in contents)
+    influencers = {char["value"]: char for char in board["characters"]}
+    buildings = sheet["buildings"]
+    defense_kinds = find_enemy_defense_kinds(buildings)
+    return {
+        "board": board,
+        "influencers": influencers,
+        "all_buildings": buildings,
+        "enemy_defense_kinds": defense_kinds,
+        "all_enemies": [parse_enemy_card(card, defense_kinds)
+                        for card in cards],
+        "dice_outcomes": build_dice_outcome_table(influencers),
+    }
+
+
+def read_cache(path):
+    try:
+        with open(path, "rb") as f:
+            cached = marshal.loads(f.read())  # load(f) reads piecemeal
+    except (OSError, ValueError, EOFError, TypeError):
+        return None
+    if not isinstance(cached, dict) or cached.get(
+            "version") != RULESET_VERSION:
+        return None
+    return cached
+
+
+def write_cache(path, cached):
+    # Written to a temporary file and renamed, so a process loading the cache
+    # while another writes it never sees half a file. A read-only install
+    # just goes without a cache.
+    import tempfile
+
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".",
+                                   suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            marshal.dump(cached, f)
+        os.chmod(tmp, 0o644)  # mkstemp makes it owner-only
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def load_ruleset(path=None):
+    paths = source_paths()
+    path = path or cache_path()
+    stamp = fingerprint(paths)
+    cached = read_cache(path) if path else None
+    if cached is not None and cached["fingerprint"] == stamp:
+        return cached["ruleset"]
+
+    contents = []
+    for source in paths:
+        with open(source, "rb") as f:
+            contents.append(f.read())
+    digest = content_hash(contents)
+    if cached is not None and cached["hash"] == digest:
+        ruleset = cached["ruleset"]  # touched, not changed
+    else:
+        ruleset = compile_ruleset(contents)
+    if path:
+        write_cache(path, {
+            "version": RULESET_VERSION,
+            "fingerprint": stamp,
+            "hash": digest,
+            "ruleset": ruleset
+        })
+    return ruleset
+
+
+def get_ruleset():
+    global loaded
+    if loaded is None:
+        loaded = load_ruleset()
+    return loaded
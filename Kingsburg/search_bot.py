@@ -0,0 +1,459 @@
+# Search-based bot policy: expectimax over dice rolls and winter enemies.
+#
+# Give a bot one with p.policy = SearchBot(). It plans each turn by trying
+# every advisor (with and without a +2 token), every way to answer the
+# advisor's choices, and every building it could build after, then scores
+# the result by looking ahead over the dice rolls of the seasons left before
+# winter. Winter itself is scored exactly from winter_odds' combat tables, so
+# enemy draws and the King's die cost nothing to look ahead over.
+#
+# Search deepens one season at a time until the per-move time or node budget
+# runs out; the deepest finished search decides the move. Values are kept in
+# a transposition table keyed by the canonical state tuple (resources,
+# buildings, dice, used dice, blocked advisors, seasons left, round), which
+# lives as long as the policy, so positions that repeat across seasons and
+# games aren't searched again.
+#
+# Future seasons assume no advisor is blocked by other players, and ignore
+# season bonus buildings.
+#
+#   python search_bot.py --games 500     # search bot vs. random bot
+
+import argparse
+import itertools
+import time
+from collections import Counter
+
+import main
+import winter_odds
+from renderers import NullRenderer
+
+GOODS = ("wood", "stone", "gold")
+RESOURCES = ("wood", "stone", "gold", "armies", "vp", "plus2")
+SLOT = {res: i for i, res in enumerate(RESOURCES)}
+WOOD, STONE, GOLD, ARMIES, VP, PLUS2 = range(len(RESOURCES))
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+def add(res, index, amount):
+    res = list(res)
+    res[index] += amount
+    return tuple(res)
+
+
+def roll_distribution(num_dice):
+    # [(sorted dice, probability)] for every distinct roll of num_dice dice
+    counts = Counter(
+        tuple(sorted(dice))
+        for dice in itertools.product(range(1, 7), repeat=num_dice))
+    total = 6**num_dice
+    return [(dice, count / total) for dice, count in sorted(counts.items())]
+
+
+roll_distributions = {n: roll_distribution(n) for n in (3, 4)}
+
+
+def goods_splits(amount):
+    # Every way to take `amount` goods of the player's choice, with the
+    # answers ask_resource would be given, one per good
+    return [(tuple(choice.count(r) for r in GOODS), choice)
+            for choice in itertools.combinations_with_replacement(
+                GOODS, amount)]
+
+
+def apply_action(res, action):
+    # [(new res, answers)] for every way the player could resolve action
+    typ = action["type"]
+    if typ == "gain" and action["resource"] in SLOT:
+        return [(add(res, SLOT[action["resource"]], action["amount"]), ())]
+    if typ == "lose" and action["resource"] in SLOT:
+        index = SLOT[action["resource"]]
+        return [(add(res, index, -min(res[index], action["amount"])), ())]
+    if typ == "choose":
+        choices = action["resource"]
+        amount = action["amount"]
+        if choices == "any":
+            outcomes = []
+            for split, answers in goods_splits(amount):
+                new = res
+                for index, got in enumerate(split):
+                    new = add(new, index, got)
+                outcomes.append((new, answers))
+            return outcomes
+        outcomes = []
+        for number, choice in enumerate(choices, 1):
+            new = res
+            for r in (choice if isinstance(choice, list) else [choice]):
+                new = add(new, SLOT[r], 1 if isinstance(choice, list) else
+                          amount)
+            outcomes.append((new, (number, )))
+        return outcomes
+    if typ == "trade":
+        # handle_trade_action offers each good the player has, in GOODS order
+        outcomes = []
+        givable = [i for i in range(len(GOODS)) if res[i] >= 1]
+        for number, give in enumerate(givable, 1):
+            new = list(res)
+            new[give] -= 1
+            for i in range(len(GOODS)):
+                if i != give:
+                    new[i] += 1
+            outcomes.append((tuple(new), (number, )))
+        return outcomes or [(res, ())]
+    return [(res, ())]
+
+
+def apply_effects(res, actions):
+    # Resolves a list of actions in order: [(new res, answers)]
+    outcomes = [(res, ())]
+    for action in actions:
+        outcomes = [(new, answers + more)
+                    for current, answers in outcomes
+                    for new, more in apply_action(current, action)]
+    return outcomes
+
+
+def building_actions(building):
+    # Building effects as actions: immediate gains only (see
+    # apply_building_effects); "any" goods are chosen like an advisor's
+    actions = []
+    for effect in building.get("effects", []):
+        if effect["type"] != "gain":
+            continue
+        if effect["resource"] == "any":
+            actions.append({
+                "type": "choose",
+                "resource": "any",
+                "amount": effect["amount"]
+            })
+        elif effect["resource"] in SLOT:
+            actions.append(effect)
+    return actions
+
+
+advisor_actions = {
+    val: char.get("actions", [])
+    for val, char in main.influencers.items()
+}
+build_actions = {
+    b["level"]: building_actions(b)
+    for b in main.all_buildings
+}
+
+
+def player_resources(p):
+    return tuple(getattr(p, r) for r in RESOURCES)
+
+
+def get_buildable(res, built):
+    # main.get_buildable for a (resources, buildings) state
+    return main.find_buildable(built, res[WOOD], res[STONE], res[GOLD])
+
+
+class SearchBot:
+
+    def __init__(self,
+                 time_budget=0.005,
+                 node_budget=None,
+                 max_depth=3,
+                 goods_value=0.4,
+                 plus2_value=0.6,
+                 army_value=0.1,
+                 table_size=1 << 20):
+        self.time_budget = time_budget  # seconds per move, or None
+        self.node_budget = node_budget  # searched positions per move
+        self.max_depth = max_depth  # seasons to look ahead
+        self.goods_value = goods_value  # VP a spare good is worth
+        self.plus2_value = plus2_value
+        self.army_value = army_value
+        self.table_size = table_size
+        self.table = {}  # transposition table: state key -> value
+        self.evals = {}  # (res, built, level) -> static value
+        self.answers = []  # planned answers for ask_resource/ask_number
+        self.nodes = 0
+        self.limit = None
+        self.deadline = None
+        self.moves = 0
+        self.search_time = 0.0
+
+    def __getstate__(self):
+        # Tables are rebuilt in whichever process the policy ends up in
+        state = dict(self.__dict__)
+        state["table"] = {}
+        state["evals"] = {}
+        return state
+
+    # Decisions main.py asks a bot with a policy for
+
+    def choose_advisor(self, game, p, dice_key, used_mask,
+                       available_options):
+        left, level = game.seasons_left, game.current_round
+        blocked = self.blocked_advisors(game, p)
+        res = player_resources(p)
+        options = [(None, (res, ()))]  # stop here
+        reachable = main.get_reachable_advisors(dice_key, used_mask)
+        for raw, base, val in self.advisor_moves(res, dice_key, used_mask,
+                                                 blocked):
+            new_mask = used_mask | reachable[base]
+            for outcome in apply_effects(res, advisor_actions[val]):
+                options.append(((raw, new_mask), outcome))
+
+        def score(option, depth):
+            move, (new_res, answers) = option
+            if move is None:
+                return self.build_value(new_res, p.built, left, level, depth,
+                                        self.num_dice(p))
+            raw, new_mask = move
+            if raw.endswith("+2"):
+                new_res = add(new_res, PLUS2, -1)
+            return self.turn_value(new_res, p.built, dice_key, new_mask,
+                                   blocked, left, level, depth,
+                                   self.num_dice(p))
+
+        move, answers = self.search(options, score)
+        self.answers = list(answers)
+        return "0" if move is None else move[0]
+
+    def choose_building(self, game, p, buildable):
+        left, level = game.seasons_left, game.current_round
+        res = player_resources(p)
+        options = [(None, (res, ()))]
+        for b in buildable:
+            paid = self.pay(res, b)
+            for outcome in apply_effects(paid, build_actions[b["level"]]):
+                options.append((b, outcome))
+
+        def score(option, depth):
+            b, (new_res, answers) = option
+            built = p.built if b is None else p.built | main.building_bits[
+                b["level"]]
+            return self.future_value(new_res, built, left, level, depth,
+                                     self.num_dice(p))
+
+        building, answers = self.search(options, score)
+        self.answers = list(answers)
+        return building
+
+    def choose_resource(self, p):
+        if self.answers and isinstance(self.answers[0], str):
+            return self.answers.pop(0)
+        self.answers = []
+        # Unplanned (season bonus, winter reward): the scarcest good
+        return min(GOODS, key=lambda r: getattr(p, r))
+
+    def choose_number(self, p, count):
+        if self.answers and isinstance(self.answers[0], int):
+            number = self.answers.pop(0)
+            if number <= count:
+                return number
+        self.answers = []
+        return 1
+
+    # Search
+
+    def search(self, options, score):
+        # Iterative deepening: the deepest search that finished decides.
+        # Depth 0 (this turn only) always finishes.
+        start = time.perf_counter()
+        self.nodes = 0
+        self.limit = None
+        self.deadline = None
+        best = max(options, key=lambda option: score(option, 0))
+        if self.time_budget is not None:
+            self.deadline = start + self.time_budget
+        self.limit = self.node_budget
+        try:
+            for depth in range(1, self.max_depth + 1):
+                best = max(options, key=lambda option: score(option, depth))
+        except SearchTimeout:
+            pass
+        if len(self.table) > self.table_size:
+            self.table.clear()
+        self.moves += 1
+        self.search_time += time.perf_counter() - start
+        move, (_, answers) = best
+        return move, answers
+
+    def count_node(self):
+        self.nodes += 1
+        if self.limit is not None and self.nodes > self.limit:
+            raise SearchTimeout
+        if (self.deadline is not None and not self.nodes & 63
+                and time.perf_counter() > self.deadline):
+            raise SearchTimeout
+
+    def blocked_advisors(self, game, p):
+        if p.kings_envoy:
+            return frozenset()
+        return frozenset(val for val, owner in game.influencer_owners.items()
+                         if owner != p.name)
+
+    def num_dice(self, p):
+        return 4 if p.bonus_die else 3
+
+    def advisor_moves(self, res, dice_key, used_mask, blocked):
+        # (answer, dice sum, advisor): ("10", 10, 10) per reachable advisor,
+        # ("8+2", 8, 10) per +2 token use
+        reachable = main.get_reachable_advisors(dice_key, used_mask)
+        for val in reachable:
+            if val not in blocked:
+                yield str(val), val, val
+        if res[PLUS2] > 0:
+            for val in reachable:
+                boosted = val + 2
+                if boosted in main.influencers and boosted not in blocked:
+                    yield f"{val}+2", val, boosted
+
+    def pay(self, res, building):
+        cost = building["cost"]
+        return (res[WOOD] - cost["wood"], res[STONE] - cost["stone"],
+                res[GOLD] - cost["gold"]) + res[3:]
+
+    def turn_value(self, res, built, dice_key, used_mask, blocked, left,
+                   level, depth, num_dice):
+        # Best value of the rest of a turn: claim another advisor, or stop
+        # and go on to the build phase
+        key = ("turn", res, built, dice_key, used_mask, blocked, left, level,
+               depth, num_dice)
+        value = self.table.get(key)
+        if value is not None:
+            return value
+        self.count_node()
+        value = self.build_value(res, built, left, level, depth, num_dice)
+        if used_mask != (1 << len(dice_key)) - 1:
+            reachable = main.get_reachable_advisors(dice_key, used_mask)
+            for raw, base, val in self.advisor_moves(
+                    res, dice_key, used_mask, blocked):
+                start = add(res, PLUS2, -1) if base != val else res
+                new_mask = used_mask | reachable[base]
+                for new_res, answers in apply_effects(start,
+                                                      advisor_actions[val]):
+                    value = max(
+                        value,
+                        self.turn_value(new_res, built, dice_key, new_mask,
+                                        blocked, left, level, depth,
+                                        num_dice))
+        self.table[key] = value
+        return value
+
+    def build_value(self, res, built, left, level, depth, num_dice):
+        # Best value after this season's build phase
+        value = self.future_value(res, built, left, level, depth, num_dice)
+        for b in get_buildable(res, built):
+            paid = self.pay(res, b)
+            new_built = built | main.building_bits[b["level"]]
+            for new_res, answers in apply_effects(paid,
+                                                  build_actions[b["level"]]):
+                value = max(
+                    value,
+                    self.future_value(new_res, new_built, left, level, depth,
+                                      num_dice))
+        return value
+
+    def future_value(self, res, built, left, level, depth, num_dice):
+        # Expected value over the next season's roll, or the static value at
+        # winter / the search horizon
+        if not left or not depth:
+            return self.evaluate(res, built, level)
+        key = ("future", res, built, left, level, depth, num_dice)
+        value = self.table.get(key)
+        if value is not None:
+            return value
+        self.count_node()
+        value = 0.0
+        for dice_key, chance in roll_distributions[num_dice]:
+            value += chance * self.turn_value(res, built, dice_key, 0,
+                                              frozenset(), left - 1, level,
+                                              depth - 1, num_dice)
+        self.table[key] = value
+        return value
+
+    def evaluate(self, res, built, level):
+        # VP, plus the exact expected outcome of the coming winter, plus
+        # what spare goods, tokens and armies are worth later
+        key = (res, built, level)
+        value = self.evals.get(key)
+        if value is not None:
+            return value
+        wood, stone, gold, armies, vp, plus2 = res
+        goods = wood + stone + gold
+        value = (vp + self.goods_value * goods + self.plus2_value * plus2 +
+                 self.army_value * armies)
+        if level in main.enemy_decks:
+            summary = main.get_effect_summary(built)
+            kind_defense = tuple(summary["enemy_defense"].get(kind, 0)
+                                 for kind in main.enemy_defense_kinds)
+            table = winter_odds.get_combat_table(level, armies,
+                                                 summary["defense"],
+                                                 kind_defense,
+                                                 summary["tie_breaker"])
+            value += table["win"] * summary["vp_per_win"]
+            value += self.resource_value(table["rewards"], res, 1)
+            for chance, losses in table["loss_chances"]:
+                value -= chance * self.resource_value(dict(losses), res, -1)
+        self.evals[key] = value
+        return value
+
+    def resource_value(self, amounts, res, sign):
+        # VP worth of a {resource: amount} gain (sign 1) or loss (sign -1);
+        # a loss can't take more than the player has
+        value = 0.0
+        for resource, amount in amounts.items():
+            if resource == "any":
+                if sign < 0:
+                    amount = min(amount, res[WOOD] + res[STONE] + res[GOLD])
+                value += self.goods_value * amount
+            elif resource in SLOT:
+                if sign < 0:
+                    amount = min(amount, res[SLOT[resource]])
+                weight = {
+                    VP: 1,
+                    PLUS2: self.plus2_value,
+                    ARMIES: self.army_value
+                }.get(SLOT[resource], self.goods_value)
+                value += weight * amount
+        return value
+
+
+def play_match(num_games, policies, seed=0):
+    # Mini-games between bots with the given policies (None = random);
+    # returns each seat's mean VP
+    players = []
+    for i, policy in enumerate(policies, 1):
+        p = main.PlayerState(name=f"Bot {i}", type="bot")
+        p.policy = policy
+        players.append(p)
+    previous = main.set_renderer(NullRenderer())
+    totals = [0] * len(players)
+    try:
+        for game in range(num_games):
+            results = main.simulate_real_mini_game(players,
+                                                   main.all_buildings,
+                                                   main.influencers, None,
+                                                   seed=seed + game)
+            for i, result in enumerate(results):
+                totals[i] += result["vp"]
+    finally:
+        main.set_renderer(previous)
+    return [total / num_games for total in totals]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search bot vs. random bot")
+    parser.add_argument("--games", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--time-ms", type=float, default=5.0)
+    parser.add_argument("--nodes", type=int, default=None)
+    args = parser.parse_args()
+
+    bot = SearchBot(time_budget=args.time_ms / 1000, node_budget=args.nodes)
+    baseline = play_match(args.games, [None, None], args.seed)
+    searched = play_match(args.games, [bot, None], args.seed)
+    print(f"Random vs random: {baseline[0]:.2f} VP vs {baseline[1]:.2f} VP")
+    print(f"Search vs random: {searched[0]:.2f} VP vs {searched[1]:.2f} VP")
+    print(f"{bot.moves} search moves, "
+          f"{bot.search_time / max(1, bot.moves) * 1000:.2f} ms per move, "
+          f"{len(bot.table)} table entries")
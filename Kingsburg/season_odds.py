@@ -0,0 +1,312 @@
+# Exact outcome distributions of a season or a year, instead of sampling.
+#
+# One player's season has few random branches: the roll (56 sorted rolls of 3
+# dice, 126 of 4, each weighted by how many of the 216 or 1296 ordered rolls
+# sort to it, so every roll with the same dice is played once), and whatever
+# the policy, the random bot, or a winter penalty picks at random (equal
+# picks, like two golds in a penalty's pool, are one branch too). Each phase
+# of the season is played by the engine itself with a stream that, instead
+# of drawing, walks every branch in turn: each run takes the next untried
+# path and the phase is played again from its start state, until every path
+# has been taken. Runs that end in the same state add up their chances, and
+# the next phase starts once from each state. Chances are Fractions, so the
+# distributions are exact.
+#
+# A state is (wood, stone, gold, armies, vp, plus2, built, wins), wins being
+# battles won since the start state. Phase distributions ({state: chance})
+# are memoized per SeasonOdds, so paths that meet share what follows. A
+# season takes well under a second; a whole year has 10^5 or so end states
+# and takes a minute or so. The player plays alone: the bonus die and the
+# King's Envoy are what's given for the whole year, and other players'
+# claims can be given as owners (advisor value -> name).
+#
+# Policies must decide the same way every time they see the same position
+# (SearchBot only with time_budget=None). One that doesn't raises ValueError
+# once a run draws differently, or stops drawing sooner, than the path it
+# replays; a change of mind that leaves the draws alone can't be seen.
+#
+#   odds = SeasonOdds(policy=SolverBot())
+#   year = odds.year(start_state(wood=3, stone=3, gold=3))
+#   expected(year, "vp"), marginal(year, "wins")
+#
+#   python season_odds.py --wood 3 --stone 3 --gold 3 --policy solver
+
+import argparse
+import itertools
+from collections import Counter
+from fractions import Fraction
+
+import main
+from renderers import NullRenderer
+
+STATE_FIELDS = ("wood", "stone", "gold", "armies", "vp", "plus2", "built",
+                "wins")
+SEASONS = ("Spring", "Summer", "Fall")
+CHANGED_PATH = ("the game went differently on a path already taken: the "
+                "policy must decide the same way every time")
+
+
+def roll_counts(num_dice):
+    # [(sorted dice, how many ordered rolls sort to them)]
+    counts = Counter(
+        tuple(sorted(dice))
+        for dice in itertools.product(range(1, 7), repeat=num_dice))
+    return sorted(counts.items())
+
+
+rolls = {n: roll_counts(n) for n in (3, 4)}
+
+
+class BranchingStream:
+    # A game's rng (see rng_streams.py) that takes one path through every
+    # random branch per run; next_path() moves on to the next one
+
+    def __init__(self):
+        self.path = []  # option taken at each branch
+        self.widths = []  # number of options at each branch
+        self.depth = 0
+        # The path's chance, kept as two ints while it's played
+        self.numerator = 1
+        self.denominator = 1
+
+    def start(self):
+        self.depth = 0
+        self.numerator = 1
+        self.denominator = 1
+
+    def finish(self):
+        # A run that ends before the branches its path already has went
+        # differently too
+        if self.depth < len(self.path):
+            raise ValueError(CHANGED_PATH)
+
+    def next_path(self):
+        # False once every path has been taken
+        while self.path and self.path[-1] + 1 == self.widths[-1]:
+            self.path.pop()
+            self.widths.pop()
+        if not self.path:
+            return False
+        self.path[-1] += 1
+        return True
+
+    def branch(self, width):
+        depth = self.depth
+        self.depth += 1
+        if depth < len(self.path):
+            if self.widths[depth] != width:
+                raise ValueError(CHANGED_PATH)
+            return self.path[depth]
+        self.path.append(0)
+        self.widths.append(width)
+        return 0
+
+    def pick(self, seq):
+        if not seq:
+            raise IndexError("Cannot choose from an empty sequence")
+        index = self.branch(len(seq))
+        self.denominator *= len(seq)
+        return seq[index]
+
+    def seed(self, seed):
+        pass
+
+    def roll(self, count):
+        options = rolls[count]
+        dice, ways = options[self.branch(len(options))]
+        self.numerator *= ways
+        self.denominator *= 6**count
+        return list(dice)
+
+    def king_die(self):
+        return self.pick(range(1, 7))
+
+    def draw_enemy(self, deck):
+        return self.pick(deck)
+
+    def choice(self, seq):
+        # Equal entries are one branch, weighted by how many there are (a
+        # penalty draws from a pool with one entry per good)
+        try:
+            counts = Counter(seq)
+        except TypeError:  # e.g. buildings: dicts, all different anyway
+            return self.pick(seq)
+        if len(counts) == len(seq):
+            return self.pick(seq)
+        value, count = list(counts.items())[self.branch(len(counts))]
+        self.numerator *= count
+        self.denominator *= len(seq)
+        return value
+
+    def randint(self, a, b):
+        return self.pick(range(a, b + 1))
+
+
+def start_state(wood=0, stone=0, gold=0, armies=0, vp=0, plus2=0,
+                buildings=()):
+    built = 0
+    for level in buildings:
+        built |= main.building_bits[level]
+    return (wood, stone, gold, armies, vp, plus2, built, 0)
+
+
+def player_state(p):
+    return (p.wood, p.stone, p.gold, p.armies, p.vp, p.plus2, p.built, 0)
+
+
+def expected(outcomes, field):
+    # Exact mean of one state field
+    index = STATE_FIELDS.index(field)
+    return sum(chance * state[index] for state, chance in outcomes.items())
+
+
+def marginal(outcomes, field):
+    # {value: chance} of one state field
+    index = STATE_FIELDS.index(field)
+    values = {}
+    for state, chance in outcomes.items():
+        values[state[index]] = values.get(state[index], 0) + chance
+    return dict(sorted(values.items()))
+
+
+def combine(outcomes, step):
+    # Follows every state of a distribution with step(state) -> distribution
+    combined = {}
+    for state, chance in outcomes.items():
+        for after, then in step(state).items():
+            combined[after] = combined.get(after, 0) + chance * then
+    return combined
+
+
+class SeasonOdds:
+
+    def __init__(self, policy=None):
+        # policy: a bot policy (see search_bot.py), or None for the random bot
+        self.stream = BranchingStream()
+        self.player = main.PlayerState(name="Player", type="bot")
+        self.player.policy = policy
+        self.game = main.GameSession([self.player],
+                                     renderer=NullRenderer(),
+                                     rng=self.stream)
+        self.game.auto_play = True
+        self.memo = {}
+        self.runs = 0  # phases played, over every path
+
+    def season(self, state, season, round_number=1, bonus_die=False,
+               kings_envoy=False, owners=None):
+        # The season's phases one at a time, so paths that meet in a state
+        # after one phase play the next phase once
+        context = (season, round_number, bonus_die, kings_envoy,
+                   tuple(sorted((owners or {}).items())))
+        outcomes = {state: Fraction(1)}
+        for phase in (self.bonus_phase, self.influence_phase,
+                      self.build_phase):
+            outcomes = combine(
+                outcomes, lambda s: self.phase_outcomes(s, context, phase))
+        return outcomes
+
+    def winter(self, state, round_number=1):
+        return self.phase_outcomes(state, ("Winter", round_number, False,
+                                           False, ()), self.winter_phase)
+
+    def year(self, state, round_number=1, bonus_die=False,
+             kings_envoy=False, seasons=SEASONS):
+        # The seasons (the mini-game plays Spring and Summer), then the
+        # winter battle
+        outcomes = {state: Fraction(1)}
+        for season in seasons:
+            outcomes = combine(
+                outcomes, lambda s: self.season(s, season, round_number,
+                                                bonus_die, kings_envoy))
+        return combine(outcomes, lambda s: self.winter(s, round_number))
+
+    # Phases: each plays on from the state the game was set to
+
+    def bonus_phase(self, game, p, season):
+        main.apply_seasonal_bonuses(game, season)
+
+    def influence_phase(self, game, p, season):
+        dice = main.roll_dice(game, p)
+        dice_key = tuple(sorted(dice))
+        used_mask = 0
+        while used_mask != (1 << len(dice)) - 1:
+            used_mask = main.choose_influencer(game, dice_key, used_mask)
+            if used_mask is None:
+                break
+
+    def build_phase(self, game, p, season):
+        main.build_phase(game)
+
+    def winter_phase(self, game, p, season):
+        main.handle_winter(game, game.current_round)
+
+    def phase_outcomes(self, state, context, phase):
+        # {state: chance} after phase, by playing it down every path
+        key = (phase.__name__, state, context)
+        outcomes = self.memo.get(key)
+        if outcomes is not None:
+            return outcomes
+        season, round_number, bonus_die, kings_envoy, owners = context
+        game, p, stream = self.game, self.player, self.stream
+        wood, stone, gold, armies, vp, plus2, built, wins = state
+        start = (wood, stone, gold, armies, vp, plus2, built, bonus_die,
+                 kings_envoy, ())
+        game.current_round = round_number
+        game.current_player = p
+        if season != "Winter":
+            game.seasons_left = 2 - SEASONS.index(season)
+        stream.path, stream.widths = [], []
+        outcomes = {}
+        while True:
+            p.restore(start)
+            game.influencer_owners = dict(owners)
+            stream.start()
+            phase(game, p, season)
+            stream.finish()
+            self.runs += 1
+            won = sum(1 for battle in p.combat_log
+                      if battle["result"] == "win")
+            after = (p.wood, p.stone, p.gold, p.armies, p.vp, p.plus2,
+                     p.built, wins + won)
+            chance = Fraction(stream.numerator, stream.denominator)
+            outcomes[after] = outcomes.get(after, 0) + chance
+            if not stream.next_path():
+                break
+        self.memo[key] = outcomes
+        return outcomes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Exact outcome odds of one player's year")
+    for field in ("wood", "stone", "gold", "armies", "vp", "plus2"):
+        parser.add_argument(f"--{field}", type=int, default=0)
+    parser.add_argument("--round", type=int, default=1)
+    parser.add_argument("--bonus-die", action="store_true")
+    parser.add_argument("--kings-envoy", action="store_true")
+    parser.add_argument("--seasons",
+                        nargs="+",
+                        choices=SEASONS,
+                        default=list(SEASONS),
+                        help="seasons before winter (mini-game: Spring "
+                        "Summer)")
+    parser.add_argument("--policy",
+                        choices=("random", "solver"),
+                        default="random")
+    args = parser.parse_args()
+
+    policy = None
+    if args.policy == "solver":
+        from influence_solver import SolverBot
+        policy = SolverBot()
+    odds = SeasonOdds(policy)
+    start = start_state(args.wood, args.stone, args.gold, args.armies,
+                        args.vp, args.plus2)
+    year = odds.year(start, args.round, args.bonus_die, args.kings_envoy,
+                     tuple(args.seasons))
+    print(f"📊 Round {args.round}, {args.policy} policy: {len(year)} end "
+          f"states from {odds.runs} phase runs")
+    for field in ("vp", "wood", "stone", "gold", "armies", "wins"):
+        print(f"  {field}: {float(expected(year, field)):.4f} expected")
+    print("  VP: " + ", ".join(f"{vp}: {float(chance):.2%}"
+                               for vp, chance in marginal(year, "vp").items()))
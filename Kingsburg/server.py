@@ -0,0 +1,424 @@
+# Game server: many Kingsburg games, human and bot, on one asyncio event loop.
+#
+# Players connect over TCP and speak a line protocol, so `nc localhost 8765`
+# is a client. In the lobby:
+#
+#   NAME <name>            set your name
+#   HOST [humans] [bots]   open a game (default: just you and one bot)
+#   JOIN <game>            take a seat in an open game; it starts when full
+#   LIST                   show open games
+#   QUIT
+#
+# In a game, every player sees the game's output, and a line starting with
+# "? " asks you for input; your next line is the answer.
+#
+# Every game is a task on the event loop. The rules are synchronous (see
+# main.py), so a game plays as main.full_game_steps, one player's turn,
+# build or battle at a time, yielding to the other games between steps. When
+# the rules ask a human something that hasn't been answered yet, the step
+# stops (AwaitingAnswer), the game is put back where the step started
+# (GameSession.restore) and the task waits for the player's next line. Then
+# the step is played again: its dice, events and earlier answers come back
+# from where the step left them (StepStream, StepRenderer), so nothing is
+# rolled or sent twice, and the rules carry on with the new answer. A game
+# waiting on a human costs nothing but its state. A player who disconnects
+# is replaced by a bot.
+#
+# At most --max-games games are open or playing; past that, HOST is refused.
+#
+# With --record, every game is written to a recording as it ends, so a bug
+# report can be replayed exactly (see recording.py).
+#
+#   python server.py --port 8765 --max-games 500 --record games.kbr
+
+import argparse
+import asyncio
+import itertools
+
+import main
+from recording import GameRecorder, RecordingWriter
+from renderers import ConsoleRenderer
+from search_bot import SearchBot
+
+HELP = """Commands:
+  NAME <name>            set your name
+  HOST [humans] [bots]   open a game (default: just you and one bot)
+  JOIN <game>            take a seat in an open game
+  LIST                   show open games
+  QUIT
+"""
+
+
+class AwaitingAnswer(Exception):
+    # Raised out of the rules when player has yet to answer prompt
+
+    def __init__(self, player, prompt):
+        super().__init__(prompt)
+        self.player = player
+        self.prompt = prompt
+
+
+class Client:
+
+    def __init__(self, writer, name):
+        self.writer = writer
+        self.name = name
+        self.table = None
+        self.answer = None  # Future the game waits on for our next line
+        self.closed = False
+
+    def send(self, text):
+        if not self.closed:
+            self.writer.write(text.encode())
+
+
+class TableOutput:
+    # File-like: what the game prints goes to everyone at the table
+
+    def __init__(self, table):
+        self.table = table
+
+    def write(self, text):
+        self.table.broadcast(text)
+
+    def flush(self):
+        pass
+
+
+class TableRenderer(ConsoleRenderer):
+    # The console game's output, sent to the table; questions go to the
+    # player whose turn it is
+
+    def __init__(self, table):
+        super().__init__(out=TableOutput(table))
+        self.table = table
+
+    def ask(self, prompt):
+        return self.table.ask(prompt)
+
+
+class StepStream:
+    # Wraps a game's rng (see rng_streams.py): what it hands out during a
+    # step is handed out again, in order, when the step is replayed
+
+    def __init__(self, inner):
+        self.inner = inner
+        self.draws = []
+        self.position = 0
+
+    def new_step(self):
+        self.draws = []
+        self.position = 0
+
+    def replay(self):
+        self.position = 0
+
+    def draw(self, method, *args):
+        if self.position < len(self.draws):
+            value = self.draws[self.position]
+        else:
+            value = method(*args)
+            self.draws.append(value)
+        self.position += 1
+        return value
+
+    def seed(self, seed):
+        self.inner.seed(seed)
+
+    def roll(self, count):
+        return list(self.draw(self.inner.roll, count))
+
+    def king_die(self):
+        return self.draw(self.inner.king_die)
+
+    def draw_enemy(self, deck):
+        return self.draw(self.inner.draw_enemy, deck)
+
+    def choice(self, seq):
+        return self.draw(self.inner.choice, seq)
+
+    def randint(self, a, b):
+        return self.draw(self.inner.randint, a, b)
+
+
+class StepRenderer:
+    # Wraps a game's renderer: events a step already sent aren't sent again
+    # when it's replayed, and questions it already asked get the same
+    # answers
+
+    def __init__(self, inner):
+        self.inner = inner
+        self.sent = 0
+        self.position = 0
+        self.answers = []
+        self.asked = 0
+
+    def new_step(self):
+        self.sent = self.position = 0
+        self.answers = []
+        self.asked = 0
+
+    def replay(self):
+        self.position = 0
+        self.asked = 0
+
+    def emit(self, kind, **fields):
+        self.position += 1
+        if self.position > self.sent:
+            self.sent = self.position
+            self.inner.emit(kind, **fields)
+
+    def ask(self, prompt):
+        if self.asked < len(self.answers):
+            answer = self.answers[self.asked]
+        else:
+            answer = self.inner.ask(prompt)
+            self.answers.append(answer)
+        self.asked += 1
+        return answer
+
+
+class Table:
+
+    def __init__(self, table_id, humans, bots, search_bots=False):
+        self.id = table_id
+        self.humans = humans
+        self.bots = bots
+        self.search_bots = search_bots
+        self.clients = []
+        self.seats = {}  # PlayerState -> Client, for human players
+        self.answers = []  # lines received for the step being played
+        self.game = None
+
+    def broadcast(self, text):
+        for client in self.clients:
+            if client.table is self:
+                client.send(text)
+
+    def start(self):
+        players = []
+        for client in self.clients:
+            p = main.PlayerState(name=client.name, type="human")
+            self.seats[p] = client
+            players.append(p)
+        for i in range(1, self.bots + 1):
+            p = main.PlayerState(name=f"Bot {i}", type="bot")
+            if self.search_bots:
+                p.policy = SearchBot()
+            players.append(p)
+        self.game = main.GameSession(players, renderer=TableRenderer(self))
+        self.game.auto_play = True
+
+    def ask(self, prompt):
+        # The answer the player gave while the game waited (see
+        # wait_for_answer), or AwaitingAnswer. A player who has left is made
+        # a bot here, inside the rules, so they (and a recording) see the
+        # switch at one definite point.
+        p = self.game.current_player
+        if p not in self.seats:
+            p.type = "bot"
+            return ""
+        if self.answers:
+            return self.answers.pop(0)
+        raise AwaitingAnswer(p, prompt)
+
+    async def wait_for_answer(self, p, prompt):
+        # Asks player p, and keeps their next line for ask() (the game plays
+        # the step again once this returns)
+        client = self.seats.get(p)
+        if client is None or client.closed:
+            return  # ask() hands the seat to a bot
+        client.answer = asyncio.get_running_loop().create_future()
+        client.send(f"? {prompt.strip()}\n")
+        text = await client.answer
+        if p in self.seats:
+            self.answers.append(text)
+
+    def leave(self, client):
+        # The player gives up their seat (see ask); a pending question gets
+        # no answer
+        self.clients.remove(client)
+        for p, seated in list(self.seats.items()):
+            if seated is client:
+                del self.seats[p]
+        if client.answer is not None and not client.answer.done():
+            client.answer.set_result("")
+        client.answer = None
+        client.table = None
+
+    def standings(self):
+        ranked = sorted(self.game.players, key=lambda p: p.vp, reverse=True)
+        return "".join(f"  {p.name}: {p.vp} VP\n" for p in ranked)
+
+
+class GameServer:
+
+    def __init__(self, max_games=500, search_bots=False, record_path=None):
+        self.max_games = max_games
+        self.search_bots = search_bots
+        # Games are written unbuffered, so a crash loses none that finished
+        self.recording = RecordingWriter(
+            record_path, buffer_size=0) if record_path else None
+        self.tables = {}  # id -> Table, open or playing
+        self.table_ids = itertools.count(1)
+        self.guest_ids = itertools.count(1)
+
+    async def serve(self, host="127.0.0.1", port=8765):
+        server = await asyncio.start_server(self.handle_client, host, port)
+        print(f"🏰 Kingsburg server listening on {host}:{port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if self.recording is not None:
+                self.recording.close()
+
+    async def handle_client(self, reader, writer):
+        client = Client(writer, f"Guest {next(self.guest_ids)}")
+        client.send(f"Welcome to Kingsburg, {client.name}!\n{HELP}")
+        if len(self.tables) >= self.max_games:
+            client.send(f"🚫 The server is at its {self.max_games}-game "
+                        "limit; you can JOIN an open game or try again "
+                        "later.\n")
+        try:
+            while not client.closed:
+                line = await reader.readline()
+                if not line:
+                    break
+                text = line.decode(errors="replace").strip()
+                if client.answer is not None and not client.answer.done():
+                    answer, client.answer = client.answer, None
+                    answer.set_result(text)
+                else:
+                    self.command(client, text)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            if client.table is not None:
+                table = client.table
+                table.leave(client)
+                if table.game is None and not table.clients:
+                    del self.tables[table.id]
+            client.closed = True
+            writer.close()
+
+    def command(self, client, text):
+        words = text.split()
+        if not words:
+            return
+        verb, args = words[0].upper(), words[1:]
+        if client.table is not None and client.table.game is not None:
+            client.send("It's not your turn.\n")
+        elif verb == "NAME" and args:
+            client.name = " ".join(args)
+            client.send(f"You are now {client.name}.\n")
+        elif verb == "HOST" and client.table is None:
+            try:
+                humans = int(args[0]) if args else 1
+                bots = int(args[1]) if len(args) > 1 else (
+                    1 if humans == 1 else 0)
+            except ValueError:
+                client.send("Usage: HOST [humans] [bots]\n")
+                return
+            if humans < 1 or bots < 0 or humans + bots < 2:
+                client.send("A game needs you and at least one more player.\n")
+                return
+            if len(self.tables) >= self.max_games:
+                client.send(f"🚫 The server is at its {self.max_games}-game "
+                            "limit. Try again later.\n")
+                return
+            table = Table(next(self.table_ids), humans, bots,
+                          self.search_bots)
+            self.tables[table.id] = table
+            self.sit(client, table)
+        elif verb == "JOIN" and client.table is None:
+            table = self.tables.get(int(args[0])) if (
+                args and args[0].isdigit()) else None
+            if table is None or table.game is not None:
+                client.send("No such open game.\n")
+            else:
+                self.sit(client, table)
+        elif verb == "LIST":
+            open_tables = [t for t in self.tables.values() if t.game is None]
+            for t in open_tables:
+                client.send(f"  Game {t.id}: {len(t.clients)}/{t.humans} "
+                            f"humans, {t.bots} bots\n")
+            if not open_tables:
+                client.send("No open games. HOST one!\n")
+        elif verb == "QUIT":
+            client.send("Goodbye!\n")
+            client.closed = True
+        else:
+            client.send(HELP)
+
+    def sit(self, client, table):
+        table.clients.append(client)
+        client.table = table
+        waiting = table.humans - len(table.clients)
+        if waiting:
+            table.broadcast(f"{client.name} joined game {table.id}; waiting "
+                            f"for {waiting} more player(s).\n")
+        else:
+            table.start()
+            asyncio.create_task(self.play(table))
+
+    async def play(self, table):
+        table.broadcast(f"Game {table.id} begins: " + ", ".join(
+            p.name for p in table.game.players) + "\n")
+        game = table.game
+        recorder = None
+        if self.recording is not None:
+            recorder = GameRecorder(self.recording)
+            recorder.begin(game, game.players, mode="full")
+        # Outside the recorder's wrappers, so a replayed step records nothing
+        stream = game.rng = StepStream(game.rng)
+        renderer = game.renderer = StepRenderer(game.renderer)
+        try:
+            for step in main.full_game_steps(game):
+                start = game.snapshot()
+                stream.new_step()
+                renderer.new_step()
+                while True:
+                    try:
+                        step()
+                        break
+                    except AwaitingAnswer as waiting:
+                        game.restore(start)
+                        stream.replay()
+                        renderer.replay()
+                        await table.wait_for_answer(waiting.player,
+                                                    waiting.prompt)
+                # Let the other games and the lobby have a turn
+                await asyncio.sleep(0)
+            table.broadcast(f"\n🏁 Game {table.id} over!\n" +
+                            table.standings() + "Back in the lobby.\n")
+        except Exception as e:
+            table.broadcast(f"❌ Game {table.id} stopped: {e}\n")
+        finally:
+            if recorder is not None:
+                recorder.end(game)
+            for client in list(table.clients):
+                client.table = None
+            del self.tables[table.id]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Kingsburg game server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max-games", type=int, default=500)
+    parser.add_argument("--search-bots",
+                        action="store_true",
+                        help="bots plan with search_bot.SearchBot")
+    parser.add_argument("--record",
+                        default=None,
+                        help="record every game to this file")
+    args = parser.parse_args()
+    try:
+        asyncio.run(
+            GameServer(args.max_games, args.search_bots,
+                       args.record).serve(
+                args.host, args.port))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,196 @@
+# Structured simulation log: one JSON object per line (JSON Lines).
+#
+# SimLogWriter buffers records in memory and writes them in large chunks,
+# optionally through a stdlib compressor, and starts a new part file once the
+# current one reaches max_bytes on disk (a compressed part can run past it
+# by what the compressor holds back: up to a 900k block for bz2). Parts are
+# named <prefix>.<part>.jsonl[.gz|.bz2|.xz], so sorting the names gives
+# record order, and read_sim_log streams them back one record at a time.
+#
+# SimLogRenderer turns the engine's events into records, so a simulation logs
+# its rolls, advisor claims, builds and battles just by using it as the
+# renderer (see stress.py --log-format jsonl).
+
+import bz2
+import glob
+import gzip
+import json
+import lzma
+import os
+
+compressors = {
+    None: ("", open),
+    "gzip": (".gz", gzip.open),
+    "bz2": (".bz2", bz2.open),
+    "xz": (".xz", lzma.open),
+}
+
+
+class SimLogWriter:
+
+    def __init__(self,
+                 prefix,
+                 compression=None,
+                 max_bytes=None,
+                 buffer_size=1 << 20):
+        if compression not in compressors:
+            raise ValueError(f"Unknown log compression: {compression!r}")
+        self.prefix = prefix
+        self.compression = compression
+        self.max_bytes = max_bytes
+        self.buffer_size = buffer_size
+        self.part = 0
+        self.paths = []
+        self.buffer = []
+        self.buffered = 0
+        self.raw = None
+        self.file = None
+        self.encode = json.JSONEncoder(separators=(",", ":")).encode
+        self.open_part()
+
+    def open_part(self):
+        ext, _ = compressors[self.compression]
+        path = f"{self.prefix}.{self.part:05d}.jsonl{ext}"
+        self.paths.append(path)
+        # The raw file tells us the on-disk size for rotation
+        self.raw = open(path, "wb")
+        if self.compression is None:
+            self.file = self.raw
+        else:
+            _, opener = compressors[self.compression]
+            self.file = opener(self.raw, "wb")
+
+    def close_part(self):
+        if self.file is not self.raw:
+            self.file.close()
+        self.raw.close()
+
+    def write(self, record):
+        line = self.encode(record) + "\n"
+        self.buffer.append(line)
+        self.buffered += len(line)
+        if self.buffered >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.file.write("".join(self.buffer).encode())
+            self.buffer = []
+            self.buffered = 0
+        if self.max_bytes and self.raw.tell() >= self.max_bytes:
+            self.close_part()
+            self.part += 1
+            self.open_part()
+
+    def close(self):
+        self.flush()
+        self.close_part()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_log_part(path):
+    for ext, opener in compressors.values():
+        if ext and path.endswith(ext):
+            return opener(path, "rt")
+    return open(path)
+
+
+def read_sim_log(path):
+    # Stream records from a log directory, a writer prefix, or one part file
+    if os.path.isdir(path):
+        parts = sorted(glob.glob(os.path.join(path, "*.jsonl*")))
+    elif os.path.exists(path):
+        parts = [path]
+    else:
+        parts = sorted(glob.glob(glob.escape(path) + ".*.jsonl*"))
+    for part in parts:
+        with open_log_part(part) as f:
+            for line in f:
+                yield json.loads(line)
+
+
+def player_record(p):
+    return {
+        "name": p.name,
+        "wood": p.wood,
+        "stone": p.stone,
+        "gold": p.gold,
+        "armies": p.armies,
+        "vp": p.vp,
+        "plus2": p.plus2,
+        "buildings": p.buildings,
+    }
+
+
+class SimLogRenderer:
+    # Writes the events a simulation log needs; everything else is dropped.
+    # Set .game before each game so every record carries its game number.
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.game = None
+        self.combat = None
+
+    def emit(self, kind, **fields):
+        handler = getattr(self, "on_" + kind, None)
+        if handler is not None:
+            handler(**fields)
+
+    def ask(self, prompt):
+        raise RuntimeError(
+            f"Human input requested in headless mode: {prompt!r}")
+
+    def record(self, event, **fields):
+        self.writer.write({"game": self.game, "event": event, **fields})
+
+    def on_game_start(self, seed, players):
+        self.record("game_start",
+                    seed=seed,
+                    players=[player_record(p) for p in players])
+
+    def on_game_end(self, players):
+        self.record("game_end", players=[player_record(p) for p in players])
+
+    def on_season_start(self, season, **fields):
+        self.record("season", season=season)
+
+    def on_rolled(self, player, dice):
+        self.record("roll", player=player.name, dice=dice)
+
+    def on_influencer_chosen(self, player, value, influencer, plus2):
+        self.record("claim", player=player.name, advisor=value, plus2=plus2)
+
+    def on_built(self, player, building):
+        self.record("build", player=player.name, level=building["level"])
+
+    on_bot_built = on_built
+
+    def on_combat(self, player, king_die, building_defense, total_power):
+        self.combat = {
+            "king_die": king_die,
+            "defense": building_defense,
+            "power": total_power
+        }
+
+    def on_combat_won(self, player, enemy):
+        self.record("combat",
+                    player=player.name,
+                    enemy=enemy["name"],
+                    level=enemy["level"],
+                    strength=enemy["strength"],
+                    result="win",
+                    **self.combat)
+
+    def on_combat_lost(self, player, enemy):
+        self.record("combat",
+                    player=player.name,
+                    enemy=enemy["name"],
+                    level=enemy["level"],
+                    strength=enemy["strength"],
+                    result="loss",
+                    **self.combat)
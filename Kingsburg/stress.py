@@ -0,0 +1,345 @@
+# Parallel, sharded version of the stress test in main.py.
+#
+# N games are split into shards of consecutive game numbers and played on a
+# process pool. Every game gets its own seed derived from (base seed, game
+# number), so any single game can be replayed alone with --replay. Each shard
+# writes its own log and results file; they are merged in shard order, so the
+# merged output is the same no matter how many workers ran or which finished
+# first.
+#
+# With --log-format jsonl the log is a directory of structured JSON Lines
+# parts (see sim_log.py), written by the shards directly instead of merged.
+#
+#   python stress.py --games 1000000 --workers 32 --seed 7
+#   python stress.py --games 10000000 --log-format jsonl --compress gzip
+#   python stress.py --seed 7 --replay 123456
+#   python stress.py --games 1000000 --rng streams
+#   python stress.py --games 100000 --record games.kbr
+#   python stress.py --games 100000000 --stats stats.json
+#   python stress.py --games 100000000 --store results.kbs
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import main
+from game_stats import GameStats, StatsRenderer
+from profiling import Profiler
+from recording import GameRecorder, RecordingWriter, merge_recordings
+from renderers import NullRenderer
+from results_store import ResultsWriter, StoreRenderer, merge_stores
+from rng_streams import GameStreams
+from sim_log import SimLogRenderer, SimLogWriter
+
+DEFAULT_PLAYERS = [
+    {"name": "Bot 1", "type": "bot"},
+    {"name": "Bot 2", "type": "bot"},
+]
+
+
+def derive_game_seed(base_seed, game_number):
+    digest = hashlib.blake2b(f"{base_seed}:{game_number}".encode(),
+                             digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def make_players(player_templates):
+    players = []
+    for template in player_templates:
+        p = main.get_new_player_state()
+        for key, value in template.items():
+            setattr(p, key, value)
+        players.append(p)
+    return players
+
+
+def play_game(players, base_seed, game_number, log_file, game=None):
+    seed = derive_game_seed(base_seed, game_number)
+    final_state = main.simulate_real_mini_game(players, main.all_buildings,
+                                               main.influencers, log_file,
+                                               seed=seed,
+                                               game=game)
+    return {"game": game_number, "seed": seed, "players": final_state}
+
+
+def run_shard(player_templates,
+              base_seed,
+              start,
+              stop,
+              log_path,
+              results_path,
+              structured_log=None,
+              streams=False,
+              record_path=None,
+              collect_stats=False,
+              store_path=None):
+    # Runs in a worker process: games start..stop-1, headless.
+    # structured_log is None for the text log, else (compression, max_bytes)
+    # and log_path is the prefix for this shard's JSON Lines parts. With
+    # streams, games roll from per-purpose streams (see rng_streams.py).
+    # With record_path, every game is recorded there (see recording.py).
+    # With collect_stats, the shard's GameStats (see game_stats.py) is
+    # returned along with its profile. With store_path, every game's results
+    # are written to a results store there (see results_store.py).
+    players = make_players(player_templates)
+    if structured_log is None:
+        main.set_renderer(NullRenderer())
+        log_file = open(log_path, "w")
+        sim_log = None
+    else:
+        compression, max_bytes = structured_log
+        sim_log = SimLogRenderer(
+            SimLogWriter(log_path, compression, max_bytes))
+        main.set_renderer(sim_log)
+        log_file = None
+    game_stats = GameStats() if collect_stats else None
+    if game_stats is not None:
+        main.set_renderer(StatsRenderer(game_stats, main.renderer))
+    store = None
+    if store_path is not None:
+        store = StoreRenderer(ResultsWriter(store_path), main.renderer)
+        main.set_renderer(store)
+    game = main.GameSession(rng=GameStreams()) if streams else None
+    recorder = GameRecorder(
+        RecordingWriter(record_path)) if record_path else None
+
+    try:
+        with open(results_path, "w") as results_file:
+            for game_number in range(start, stop):
+                if sim_log is not None:
+                    sim_log.game = game_number
+                if store is not None:
+                    store.game = game_number
+                if recorder is not None:
+                    recorder.begin(game or main.default_game, players)
+                try:
+                    result = play_game(players, base_seed, game_number,
+                                       log_file, game)
+                except Exception as e:
+                    seed = derive_game_seed(base_seed, game_number)
+                    error = f"game {game_number} (seed {seed}): {e}"
+                    if sim_log is not None:
+                        sim_log.record("error", seed=seed, message=str(e))
+                    else:
+                        log_file.write(
+                            f"\n❌ Error during simulation at {error}\n")
+                    return (game_number - start, error, shard_profile(),
+                            game_stats)
+                finally:
+                    # A failed game is recorded up to the error
+                    if recorder is not None:
+                        recorder.end(game or main.default_game)
+                results_file.write(json.dumps(result) + "\n")
+    finally:
+        if recorder is not None:
+            recorder.writer.close()
+        if store is not None:
+            store.writer.close()
+        if sim_log is not None:
+            sim_log.writer.close()
+        else:
+            log_file.close()
+    return stop - start, None, shard_profile(), game_stats
+
+
+def shard_profile():
+    # This shard's profiling stats; a worker runs several shards, so the
+    # counts start over for the next one
+    if main.profiler is None:
+        return None
+    stats = main.profiler.to_dict()
+    main.profiler.reset()
+    return stats
+
+
+def make_shards(num_games, workers, shard_size=None):
+    # Several shards per worker keeps every core busy until the end
+    if shard_size is None:
+        shard_size = max(1, -(-num_games // (workers * 8)))
+    return [(start, min(start + shard_size, num_games + 1))
+            for start in range(1, num_games + 1, shard_size)]
+
+
+def run_parallel_stress_test(num_games=100,
+                             player_templates=DEFAULT_PLAYERS,
+                             workers=None,
+                             base_seed=0,
+                             log_path="stress_test_log.txt",
+                             results_path="stress_test_results.jsonl",
+                             shard_size=None,
+                             log_format="text",
+                             compression=None,
+                             rotate_bytes=None,
+                             streams=False,
+                             record_path=None,
+                             stats_path=None,
+                             store_path=None):
+    workers = workers or os.cpu_count() or 1
+    shards = make_shards(num_games, workers, shard_size)
+
+    structured_log = None
+    if log_format == "jsonl":
+        # log_path is a directory; each shard writes its own parts into it
+        structured_log = (compression, rotate_bytes)
+        os.makedirs(log_path, exist_ok=True)
+        for old_part in glob.glob(os.path.join(log_path, "shard*.jsonl*")):
+            os.remove(old_part)
+
+    print(f"\n🧪 Running {num_games} stress-test games on {workers} "
+          f"worker(s) in {len(shards)} shard(s), base seed {base_seed}...")
+
+    errors = []
+    games_played = 0
+    profile = None
+    game_stats = None
+    with tempfile.TemporaryDirectory(prefix="kingsburg-stress-") as tmp:
+        log_dir = tmp if structured_log is None else log_path
+        parts = [(os.path.join(log_dir, f"shard{i:06d}"),
+                  os.path.join(tmp, f"shard{i:06d}.results.jsonl"))
+                 for i in range(len(shards))]
+        records = [
+            os.path.join(tmp, f"shard{i:06d}.kbr") if record_path else None
+            for i in range(len(shards))
+        ]
+        stores = [
+            os.path.join(tmp, f"shard{i:06d}.kbs") if store_path else None
+            for i in range(len(shards))
+        ]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(run_shard, player_templates, base_seed, start,
+                            stop, log_part, results_part, structured_log,
+                            streams, record_part, stats_path is not None,
+                            store_part)
+                for (start, stop), (log_part, results_part), record_part,
+                store_part in zip(shards, parts, records, stores)
+            ]
+            for i, future in enumerate(futures, 1):
+                played, error, stats, shard_stats = future.result()
+                games_played += played
+                if stats is not None:
+                    profile = profile or Profiler()
+                    profile.merge(stats)
+                if shard_stats is not None:
+                    game_stats = game_stats or GameStats()
+                    game_stats.merge(shard_stats)
+                if error:
+                    errors.append(error)
+                    print(f"❌ Error during simulation at {error}")
+                if i % max(1, len(futures) // 10) == 0:
+                    print(f"  - {games_played} games simulated...")
+
+        # Merge the shard files in game order
+        with open(results_path, "w") as results_file:
+            for log_part, results_part in parts:
+                with open(results_part) as f:
+                    shutil.copyfileobj(f, results_file)
+        if structured_log is None:
+            with open(log_path, "w") as log_file:
+                for log_part, results_part in parts:
+                    with open(log_part) as f:
+                        shutil.copyfileobj(f, log_file)
+        if record_path:
+            merge_recordings(records, record_path)
+        if store_path:
+            merge_stores(stores, store_path)
+
+    if errors:
+        print(f"\n❌ Stress test finished with {len(errors)} failed shard(s).")
+    else:
+        print(
+            f"\n✅ Stress test completed: {games_played} games.\n📄 Log saved to {log_path}\n📊 Results saved to {results_path}\n"
+        )
+    if profile is not None:
+        print(f"⏱️ Profile saved to {profile.dump()}")
+    if game_stats is not None:
+        print(f"📈 Statistics for {game_stats.games} games saved to "
+              f"{game_stats.dump(stats_path)}")
+    if store_path:
+        print(f"🗄️ Results store saved to {store_path}")
+    return games_played, errors
+
+
+def replay_game(game_number,
+                base_seed=0,
+                player_templates=DEFAULT_PLAYERS,
+                log_file=sys.stdout,
+                streams=False):
+    main.set_renderer(NullRenderer())
+    game = main.GameSession(rng=GameStreams()) if streams else None
+    return play_game(make_players(player_templates), base_seed, game_number,
+                     log_file, game)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Parallel Kingsburg stress test")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--shard-size", type=int, default=None)
+    parser.add_argument("--log",
+                        default=None,
+                        help="text log file, or directory for jsonl logs")
+    parser.add_argument("--log-format", choices=["text", "jsonl"],
+                        default="text")
+    parser.add_argument("--compress", choices=["gzip", "bz2", "xz"],
+                        default=None)
+    parser.add_argument("--rotate-mb",
+                        type=float,
+                        default=None,
+                        help="start a new jsonl part after this many MB")
+    parser.add_argument("--results", default="stress_test_results.jsonl")
+    parser.add_argument("--record",
+                        default=None,
+                        help="record every game to this file "
+                        "(see recording.py)")
+    parser.add_argument("--stats",
+                        default=None,
+                        help="write aggregate statistics (see game_stats.py) "
+                        "to this JSON file")
+    parser.add_argument("--store",
+                        default=None,
+                        help="write every game's results to this columnar "
+                        "store (see results_store.py)")
+    parser.add_argument("--rng",
+                        choices=["shared", "streams"],
+                        default="shared",
+                        help="streams: per-purpose dice/enemy/play streams")
+    parser.add_argument("--replay",
+                        type=int,
+                        default=None,
+                        help="replay one game number and print its log")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.replay is not None:
+        result = replay_game(args.replay,
+                             args.seed,
+                             streams=args.rng == "streams")
+        print(json.dumps(result))
+    else:
+        default_log = ("stress_test_log.txt"
+                       if args.log_format == "text" else "stress_test_log")
+        run_parallel_stress_test(
+            args.games,
+            workers=args.workers,
+            base_seed=args.seed,
+            log_path=args.log or default_log,
+            results_path=args.results,
+            shard_size=args.shard_size,
+            log_format=args.log_format,
+            compression=args.compress,
+            rotate_bytes=int(args.rotate_mb * 2**20) if args.rotate_mb else None,
+            streams=args.rng == "streams",
+            record_path=args.record,
+            stats_path=args.stats,
+            store_path=args.store)
@@ -0,0 +1,333 @@
+# Ruleset-variant sweeps: the same games under changed rules, side by side.
+#
+# A variant is a set of overrides to the rules data, each "what/which/field":
+#
+#   building/Statue/cost.wood=3        building by name or level ("2.3")
+#   enemy/Goblins/strength=4           every Goblins card; Goblins@2: level 2
+#   advisor/10/actions.0.amount=3      advisor by value
+#
+# (field is a dotted path into the JSON entry; numbers index lists; the
+# value is JSON, or a plain string). Variants come from a grid (--grid: every
+# combination of the listed values) or a JSON file (--variants: a list of
+# {"name": ..., "overrides": {override: value}}), and the unchanged rules
+# always run too, as "base".
+#
+# Every variant plays the same games: game n has the same seed under every
+# variant (stress.derive_game_seed) and rolls from per-purpose streams
+# (rng_streams.GameStreams), so the dice and enemy draws are the same
+# wherever the rules don't change the game's path. The difference from base
+# is then measured game by game, and small rule changes show above the noise
+# with far fewer games than comparing two independent runs.
+#
+# Games are played in blocks of BLOCK_GAMES. Each block's results are cached
+# under a hash of the effective rules data, the policies, the seeds and the
+# engine's sources, so re-running a sweep after changing or adding a variant
+# only plays the new variants' blocks, and asking for more games only plays
+# the new blocks. Blocks run on a process pool, a fresh process each, since
+# the engine loads its rules when it is imported.
+#
+#   python sweep.py --games 20000 --grid "building/Statue/cost.wood=1,3"
+#   python sweep.py --games 20000 --variants variants.json --policy solver
+
+import argparse
+import hashlib
+import itertools
+import json
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import ruleset
+
+BLOCK_GAMES = 500
+CACHE_DIR = os.path.join(ruleset.PACKAGE_DIR, "sweep_cache")
+
+# The code a block's results depend on besides the rules data
+ENGINE_SOURCES = ("main.py", "ruleset.py", "rng_streams.py", "search_bot.py",
+                  "winter_odds.py", "influence_solver.py", "stress.py")
+
+DOCUMENTS = {
+    "building": ("player_building_sheet.json", "buildings"),
+    "enemy": ("bad_guy_cards.json", None),
+    "advisor": ("board.json", "characters"),
+}
+
+
+def load_documents():
+    # The rules data as parsed JSON, in ruleset.SOURCES order
+    documents = []
+    for path in ruleset.source_paths():
+        with open(path) as f:
+            documents.append(json.load(f))
+    return documents
+
+
+def select_entries(documents, what, which):
+    # The JSON entries an override applies to
+    if what not in DOCUMENTS:
+        raise ValueError(f"unknown rules entry {what!r} (expected one of "
+                         f"{', '.join(DOCUMENTS)})")
+    source, key = DOCUMENTS[what]
+    document = documents[ruleset.SOURCES.index(source)]
+    entries = document if key is None else document[key]
+    if what == "building":
+        found = [b for b in entries if which in (b["name"], b["level"])]
+    elif what == "enemy":
+        name, _, level = which.partition("@")
+        found = [
+            card for card in entries if card["name"] == name and (
+                not level or card["level"] == int(level))
+        ]
+    else:
+        found = [char for char in entries if str(char["value"]) == which]
+    if not found:
+        raise ValueError(f"no {what} {which!r}")
+    return found
+
+
+def apply_override(documents, override, value):
+    # override: "what/which/field.path"
+    try:
+        what, which, field = override.split("/")
+    except ValueError:
+        raise ValueError(f"can't parse override {override!r} "
+                         "(expected what/which/field)") from None
+    steps = [int(step) if step.isdigit() else step
+             for step in field.split(".")]
+    for entry in select_entries(documents, what, which):
+        # Only fields the entry has: a misspelt one would change nothing
+        target = entry
+        for depth, step in enumerate(steps):
+            if depth:
+                target = target[steps[depth - 1]]
+            found = (0 <= step < len(target)) if isinstance(
+                target, list) else (isinstance(target, dict) and
+                                    step in target)
+            if not found:
+                raise ValueError(f"{what} {which!r} has no field {field!r}")
+        target[steps[-1]] = value
+
+
+def parse_value(text):
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def grid_variants(grids):
+    # ["building/Statue/cost.wood=1,3", ...] -> every combination
+    axes = []
+    for grid in grids:
+        override, _, values = grid.partition("=")
+        axes.append([(override, parse_value(value))
+                     for value in values.split(",")])
+    return [{
+        "name": ", ".join(f"{override}={json.dumps(value)}"
+                          for override, value in combo),
+        "overrides": dict(combo)
+    } for combo in itertools.product(*axes)] if axes else []
+
+
+def effective_contents(overrides):
+    # The rules data with a variant's overrides, as the bytes ruleset.py
+    # compiles
+    documents = load_documents()
+    for override, value in overrides.items():
+        apply_override(documents, override, value)
+    return [
+        json.dumps(document, sort_keys=True).encode()
+        for document in documents
+    ]
+
+
+def engine_hash():
+    digest = hashlib.sha256()
+    for name in ENGINE_SOURCES:
+        with open(os.path.join(ruleset.PACKAGE_DIR, name), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def block_key(rules_hash, engine, policies, base_seed, start, stop):
+    return hashlib.sha256(
+        json.dumps([rules_hash, engine, policies, base_seed, start,
+                    stop]).encode()).hexdigest()
+
+
+def run_blocks(contents, policies, base_seed, blocks):
+    # Runs in a fresh worker process: installs the variant's rules before
+    # the engine is imported, then plays each block (start, stop) of games.
+    # Returns each block's games' VP per seat.
+    ruleset.loaded = ruleset.compile_ruleset(contents)
+
+    import main
+    import stress
+    from renderers import NullRenderer
+    from rng_streams import GameStreams
+
+    main.set_renderer(NullRenderer())
+    players = stress.make_players([{
+        "name": f"Bot {seat}",
+        "type": "bot"
+    } for seat in range(1, len(policies) + 1)])
+    for p, policy in zip(players, policies):
+        p.policy = make_policy(policy)
+    game = main.GameSession(rng=GameStreams())
+    return [[[p["vp"] for p in stress.play_game(players, base_seed, number,
+                                                None, game)["players"]]
+             for number in range(start, stop)] for start, stop in blocks]
+
+
+def make_policy(name):
+    if name == "random":
+        return None
+    if name == "search":
+        from search_bot import SearchBot
+        return SearchBot(time_budget=None, node_budget=2000)
+    if name == "solver":
+        from influence_solver import SolverBot
+        return SolverBot()
+    raise ValueError(f"unknown policy {name!r}")
+
+
+def paired_difference(games, base, seat):
+    # Mean and standard error of (variant - base) VP of a seat, game by game
+    diffs = [vp[seat] - base_vp[seat] for vp, base_vp in zip(games, base)]
+    n = len(diffs)
+    mean = sum(diffs) / n
+    variance = sum((d - mean)**2 for d in diffs) / (n - 1) if n > 1 else 0.0
+    return mean, math.sqrt(variance / n)
+
+
+def run_sweep(variants, games=5000, policies=("random", "random"),
+              base_seed=0, workers=None, cache_dir=CACHE_DIR):
+    # Returns {variant name: summary}; the base rules are always included
+    variants = [{"name": "base", "overrides": {}}] + list(variants)
+    policies = list(policies)
+    blocks = [(start, min(start + BLOCK_GAMES, games + 1))
+              for start in range(1, games + 1, BLOCK_GAMES)]
+    engine = engine_hash()
+    os.makedirs(cache_dir, exist_ok=True)
+
+    cells = []  # (variant, contents, [block key])
+    for variant in variants:
+        contents = effective_contents(variant["overrides"])
+        rules_hash = ruleset.content_hash(contents)
+        cells.append((variant, contents, [
+            block_key(rules_hash, engine, policies, base_seed, start, stop)
+            for start, stop in blocks
+        ]))
+
+    results = {}  # block key -> per-game VP
+    todo = {}  # block key -> (contents, block), for blocks not cached
+    for variant, contents, keys in cells:
+        for block, key in zip(blocks, keys):
+            if key in results or key in todo:
+                continue  # two variants with the same effective rules
+            path = os.path.join(cache_dir, key + ".json")
+            if os.path.exists(path):
+                with open(path) as f:
+                    results[key] = json.load(f)
+            else:
+                todo[key] = (contents, block)
+
+    print(f"\n🧪 Sweeping {len(variants)} variant(s) x {games} games: "
+          f"{len(todo)} of {len(variants) * len(blocks)} block(s) to play, "
+          f"the rest cached")
+    if todo:
+        # A fresh process per task, since the engine reads its rules on
+        # import; a task plays several blocks of one variant, enough tasks
+        # to keep every worker busy
+        workers = workers or os.cpu_count() or 1
+        per_task = max(1, len(todo) // (workers * 2))
+        tasks = []
+        for contents, group in itertools.groupby(
+                todo.items(), key=lambda item: item[1][0]):
+            group = list(group)
+            for i in range(0, len(group), per_task):
+                tasks.append((contents, group[i:i + per_task]))
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers,
+                                 mp_context=context,
+                                 max_tasks_per_child=1) as pool:
+            futures = [(pool.submit(run_blocks, contents, policies,
+                                    base_seed,
+                                    [block for _, (_, block) in task]),
+                        task) for contents, task in tasks]
+            played = 0
+            for future, task in futures:
+                for (key, _), block_games in zip(task, future.result()):
+                    results[key] = block_games
+                    with open(os.path.join(cache_dir, key + ".json"),
+                              "w") as f:
+                        json.dump(block_games, f)
+                played += len(task)
+                print(f"  - {played} block(s) played...")
+
+    summaries = {}
+    base_games = None
+    for variant, contents, keys in cells:
+        per_game = [vp for key in keys for vp in results[key]]
+        if base_games is None:
+            base_games = per_game
+        seats = len(policies)
+        summary = {
+            "overrides": variant["overrides"],
+            "games": len(per_game),
+            "mean_vp": [
+                sum(vp[seat] for vp in per_game) / len(per_game)
+                for seat in range(seats)
+            ],
+        }
+        if variant["name"] != "base":
+            paired = [paired_difference(per_game, base_games, seat)
+                      for seat in range(seats)]
+            summary["vp_vs_base"] = [diff for diff, error in paired]
+            summary["vp_vs_base_error"] = [error for diff, error in paired]
+        summaries[variant["name"]] = summary
+    return summaries
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ruleset-variant sweep")
+    parser.add_argument("--grid",
+                        action="append",
+                        default=[],
+                        help='e.g. "building/Statue/cost.wood=1,2,3" '
+                        "(repeat for more axes)")
+    parser.add_argument("--variants",
+                        default=None,
+                        help="JSON file: a list of {name, overrides}")
+    parser.add_argument("--games", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--policy",
+                        action="append",
+                        choices=("random", "search", "solver"),
+                        default=None,
+                        help="one per seat, in order (default: two random "
+                        "bots)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--cache", default=CACHE_DIR)
+    parser.add_argument("--output", default=None, help="write a JSON summary")
+    args = parser.parse_args()
+
+    variants = grid_variants(args.grid)
+    if args.variants:
+        with open(args.variants) as f:
+            variants += json.load(f)
+    summaries = run_sweep(variants, args.games, args.policy or
+                          ["random", "random"], args.seed, args.workers,
+                          args.cache)
+    for name, summary in summaries.items():
+        line = " / ".join(f"{vp:.3f}" for vp in summary["mean_vp"])
+        if "vp_vs_base" in summary:
+            line += "   vs base: " + " / ".join(
+                f"{diff:+.3f} ± {error:.3f}" for diff, error in zip(
+                    summary["vp_vs_base"], summary["vp_vs_base_error"]))
+        print(f"📊 {name}: mean VP {line}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summaries, f, indent=2)
+        print(f"📄 Summary saved to {args.output}")
@@ -0,0 +1,14 @@
+# Checks that the numpy batch simulator plays the same game as the engine.
+
+import pytest
+
+batch_sim = pytest.importorskip("batch_sim")
+
+
+def test_batch_agrees_with_scalar():
+    # Every compared per-player mean within 4 standard errors (seeded, so
+    # the same every run)
+    agree, report = batch_sim.compare_with_scalar(20000, 2000, seed=1)
+    assert agree, {
+        name: round(z, 2) for name, (_, _, z) in report.items()
+    }
@@ -0,0 +1,55 @@
+# Checks that merged statistics are the statistics of all the games.
+
+import pytest
+
+import main
+from game_stats import GameStats, RunningStats, StatsRenderer
+from renderers import NullRenderer
+from rng_streams import GameStreams
+
+
+def collect(seeds):
+    stats = GameStats()
+    players = [main.PlayerState(name="Bot 1", type="bot"),
+               main.PlayerState(name="Bot 2", type="bot")]
+    game = main.GameSession(renderer=StatsRenderer(stats, NullRenderer()),
+                            rng=GameStreams())
+    for seed in seeds:
+        main.simulate_real_mini_game(players, main.all_buildings,
+                                     main.influencers, None, seed=seed,
+                                     game=game)
+    return stats
+
+
+def flatten(d, prefix=""):
+    # {"a": {"b": 1}} -> {"a/b": 1}
+    flat = {}
+    for key, value in d.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}/"))
+        else:
+            flat[prefix + key] = value
+    return flat
+
+
+def test_running_stats_merge():
+    values = [3, 1, 4, 1, 5, 9, 2, 6, 5, 3, 5]
+    whole, left, right = RunningStats(), RunningStats(), RunningStats()
+    for i, x in enumerate(values):
+        whole.add(x)
+        (left if i < 4 else right).add(x)
+    left.merge(right)
+    assert left.to_dict() == pytest.approx(whole.to_dict())
+
+
+def test_merge_equals_one_pass():
+    whole = collect(range(60))
+    merged = collect(range(25))
+    merged.merge(collect(range(25, 40)))
+    # Stats sent between processes go through to_dict/from_dict
+    merged.merge(GameStats.from_dict(collect(range(40, 60)).to_dict()))
+    expected = flatten(whole.to_dict())
+    got = flatten(merged.to_dict())
+    assert got.keys() == expected.keys()
+    for key, value in expected.items():
+        assert got[key] == pytest.approx(value), key
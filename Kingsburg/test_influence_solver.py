@@ -0,0 +1,112 @@
+# Checks that the influence solver's plans are ones the rules accept.
+
+import itertools
+import random
+
+import main
+from influence_solver import Solver, SolverBot, blocked_advisors
+from renderers import RecordingRenderer
+
+ADVISORS = sorted(main.influencers)
+
+
+def random_turns(rng, count):
+    # (dice key, blocked mask, tokens) for count random turns
+    for _ in range(count):
+        dice = tuple(sorted(rng.randint(1, 6)
+                            for _ in range(rng.choice((3, 4)))))
+        blocked = 0
+        for val in rng.sample(ADVISORS, rng.randint(0, 8)):
+            blocked |= 1 << val
+        yield dice, blocked, rng.randint(0, 2)
+
+
+def test_plans_are_legal():
+    solver = Solver()
+    for dice_key, blocked, tokens in random_turns(random.Random(2), 2000):
+        worth, plan = solver.solve(dice_key, 0, blocked, tokens)
+        used_mask, spent, total = 0, 0, 0.0
+        for val, base, dice, token, added in plan:
+            # What choose_influencer takes for that claim
+            assert main.get_reachable_advisors(dice_key,
+                                               used_mask).get(base) == dice
+            assert not dice & used_mask
+            assert added == 0 and val == base + 2 * token
+            assert val in main.influencers
+            assert not blocked >> val & 1
+            used_mask |= dice
+            spent += token
+            total += solver.value(val) - token * solver.token_cost
+        assert spent <= tokens
+        assert abs(worth - total) < 1e-9
+
+
+def test_blocked_mask_outside_reach_shares_a_plan():
+    solver = Solver()
+    dice_key = (1, 1, 2)  # sums to at most 4, so 7 and up are out of reach
+    first = solver.solve(dice_key, 0, 1 << 3, 1)
+    plans = len(solver.plans)
+    hits = solver.hits
+    for far in itertools.combinations(range(7, 19), 3):
+        blocked = 1 << 3
+        for val in far:
+            blocked |= 1 << val
+        assert solver.solve(dice_key, 0, blocked, 1) == first
+    assert len(solver.plans) == plans
+    assert solver.hits > hits
+    # A blocked advisor within reach is a different state
+    _, plan = solver.solve(dice_key, 0, 1 << 3 | 1 << 1, 1)
+    assert len(solver.plans) > plans
+    assert 1 not in [claim[0] for claim in plan]
+    assert 1 in [claim[0] for claim in first[1]]
+
+
+def play_turn(dice_key, owners, kings_envoy=False, plus2=1):
+    # Claims a SolverBot makes in choose_influencer, and the game
+    p = main.PlayerState(name="Bot 1", type="bot")
+    p.policy = SolverBot()
+    p.plus2 = plus2
+    p.kings_envoy = kings_envoy
+    game = main.GameSession([p], renderer=RecordingRenderer())
+    game.current_player = p
+    game.influencer_owners = dict(owners)
+    used_mask = 0
+    while used_mask is not None and used_mask != (1 << len(dice_key)) - 1:
+        used_mask = main.choose_influencer(game, dice_key, used_mask)
+    return game
+
+
+def invalid_inputs(game):
+    return [fields for kind, fields in game.renderer.events
+            if kind == "invalid_input"]
+
+
+def test_engine_accepts_every_claim():
+    rng = random.Random(3)
+    for dice_key, blocked, tokens in random_turns(rng, 300):
+        owners = {val: "Bot 2" for val in ADVISORS if blocked >> val & 1}
+        game = play_turn(dice_key, owners, plus2=tokens)
+        assert invalid_inputs(game) == []
+        claimed = {val for val, owner in game.influencer_owners.items()
+                   if owner == "Bot 1"}
+        assert not claimed & set(owners)
+
+
+def test_kings_envoy_unblocks():
+    game = main.GameSession([], renderer=RecordingRenderer())
+    p = main.PlayerState(name="Bot 1", type="bot")
+    game.influencer_owners = {5: "Bot 2", 6: "Bot 1", 9: "Bot 3"}
+    assert blocked_advisors(game, p) == 1 << 5 | 1 << 9
+    p.kings_envoy = True
+    assert blocked_advisors(game, p) == 0
+
+    # Every advisor the dice reach is taken: only the envoy gets one
+    dice_key = (1, 2, 3)
+    owners = {val: "Bot 2" for val in ADVISORS}
+    blocked = play_turn(dice_key, owners)
+    assert blocked.influencer_owners == owners
+    unblocked = play_turn(dice_key, owners, kings_envoy=True)
+    assert invalid_inputs(unblocked) == []
+    assert "Bot 1" in unblocked.influencer_owners.values()
+    assert any(kind == "kings_envoy_used"
+               for kind, _ in unblocked.renderer.events)
@@ -1 +1,32 @@
-# This file is reserved for future tests.
+# Benchmarks for the engine hot paths (see bench_kingsburg.py).
+# Timings depend on the machine as much as on the code, so these only run
+# when asked for (KINGSBURG_BENCH=1 pytest test_kingsburg.py). Each test then
+# fails when its benchmark runs slower than the stored baseline allows; all
+# results are written to bench_results.json.
+
+import os
+
+import pytest
+
+import bench_kingsburg as bench
+
+pytestmark = pytest.mark.skipif(
+    os.environ.get("KINGSBURG_BENCH") != "1",
+    reason="benchmarks run with KINGSBURG_BENCH=1")
+
+results = {}
+
+
+@pytest.fixture(scope="module", autouse=True)
+def write_results():
+    yield
+    if results:
+        bench.write_results(results)
+
+
+@pytest.mark.parametrize("name", list(bench.BENCHMARKS))
+def test_benchmark(name):
+    result = bench.run_benchmark(name)
+    results[name] = result
+    problem = bench.check_regression(name, result)
+    assert problem is None, problem
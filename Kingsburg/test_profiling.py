@@ -0,0 +1,82 @@
+# Checks that profiling counts what a game does, and that turning it off
+# leaves the engine as it was.
+
+import json
+from collections import Counter
+
+import main
+from renderers import NullRenderer
+from rng_streams import GameStreams
+
+PROFILED = list(main.profiled_phases) + list(main.profiled_branching)
+
+
+def test_turning_profiling_off_restores_the_engine():
+    originals = {name: getattr(main, name) for name in PROFILED}
+    profiler = main.set_profiling(True)
+    try:
+        assert all(getattr(main, name) is not originals[name]
+                   for name in PROFILED)
+        assert main.set_profiling(True) is profiler  # already on
+    finally:
+        assert main.set_profiling(False) is profiler
+    assert {name: getattr(main, name) for name in PROFILED} == originals
+    assert main.profiler is None and main.unprofiled == {}
+    assert main.set_profiling(False) is None  # already off
+
+
+def test_profile_of_a_seeded_game(tmp_path, monkeypatch):
+    # Counts what the profiler should see with plain wrappers put in first
+    calls = Counter()
+    sizes = {"reachable_advisors": Counter(), "buildable_buildings": Counter()}
+
+    def counting(name, func):
+        def wrapper(*args, **kwargs):
+            calls[name] += 1
+            return func(*args, **kwargs)
+        return wrapper
+
+    def measuring(name, func):
+        def wrapper(*args, **kwargs):
+            result = func(*args, **kwargs)
+            sizes[name][len(result)] += 1
+            return result
+        return wrapper
+
+    monkeypatch.setattr(main, "choose_influencer",
+                        counting("influence", main.choose_influencer))
+    for name, histogram in main.profiled_branching.items():
+        monkeypatch.setattr(main, name, measuring(histogram,
+                                                  getattr(main, name)))
+    monkeypatch.setenv("KINGSBURG_PROFILE_OUTPUT",
+                       str(tmp_path / "profile.json"))
+
+    players = [main.PlayerState(name=f"Bot {i}", type="bot") for i in (1, 2)]
+    game = main.GameSession(players, renderer=NullRenderer(),
+                            rng=GameStreams(seed=4))
+    main.set_profiling(True)
+    try:
+        main.play_full_game(game)
+        main.dump_profile()
+    finally:
+        main.set_profiling(False)
+
+    stats = json.loads((tmp_path / "profile.json").read_text())
+    # Five years of two players: three seasons each, then a battle each
+    assert {phase: entry["calls"]
+            for phase, entry in stats["phases"].items()} == {
+        "kings_envoy": 15,
+        "seasonal_bonuses": 30,
+        "dice_roll": 30,
+        "influence": calls["influence"],
+        "build_phase": 30,
+        "winter": 10,
+        "bonus_die": 5,
+    }
+    assert calls["influence"] >= 30
+    for name, histogram in sizes.items():
+        assert stats["branching"][name]["counts"] == {
+            str(size): histogram[size] for size in sorted(histogram)}
+        assert stats["branching"][name]["mean"] == (
+            sum(size * n for size, n in histogram.items())
+            / sum(histogram.values()))
@@ -0,0 +1,94 @@
+# Checks that results store queries give the same answers with and without
+# numpy, and the answers a plain scan of the rows gives.
+
+import random
+
+import pytest
+
+import main
+import results_store
+from results_store import ResultsStore, ResultsWriter
+
+
+class Planner:
+    # Stands in for a bot policy; the store keeps its class name
+    pass
+
+
+def write_store(path):
+    # 40 two-player games of random results; returns every row written
+    rng = random.Random(1)
+    levels = [b["level"] for b in main.all_buildings]
+    players = [main.PlayerState(name="Bot 1", type="bot"),
+               main.PlayerState(name="Bot 2", type="bot")]
+    players[1].policy = Planner()
+    writer = ResultsWriter(str(path), buffer_rows=16)
+    rows = []
+    for game in range(40):
+        seed = rng.getrandbits(64)  # above 2**63 about half the time
+        for p in players:
+            p.vp = rng.randint(0, 20)
+            p.wood = rng.randint(0, 6)
+            p.reset_buildings()
+            for level in rng.sample(levels, 3):
+                p.add_building(level)
+        writer.add_game(game, seed, players)
+        for seat, p in enumerate(players):
+            rows.append({
+                "seed": seed,
+                "seat": seat,
+                "policy": "random" if p.policy is None else "Planner",
+                "vp": p.vp,
+                "wood": p.wood,
+                "levels": set(p.buildings),
+            })
+    writer.close()
+    return rows
+
+
+def expected_stats(values):
+    if not values:
+        return {"count": 0, "sum": 0, "mean": None, "min": None, "max": None}
+    return {
+        "count": len(values),
+        "sum": sum(values),
+        "mean": sum(values) / len(values),
+        "min": min(values),
+        "max": max(values),
+    }
+
+
+@pytest.mark.parametrize("use_numpy", [True, False])
+def test_queries(tmp_path, monkeypatch, use_numpy):
+    if use_numpy and results_store.np is None:
+        pytest.skip("numpy is not installed")
+    if not use_numpy:
+        monkeypatch.setattr(results_store, "np", None)
+    # Several chunks, the last one partial
+    monkeypatch.setattr(results_store, "CHUNK_ROWS", 7)
+    rows = write_store(tmp_path / "results.kbs")
+    store = ResultsStore(str(tmp_path / "results.kbs"))
+    assert len(store) == len(rows)
+
+    query = store.query().where("vp", ">=", 10)
+    assert query.count() == sum(1 for r in rows if r["vp"] >= 10)
+    assert query.stats("wood") == expected_stats(
+        [r["wood"] for r in rows if r["vp"] >= 10])
+    assert store.query().stats("seed") == expected_stats(
+        [r["seed"] for r in rows])
+
+    level = main.all_buildings[0]["level"]
+    by_policy = store.query().where("built", "has", [level]).where(
+        "seat", "in", {0, 1}).group_by("policy").stats("vp")
+    for policy in ("random", "Planner"):
+        vps = [r["vp"] for r in rows
+               if r["policy"] == policy and level in r["levels"]]
+        if vps:
+            assert by_policy[policy] == expected_stats(vps)
+        else:
+            assert policy not in by_policy
+
+    assert store.query().where("policy", "==", "Planner").group_by(
+        "seat").count() == {1: len(rows) // 2}
+    assert store.query().where("vp", ">", 99).stats("vp") == expected_stats(
+        [])
@@ -0,0 +1,65 @@
+# Checks that GameStreams' purposes are seeded, independent and unbroken
+# across refills.
+
+import random
+
+import rng_streams
+from rng_streams import GameStreams
+
+
+def draws(streams, seed, picks):
+    # Dice, King's dice and enemies of a seeded run, with picks play draws
+    # between them
+    streams.seed(seed)
+    dice, kings, enemies = [], [], []
+    for i in range(300):
+        for _ in range(picks(i)):
+            streams.choice("abcdefg")
+            streams.randint(1, 1000)
+        dice.append(streams.roll(3 + i % 2))
+        if i % 10 == 0:
+            kings.append(streams.king_die())
+            enemies.append(streams.draw_enemy(range(5)))
+    return dice, kings, enemies
+
+
+def test_same_seed_same_draws():
+    first = draws(GameStreams(), 7, lambda i: i % 3)
+    assert draws(GameStreams(), 7, lambda i: i % 3) == first
+    assert draws(GameStreams(), 8, lambda i: i % 3) != first
+
+
+def test_purposes_are_independent():
+    # Bots picking differently don't change the dice, King's dice or enemies
+    streams = GameStreams()
+    none = draws(streams, 7, lambda i: 0)
+    assert draws(streams, 7, lambda i: i % 5) == none
+    assert draws(streams, 7, lambda i: 40) == none
+
+
+def expected_faces(seed, count):
+    # The first count dice of a seed, straight from the definition: the
+    # first block, then refill blocks of REFILL_SIZE bytes
+    data = random.Random(seed).randbytes(sum(
+        rng_streams.BLOCK_SIZES.values()))
+    raw = data[:rng_streams.BLOCK_SIZES["dice"]]
+    block = 0
+    while True:
+        faces = [b % 6 + 1 for b in raw if b < 252]
+        if len(faces) >= count:
+            return faces[:count]
+        block += 1
+        raw += random.Random(f"{seed}:dice:{block}").randbytes(
+            rng_streams.REFILL_SIZE)
+
+
+def test_refills_continue_the_stream():
+    streams = GameStreams(11)
+    chunked = []
+    sizes = [1, 4, 3, 7, 2]
+    while len(chunked) < 2000:  # several blocks
+        chunked += streams.roll(sizes[len(chunked) % len(sizes)])
+    assert streams.dice.blocks > 1
+    assert chunked == expected_faces(11, len(chunked))
+    streams.seed(11)
+    assert streams.roll(len(chunked)) == chunked
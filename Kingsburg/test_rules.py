@@ -0,0 +1,139 @@
+# Checks of the rules that the precomputed tables and parsed data stand in
+# for, against the straightforward versions they replaced.
+
+import itertools
+import json
+
+import pytest
+
+import main
+import ruleset
+from renderers import RecordingRenderer
+
+
+def possible_sums(dice):
+    # The old main.get_possible_sums: dice sum -> every combination of dice
+    # positions with that sum, smaller combinations first
+    sums = {}
+    for size in range(1, len(dice) + 1):
+        for combo in itertools.combinations(range(len(dice)), size):
+            sums.setdefault(sum(dice[i] for i in combo), []).append(combo)
+    return sums
+
+
+def test_dice_outcomes_match_possible_sums():
+    for num_dice in (3, 4):
+        for dice in itertools.combinations_with_replacement(range(1, 7),
+                                                            num_dice):
+            sums = possible_sums(dice)
+            for used_mask in range(1 << num_dice):
+                # As the old choose_influencer did: each advisor's first
+                # combination that uses none of the used dice
+                expected = {}
+                for val, combos in sums.items():
+                    if val not in main.influencers:
+                        continue
+                    for combo in combos:
+                        mask = sum(1 << i for i in combo)
+                        if not mask & used_mask:
+                            expected[val] = mask
+                            break
+                assert main.get_reachable_advisors(dice,
+                                                   used_mask) == expected
+
+
+def rules_contents(edit_cards):
+    # The rules data as ruleset.compile_ruleset takes it, with the enemy
+    # cards edited
+    contents = []
+    for name, path in zip(ruleset.SOURCES, ruleset.source_paths()):
+        with open(path, "rb") as f:
+            data = f.read()
+        if name == "bad_guy_cards.json":
+            cards = json.loads(data)
+            edit_cards(cards)
+            data = json.dumps(cards).encode()
+        contents.append(data)
+    return contents
+
+
+def test_enemy_effects_parsed_at_load():
+    rules = ruleset.compile_ruleset(rules_contents(lambda cards: None))
+    goblins = next(card for card in rules["all_enemies"]
+                   if card["name"] == "Goblins" and card["level"] == 1)
+    assert goblins["rewards"] == [("wood", 1)]
+    assert goblins["losses"] == [("wood", 1), ("stone", 1), ("vp", 1),
+                                 ("building", 1)]
+
+
+@pytest.mark.parametrize("field, text", [
+    ("loss", "-1 wod"),
+    ("loss", "-one gold"),
+    ("loss", "+1 gold"),
+    ("reward", "+1 gold +1 VP"),
+    ("reward", ""),
+])
+def test_malformed_enemy_effects_fail_at_load(field, text):
+
+    def edit(cards):
+        cards[1][field] = text
+
+    with pytest.raises(ValueError, match=r"Goblins \(level 1\)"):
+        ruleset.compile_ruleset(rules_contents(edit))
+
+
+class ScriptedPolicy:
+    # A bot policy that claims advisors from a list, e.g. ["6+2", "0"],
+    # and answers the advisors' choices with the first option
+
+    def __init__(self, claims):
+        self.claims = list(claims)
+
+    def choose_advisor(self, game, p, dice_key, used_mask, available_options):
+        return self.claims.pop(0)
+
+    def choose_resource(self, p):
+        return "wood"
+
+    def choose_number(self, p, count):
+        return 1
+
+
+def claim(dice, claims, plus2=1):
+    # (used dice mask or None, player, game) after choose_influencer
+    p = main.PlayerState(name="Bot 1", type="bot")
+    p.plus2 = plus2
+    p.policy = ScriptedPolicy(claims)
+    game = main.GameSession([p], renderer=RecordingRenderer())
+    game.current_player = p
+    used_mask = main.choose_influencer(game, tuple(sorted(dice)), 0)
+    return used_mask, p, game
+
+
+def invalid_messages(game):
+    return [fields["message"] for kind, fields in game.renderer.events
+            if kind == "invalid_input"]
+
+
+def test_plus2_token_uses_the_dice_of_its_base_sum():
+    used_mask, p, game = claim((1, 2, 6), ["6+2"])
+    assert used_mask == 0b100  # the 6, and only the 6
+    assert game.influencer_owners == {8: "Bot 1"}
+    assert p.plus2 == 0
+
+
+def test_plus2_token_needs_a_reachable_base_sum():
+    used_mask, p, game = claim((1, 1, 1), ["8+2", "0"])
+    assert used_mask is None
+    assert game.influencer_owners == {}
+    assert p.plus2 == 1
+    assert invalid_messages(game) == [
+        "You can't reach that influencer with your remaining dice."
+    ]
+
+
+def test_plus2_token_needs_a_token():
+    used_mask, p, game = claim((1, 2, 6), ["6+2", "0"], plus2=0)
+    assert used_mask is None
+    assert game.influencer_owners == {}
+    assert invalid_messages(game) == ["You don't have any +2 tokens."]
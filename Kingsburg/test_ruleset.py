@@ -0,0 +1,86 @@
+# Checks when the compiled ruleset cache is used, and when it is rebuilt.
+
+import json
+import os
+import shutil
+
+import pytest
+
+import ruleset
+
+
+@pytest.fixture
+def rules_dir(tmp_path, monkeypatch):
+    # A copy of the sources, cached to a file of its own; counts how often
+    # the sources are hashed and compiled
+    for name in ruleset.SOURCES:
+        shutil.copy(os.path.join(ruleset.PACKAGE_DIR, name), tmp_path)
+    monkeypatch.setattr(ruleset, "PACKAGE_DIR", str(tmp_path))
+    monkeypatch.setenv(ruleset.CACHE_ENV_VAR, str(tmp_path / "rules.bin"))
+    counts = {"hash": 0, "compile": 0}
+    for name, key in (("content_hash", "hash"),
+                      ("compile_ruleset", "compile")):
+        monkeypatch.setattr(ruleset, name, counting(counts, key,
+                                                    getattr(ruleset, name)))
+    return tmp_path, counts
+
+
+def counting(counts, key, func):
+    def wrapper(*args):
+        counts[key] += 1
+        return func(*args)
+    return wrapper
+
+
+def test_cache_hit_on_unchanged_sources(rules_dir):
+    path, counts = rules_dir
+    first = ruleset.load_ruleset()
+    assert counts == {"hash": 1, "compile": 1}
+    assert (path / "rules.bin").exists()
+    assert ruleset.load_ruleset() == first
+    assert counts == {"hash": 1, "compile": 1}  # stat only
+
+
+def test_cache_hit_on_touched_sources(rules_dir):
+    path, counts = rules_dir
+    first = ruleset.load_ruleset()
+    board = path / "board.json"
+    stat = board.stat()
+    os.utime(board, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert ruleset.load_ruleset() == first
+    assert counts == {"hash": 2, "compile": 1}  # hashed, not compiled
+    # and the new mtime is remembered
+    assert ruleset.load_ruleset() == first
+    assert counts == {"hash": 2, "compile": 1}
+
+
+def test_cache_rebuilt_on_edited_sources(rules_dir):
+    path, counts = rules_dir
+    first = ruleset.load_ruleset()
+    cards_path = path / "bad_guy_cards.json"
+    cards = json.loads(cards_path.read_text())
+    cards[0]["strength"] += 10
+    cards_path.write_text(json.dumps(cards))
+    edited = ruleset.load_ruleset()
+    assert counts == {"hash": 2, "compile": 2}
+    assert edited["all_enemies"][0]["strength"] == (
+        first["all_enemies"][0]["strength"] + 10)
+    assert ruleset.load_ruleset() == edited
+    assert counts == {"hash": 2, "compile": 2}
+
+
+def test_no_cache(rules_dir, monkeypatch):
+    path, counts = rules_dir
+    monkeypatch.setenv(ruleset.CACHE_ENV_VAR, "")
+    assert ruleset.load_ruleset() == ruleset.load_ruleset()
+    assert counts["compile"] == 2
+    assert not (path / "rules.bin").exists()
+
+
+def test_stale_version_rebuilt(rules_dir, monkeypatch):
+    path, counts = rules_dir
+    ruleset.load_ruleset()
+    monkeypatch.setattr(ruleset, "RULESET_VERSION",
+                        ruleset.RULESET_VERSION + 1)
+    ruleset.load_ruleset()
+    assert counts["compile"] == 2
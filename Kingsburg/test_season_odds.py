@@ -0,0 +1,98 @@
+# Checks that the exact season and winter distributions are distributions,
+# agree with winter_odds, and catch a policy that changes its mind.
+
+from fractions import Fraction
+
+import pytest
+
+import main
+import winter_odds
+from influence_solver import SolverBot
+from season_odds import SeasonOdds, start_state
+
+STATES = [
+    start_state(),
+    start_state(wood=2, stone=1, gold=3, armies=1, vp=2, plus2=1),
+    start_state(wood=5, stone=5, gold=5, buildings=["1.1", "2.1", "3.1"]),
+]
+
+
+def total(outcomes):
+    assert all(isinstance(chance, Fraction) for chance in outcomes.values())
+    return sum(outcomes.values())
+
+
+@pytest.mark.parametrize("policy", [None, SolverBot], ids=["random",
+                                                            "solver"])
+def test_distributions_sum_to_one(policy):
+    odds = SeasonOdds(policy and policy())
+    for state in STATES:
+        for season in ("Spring", "Fall"):
+            assert total(odds.season(state, season)) == 1
+        assert total(odds.season(state, "Summer", round_number=3,
+                                 bonus_die=True, kings_envoy=True,
+                                 owners={5: "Bot 2"})) == 1
+        for round_number in (1, 5):
+            assert total(odds.winter(state, round_number)) == 1
+
+
+def player(state, levels):
+    p = main.PlayerState(name="Player", type="bot")
+    (p.wood, p.stone, p.gold, p.armies, p.vp, p.plus2, _, _) = state
+    for level in levels:
+        p.add_building(level)
+    return p
+
+
+@pytest.mark.parametrize("round_number", sorted(main.enemy_decks))
+@pytest.mark.parametrize("wood, stone, gold, armies, vp, levels", [
+    (0, 0, 0, 0, 0, []),
+    (1, 0, 2, 2, 1, ["1.1", "1.2"]),
+    (4, 4, 4, 3, 6, ["3.1", "4.1", "4.2", "4.3", "4.4"]),
+])
+def test_winter_matches_winter_odds(round_number, wood, stone, gold, armies,
+                                    vp, levels):
+    state = start_state(wood, stone, gold, armies, vp, buildings=levels)
+    outcomes = SeasonOdds().winter(state, round_number)
+    p = player(state, levels)
+    summary = p.effect_summary
+    exact = winter_odds.exact_combat_odds(
+        round_number, p.armies, summary["defense"],
+        tuple(summary["enemy_defense"].get(kind, 0)
+              for kind in main.enemy_defense_kinds), summary["tie_breaker"])
+    rewards = exact["rewards"]
+    losses = winter_odds.expected_losses(p, exact["loss_chances"])
+
+    def mean(index):
+        return sum(chance * after[index]
+                   for after, chance in outcomes.items())
+
+    def goods(amounts):
+        return sum(amounts.get(r, 0) for r in ("wood", "stone", "gold",
+                                                "any"))
+
+    assert mean(7) == exact["win"]  # wins
+    assert mean(0) + mean(1) + mean(2) - (wood + stone + gold) == (
+        goods(rewards) - goods(losses))
+    assert mean(4) - vp == (rewards.get("vp", 0) - losses.get("vp", 0) +
+                            exact["win"] * summary["vp_per_win"])
+    assert float(exact["win"]) == winter_odds.winter_odds(
+        p, round_number)["win"]
+
+
+class FickleBot(SolverBot):
+    # Builds on every other call, and skips the rest
+
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def choose_building(self, game, p, buildable):
+        self.calls += 1
+        return game.rng.choice(buildable) if self.calls % 2 else None
+
+
+def test_policy_that_changes_its_mind_raises():
+    odds = SeasonOdds(FickleBot())
+    with pytest.raises(ValueError, match="decide the same way"):
+        odds.season(start_state(wood=5, stone=5, gold=5), "Spring")
@@ -0,0 +1,56 @@
+# Checks that the server plays games for clients connected at the same time,
+# whatever they answer.
+
+import asyncio
+import random
+
+from server import GameServer
+
+# Answers that make sense somewhere in the game, and some that never do
+SENSIBLE = ["0", "1", "2", "3", "wood", "stone", "gold"]
+NONSENSE = ["x", "", "99", "-1", "8+2", "wood+2", "1 2", "🏰"]
+
+
+async def play(port, name, answers, rng):
+    # Hosts a game against a bot and answers every question with
+    # rng.choice(answers) until the game is over; returns what was sent
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"NAME {name}\nHOST\n".encode())
+    seen = []
+    while True:
+        line = (await reader.readline()).decode()
+        assert line, "the server hung up mid-game"
+        seen.append(line)
+        if line.startswith("? "):
+            writer.write(f"{rng.choice(answers)}\n".encode())
+        elif line.startswith("Back in the lobby."):
+            break
+    writer.write(b"QUIT\n")
+    await writer.drain()
+    writer.close()
+    return "".join(seen)
+
+
+async def two_games():
+    game_server = GameServer()
+    server = await asyncio.start_server(game_server.handle_client,
+                                        "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    async with server:
+        sensible = play(port, "Alice", SENSIBLE, random.Random(1))
+        # Nonsense mostly, with a sensible answer now and then so that a
+        # question that insists on one gets it
+        stubborn = play(port, "Bob", NONSENSE * 3 + SENSIBLE,
+                        random.Random(2))
+        outputs = await asyncio.wait_for(
+            asyncio.gather(sensible, stubborn), timeout=120)
+    return game_server, outputs
+
+
+def test_two_clients_finish_their_games():
+    game_server, (alice, bob) = asyncio.run(two_games())
+    for name, output in (("Alice", alice), ("Bob", bob)):
+        assert "over!" in output and f"  {name}: " in output
+        assert "stopped" not in output
+    assert "Invalid" in bob
+    assert game_server.tables == {}
@@ -0,0 +1,38 @@
+# Checks that structured logs read back as written, across compressors and
+# part rotation.
+
+import os
+import random
+
+import pytest
+
+from sim_log import SimLogWriter, read_sim_log
+
+
+@pytest.mark.parametrize("compression", [None, "gzip", "bz2", "xz"])
+def test_round_trip_with_rotation(tmp_path, compression):
+    rng = random.Random(0)
+    records = [{
+        "game": i // 50,
+        "x": rng.getrandbits(64),
+        "s": "ab" * rng.randint(0, 8)
+    } for i in range(20000)]
+    prefix = str(tmp_path / "shard000001")
+    writer = SimLogWriter(prefix, compression, max_bytes=20000,
+                          buffer_size=4000)
+    for record in records:
+        writer.write(record)
+    writer.close()
+
+    # More parts than one digit, for the uncompressed log, so the order has
+    # to come from the zero-padded part numbers
+    assert len(writer.paths) > (10 if compression is None else 1)
+    assert sorted(writer.paths) == writer.paths
+    if compression is None:
+        # A part is closed at the first flush past max_bytes
+        for path in writer.paths[:-1]:
+            assert 20000 <= os.path.getsize(path) < 20000 + 4000 + 100
+    assert list(read_sim_log(prefix)) == records
+    assert list(read_sim_log(str(tmp_path))) == records
+    first = list(read_sim_log(writer.paths[0]))
+    assert first and first == records[:len(first)]
@@ -0,0 +1,151 @@
+# Checks of the compact player and game state.
+
+import io
+import random
+
+import pytest
+
+import main
+from renderers import NullRenderer
+from rng_streams import GameStreams, SharedStream
+
+
+def test_player_buildings_bitmask():
+    # Built levels come back in sheet order whatever order they were built
+    # in, with the same effect summary as scanning those buildings
+    p = main.PlayerState()
+    levels = [b["level"] for b in main.all_buildings][::3]
+    for level in reversed(levels):
+        p.add_building(level)
+    assert p.buildings == levels
+    assert all(p.has_building(level) for level in levels)
+    assert p.effect_summary == main.summarize_building_effects(levels)
+    p.reset_buildings()
+    assert p.buildings == []
+    assert p.effect_summary == main.new_effect_summary()
+
+
+def test_player_resources_by_name():
+    p = main.PlayerState()
+    p["wood"] += 2
+    assert p.wood == 5 and p["wood"] == 5
+
+
+def test_player_snapshot_restore():
+    p = main.PlayerState()
+    p.add_building(main.all_buildings[0]["level"])
+    p.combat_log.append({"round": 1, "result": "win"})
+    start = p.snapshot()
+    p.wood, p.vp, p.plus2, p.kings_envoy = 0, 9, 2, True
+    p.add_building(main.all_buildings[1]["level"])
+    p.combat_log.append({"round": 2, "result": "loss"})
+    p.restore(start)
+    assert p.snapshot() == start
+    assert p.buildings == [main.all_buildings[0]["level"]]
+    assert p.effect_summary == main.get_effect_summary(p.built)
+    assert p.combat_log == [{"round": 1, "result": "win"}]
+
+
+def test_game_snapshot_restore():
+    # A year played from a restored position plays the same again
+    players = [main.PlayerState(name=f"Bot {i}", type="bot") for i in (1, 2)]
+    game = main.GameSession(players, renderer=NullRenderer(),
+                            rng=GameStreams())
+
+    def play_year():
+        game.rng.seed(7)
+        for step in main.full_game_steps(game, rounds=1):
+            step()
+
+    start = game.snapshot()
+    play_year()
+    end = game.snapshot()
+    assert end != start
+    game.restore(start)
+    assert game.snapshot() == start
+    play_year()
+    assert game.snapshot() == end
+
+
+def play_games(streams, seeds, interleaved):
+    # Final states and logs of seeded mini-games, each in its own session
+    games = []
+    for seed in seeds:
+        players = [main.PlayerState(name=f"Bot {i}", type="bot")
+                   for i in (1, 2)]
+        game = main.GameSession(renderer=NullRenderer(), rng=streams())
+        games.append((game, players, io.StringIO(), seed))
+    if interleaved:
+        results = main.play_interleaved(games)
+    else:
+        results = [main.simulate_real_mini_game(players, main.all_buildings,
+                                                main.influencers, log,
+                                                seed=seed, game=game)
+                   for game, players, log, seed in games]
+    return results, [log.getvalue() for _, _, log, _ in games]
+
+
+@pytest.mark.parametrize("streams", [
+    lambda: SharedStream(random.Random()), GameStreams
+], ids=["shared", "streams"])
+def test_interleaved_games_play_as_alone(streams):
+    seeds = [3, 141, 59, 26, 5]
+    interleaved = play_games(streams, seeds, interleaved=True)
+    assert interleaved == play_games(streams, seeds, interleaved=False)
+    assert len(set(interleaved[1])) == len(seeds)
+
+
+def plain_buildable(levels, wood, stone, gold):
+    # The building sheet's rules, read straight off it: in sheet order,
+    # every building not built whose left neighbour in its row is built,
+    # that the player can pay for; rows 3 and 4 also need a building in
+    # rows 1 and 2, or the Crane
+    crane = next(b["level"] for b in main.all_buildings
+                 if b["name"] == "Crane")
+    rows = {level.split(".")[0] for level in levels}
+    buildable = []
+    for b in main.all_buildings:
+        row, column = b["level"].split(".")
+        cost = b["cost"]
+        if (b["level"] not in levels
+                and (column == "1" or f"{row}.{int(column) - 1}" in levels)
+                and (row not in "34" or crane in levels
+                     or {"1", "2"} <= rows)
+                and wood >= cost["wood"] and stone >= cost["stone"]
+                and gold >= cost["gold"]):
+            buildable.append(b)
+    return buildable
+
+
+def test_find_buildable_matches_the_sheet():
+    rng = random.Random(5)
+    levels = [b["level"] for b in main.all_buildings]
+    crane = next(b["level"] for b in main.all_buildings
+                 if b["name"] == "Crane")
+    caps = main.cost_caps
+    built_sets = [[], levels, [crane], ["1.1", "2.1"], ["1.1"],
+                  ["1.1", "2.1", "3.1"], [crane, "3.1", "4.1"]]
+    built_sets += [rng.sample(levels, rng.randint(0, len(levels)))
+                   for _ in range(300)]
+    for built_levels in built_sets:
+        built = 0
+        for level in built_levels:
+            built |= main.building_bits[level]
+        goods = [(0, 0, 0), caps, tuple(c - 1 for c in caps),
+                 tuple(c + 7 for c in caps), (caps[0] + 9, 0, caps[2] + 1)]
+        goods += [tuple(rng.randint(0, c + 3) for c in caps)
+                  for _ in range(10)]
+        for wood, stone, gold in goods:
+            # Twice: the second answer comes from the cache
+            for _ in range(2):
+                assert list(main.find_buildable(
+                    built, wood, stone, gold)) == plain_buildable(
+                        set(built_levels), wood, stone, gold)
+
+    # The Crane opens rows 3 and 4 on its own
+    def rows_open(built):
+        return {b["level"] for b in main.find_buildable(built, *caps)
+                if b["level"][0] in "34"}
+
+    assert rows_open(0) == set()
+    assert rows_open(main.building_bits[crane]) == {"3.1", "4.1"}
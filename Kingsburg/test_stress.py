@@ -0,0 +1,43 @@
+# Checks that the sharded stress test doesn't depend on how it's sharded,
+# and that any game can be replayed alone.
+
+import io
+import json
+
+import pytest
+
+import main
+import stress
+
+
+def run(tmp_path, name, **options):
+    # (merged results, merged log) of a run
+    results = tmp_path / f"{name}.jsonl"
+    log = tmp_path / f"{name}.log"
+    games, errors = stress.run_parallel_stress_test(
+        40, base_seed=5, log_path=str(log), results_path=str(results),
+        **options)
+    assert (games, errors) == (40, [])
+    return results.read_text(), log.read_text()
+
+
+@pytest.mark.parametrize("streams", [False, True])
+def test_same_results_on_any_number_of_workers(tmp_path, streams):
+    alone = run(tmp_path, "alone", workers=1, streams=streams)
+    sharded = run(tmp_path, "sharded", workers=3, shard_size=7,
+                  streams=streams)
+    assert sharded == alone
+    assert len(alone[0].splitlines()) == 40
+
+
+@pytest.mark.parametrize("streams", [False, True])
+def test_replay_reproduces_a_game(tmp_path, streams):
+    results, log = run(tmp_path, "run", workers=2, streams=streams)
+    game = json.loads(results.splitlines()[22])
+    previous = main.renderer
+    try:
+        replayed = stress.replay_game(game["game"], 5, log_file=io.StringIO(),
+                                      streams=streams)
+    finally:
+        main.set_renderer(previous)
+    assert json.loads(json.dumps(replayed)) == game
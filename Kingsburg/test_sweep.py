@@ -0,0 +1,54 @@
+# Checks that sweeps reuse cached blocks, and refuse overrides that would
+# change nothing.
+
+import os
+
+import pytest
+
+import sweep
+
+STATUE = {"name": "cheap statue",
+          "overrides": {"building/Statue/cost.wood": 0}}
+GOBLINS = {"name": "strong goblins",
+           "overrides": {"enemy/Goblins/strength": 9}}
+
+
+def cached(cache_dir):
+    # {block file: modification time}
+    return {name: os.stat(cache_dir / name).st_mtime_ns
+            for name in os.listdir(cache_dir)}
+
+
+def test_added_variant_plays_only_its_blocks(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(sweep, "BLOCK_GAMES", 10)
+    cache_dir = tmp_path / "cache"
+    first = sweep.run_sweep([STATUE], games=20, workers=1,
+                            cache_dir=str(cache_dir))
+    before = cached(cache_dir)
+    assert len(before) == 4  # two blocks each for base and the statue
+    assert "4 of 4 block(s) to play" in capsys.readouterr().out
+
+    second = sweep.run_sweep([STATUE, GOBLINS], games=20, workers=1,
+                             cache_dir=str(cache_dir))
+    assert "2 of 6 block(s) to play" in capsys.readouterr().out
+    after = cached(cache_dir)
+    assert len(after) == 6
+    assert {name: after[name] for name in before} == before  # not rewritten
+    assert {name: second[name] for name in first} == first
+    assert second["strong goblins"]["games"] == 20
+
+
+@pytest.mark.parametrize("override", [
+    "building/Statue/cots.wood",  # no such field
+    "building/Statue/cost.wod",  # no such field below it
+    "advisor/10/actions.9.amount",  # no such list entry
+    "building/Statu/cost.wood",  # no such building
+    "buildings/Statue/cost.wood",  # no such kind of entry
+    "building/cost.wood",  # not what/which/field
+])
+def test_misspelt_override_is_refused(tmp_path, override):
+    variant = {"name": "typo", "overrides": {override: 1}}
+    with pytest.raises(ValueError):
+        sweep.run_sweep([variant], games=20, workers=1,
+                        cache_dir=str(tmp_path))
+    assert os.listdir(tmp_path) == []  # nothing played
@@ -0,0 +1,100 @@
+# Checks the exact winter odds against every King's die and enemy played out
+# by handle_winter's rules.
+
+from fractions import Fraction
+
+import pytest
+
+import main
+import winter_odds
+from renderers import NullRenderer
+
+# (armies, buildings, wood, stone, gold, vp): no defense and nothing to
+# lose; the enemy-kind buildings with too few goods to pay most losses; a
+# tie-breaker; and a bonus VP per win with plenty of everything
+PLAYERS = [
+    (0, [], 0, 0, 0, 0),
+    (2, ["1.2", "4.1"], 1, 0, 3, 1),
+    (1, ["3.3", "4.3"], 5, 5, 5, 9),
+    (3, ["4.4"], 2, 9, 0, 4),
+]
+
+
+def make_player(armies, levels, wood, stone, gold, vp):
+    p = main.PlayerState(name="Bot 1", type="bot")
+    p.armies, p.wood, p.stone, p.gold, p.vp = armies, wood, stone, gold, vp
+    for level in levels:
+        p.add_building(level)
+    return p
+
+
+def play_out(game, level):
+    # (win chance, expected rewards, expected losses) over every die and enemy
+    p = game.current_player
+    deck = main.enemy_decks[level]
+    each = Fraction(1, 6 * len(deck))
+    win, rewards, losses = Fraction(0), {}, {}
+    for enemy in deck:
+        for die in range(1, 7):
+            power = (p.armies + die +
+                     main.get_building_defense_bonus(game, enemy))
+            won = power > enemy["strength"] or (
+                power == enemy["strength"] and main.has_tie_breaker(game))
+            win += won * each
+            for resource, amount in enemy["rewards"]:
+                if resource != "building":
+                    rewards[resource] = (rewards.get(resource, 0) +
+                                         won * amount * each)
+            if won:
+                continue
+            for resource, amount in enemy["losses"]:
+                if resource == "building":
+                    continue
+                has = (p.wood + p.stone + p.gold if resource == "any"
+                       else p[resource])
+                if min(amount, has):
+                    losses[resource] = (losses.get(resource, 0) +
+                                        min(amount, has) * each)
+    return win, rewards, losses
+
+
+@pytest.mark.parametrize("level", sorted(main.enemy_decks))
+@pytest.mark.parametrize("player", PLAYERS)
+def test_odds_match_playing_every_roll(player, level):
+    p = make_player(*player)
+    game = main.GameSession([p], renderer=NullRenderer())
+    game.current_player = p
+    win, rewards, losses = play_out(game, level)
+
+    summary = p.effect_summary
+    kind_defense = tuple(summary["enemy_defense"].get(kind, 0)
+                         for kind in main.enemy_defense_kinds)
+    exact = winter_odds.exact_combat_odds(level, p.armies,
+                                          summary["defense"], kind_defense,
+                                          summary["tie_breaker"])
+    assert exact["win"] == win
+    assert exact["rewards"] == rewards
+    assert winter_odds.expected_losses(p, exact["loss_chances"]) == losses
+
+    odds = winter_odds.winter_odds(p, level)
+    assert odds["win"] == float(win)
+    if summary["vp_per_win"]:
+        rewards["vp"] = rewards.get("vp", 0) + win * summary["vp_per_win"]
+    assert odds["rewards"] == pytest.approx(
+        {res: float(amount) for res, amount in rewards.items()})
+    assert odds["losses"] == pytest.approx(
+        {res: float(amount) for res, amount in losses.items()})
+
+
+def test_clamped_losses():
+    # Level 1 with nothing: every loss is clamped to nothing
+    p = make_player(*PLAYERS[0])
+    assert winter_odds.winter_odds(p, 1)["losses"] == {}
+    # One good: the 2-goods losses take only that one
+    p.gold = 1
+    losses = winter_odds.winter_odds(p, 1)["losses"]
+    assert set(losses) == {"any", "gold"}
+    table = winter_odds.exact_combat_odds(1, 0, 0, (0, 0), False)
+    any_chance = sum(chance for chance, enemy_losses in table["loss_chances"]
+                     for resource, _ in enemy_losses if resource == "any")
+    assert losses["any"] == pytest.approx(float(any_chance))
@@ -0,0 +1,122 @@
+# Exact winter-combat odds, instead of sampling handle_winter.
+#
+# A winter battle is armies + one King's die + building defense against the
+# strength of an enemy drawn uniformly from the round's deck; a tie is a win
+# with a tie-breaker building. Everything but the player's goods is fixed by
+# (level, armies, defense, tie-breaker), so each of those gets one table,
+# built on first use: the win probability, the expected rewards, and the
+# chance of losing to each enemy. winter_odds() folds the player's goods into
+# the expected penalty, since a loss can't take more than the player has.
+#
+#   odds = winter_odds(game.current_player, round_number=2)
+#   odds["win"], odds["rewards"]["gold"], odds["losses"]["any"]
+
+from fractions import Fraction
+
+import main
+
+KING_DIE = range(1, 7)
+
+# level -> {(armies, defense, enemy-kind defense, tie-breaker): table}
+combat_tables = {}
+
+
+def count_winning_rolls(power, strength, tie_breaker):
+    # How many King's die faces make power + die beat (or tie) strength
+    needed = strength - power + (0 if tie_breaker else 1)
+    return sum(1 for die in KING_DIE if die >= needed)
+
+
+def exact_combat_odds(level, armies, defense, kind_defense, tie_breaker):
+    # The combat table in Fractions: win chance, expected rewards, and
+    # (chance of drawing and losing to an enemy, its losses) per enemy
+    deck = main.enemy_decks[level]
+    kind_bonus = dict(zip(main.enemy_defense_kinds, kind_defense))
+    draw = Fraction(1, len(deck) * len(KING_DIE))
+    win = Fraction(0)
+    rewards = {}
+    loss_chances = []
+    for enemy in deck:
+        power = armies + defense + sum(kind_bonus[kind]
+                                       for kind in enemy["defense_kinds"])
+        wins = count_winning_rolls(power, enemy["strength"], tie_breaker)
+        win += wins * draw
+        for resource, amount in enemy["rewards"]:
+            # handle_winter doesn't award buildings
+            if resource != "building":
+                rewards[resource] = (rewards.get(resource, 0) +
+                                     amount * wins * draw)
+        if wins < len(KING_DIE):
+            loss_chances.append(((len(KING_DIE) - wins) * draw,
+                                 enemy["losses"]))
+    return {"win": win, "rewards": rewards,
+            "loss_chances": tuple(loss_chances)}
+
+
+def build_combat_table(level, armies, defense, kind_defense, tie_breaker):
+    exact = exact_combat_odds(level, armies, defense, kind_defense,
+                              tie_breaker)
+    return {
+        "win": float(exact["win"]),
+        "rewards": {res: float(amt) for res, amt in exact["rewards"].items()},
+        "loss_chances": tuple((float(chance), losses)
+                              for chance, losses in exact["loss_chances"]),
+    }
+
+
+def get_combat_table(level, armies, defense, kind_defense, tie_breaker):
+    tables = combat_tables.setdefault(level, {})
+    key = (armies, defense, kind_defense, tie_breaker)
+    table = tables.get(key)
+    if table is None:
+        table = build_combat_table(level, armies, defense, kind_defense,
+                                   tie_breaker)
+        tables[key] = table
+    return table
+
+
+def get_player_table(p, level):
+    summary = p.effect_summary
+    kind_defense = tuple(summary["enemy_defense"].get(kind, 0)
+                         for kind in main.enemy_defense_kinds)
+    return get_combat_table(level, p.armies, summary["defense"], kind_defense,
+                            summary["tie_breaker"])
+
+
+def expected_loss(p, resource, amount):
+    # What apply_loss_penalty actually takes: never more than p has. No card
+    # takes "any" goods alongside a specific good, so each loss is clamped on
+    # its own.
+    if resource == "any":
+        return min(amount, p.wood + p.stone + p.gold)
+    if resource == "building":
+        return 0  # handle_winter doesn't take buildings
+    return min(amount, p[resource])
+
+
+def expected_losses(p, loss_chances):
+    # Expected goods lost, by resource, from a table's loss chances (floats
+    # or Fractions)
+    losses = {}
+    for chance, enemy_losses in loss_chances:
+        for resource, amount in enemy_losses:
+            lost = expected_loss(p, resource, amount)
+            if lost:
+                losses[resource] = losses.get(resource, 0) + chance * lost
+    return losses
+
+
+def winter_odds(p, round_number):
+    # None if the round has no enemies (handle_winter skips the battle)
+    level = round_number
+    if level not in main.enemy_decks:
+        return None
+    table = get_player_table(p, level)
+
+    rewards = dict(table["rewards"])
+    vp_per_win = p.effect_summary["vp_per_win"]
+    if vp_per_win:
+        rewards["vp"] = rewards.get("vp", 0) + table["win"] * vp_per_win
+
+    return {"win": table["win"], "rewards": rewards,
+            "losses": expected_losses(p, table["loss_chances"])}